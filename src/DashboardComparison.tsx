@@ -19,17 +19,20 @@ const DashboardComparison: React.FC = () => {
   const [selectedDashboard1, setSelectedDashboard1] = useState<string>("");
   const [selectedDashboard2, setSelectedDashboard2] = useState<string>("");
 
-  // Full dashboard data for the two selected
+  // Totals of the two selected dashboards
   const [dashboard1Data, setDashboard1Data] = useState<any>(null);
   const [dashboard2Data, setDashboard2Data] = useState<any>(null);
 
+  // Category sums of both dashboards side by side (computed by the backend)
+  const [categoryRows, setCategoryRows] = useState<any[]>([]);
+
   const [loading, setLoading] = useState(false);
 
   // Fetch all dashboards on mount
   useEffect(() => {
     if (!userId) return;
 
-    fetch(`http://127.0.0.1:8000/history?userId=${userId}`)
+    fetch(`http://127.0.0.1:8000/history?userId=${userId}&summary=true`)
       .then((res) => res.json())
       .then((data) => {
         if (Array.isArray(data)) {
@@ -39,7 +42,7 @@ const DashboardComparison: React.FC = () => {
       .catch((err) => console.error("Error fetching dashboards:", err));
   }, [userId]);
 
-  // Fetch detailed data for selected dashboards
+  // Fetch the comparison of the selected dashboards
   const fetchComparison = async () => {
     if (!selectedDashboard1 || !selectedDashboard2) {
       alert("Please select two dashboards to compare");
@@ -54,16 +57,16 @@ const DashboardComparison: React.FC = () => {
     setLoading(true);
 
     try {
-      const [res1, res2] = await Promise.all([
-        fetch(`http://127.0.0.1:8000/history/${selectedDashboard1}`),
-        fetch(`http://127.0.0.1:8000/history/${selectedDashboard2}`),
-      ]);
+      const res = await fetch(
+        `http://127.0.0.1:8000/compare?userId=${userId}&first=${selectedDashboard1}&second=${selectedDashboard2}`
+      );
 
-      const data1 = await res1.json();
-      const data2 = await res2.json();
+      if (!res.ok) throw new Error(`Compare failed: ${res.status}`);
+      const comparison = await res.json();
 
-      setDashboard1Data(data1);
-      setDashboard2Data(data2);
+      setDashboard1Data(comparison.first);
+      setDashboard2Data(comparison.second);
+      setCategoryRows(comparison.categories);
     } catch (err) {
       console.error("Error fetching comparison:", err);
       alert("Failed to load comparison data");
@@ -76,16 +79,10 @@ const DashboardComparison: React.FC = () => {
   const prepareChartData = () => {
     if (!dashboard1Data || !dashboard2Data) return [];
 
-    // Get all unique categories from both dashboards
-    const allCategories = new Set([
-      ...Object.keys(dashboard1Data.categories),
-      ...Object.keys(dashboard2Data.categories),
-    ]);
-
-    return Array.from(allCategories).map((category) => ({
-      name: category,
-      Dashboard1: dashboard1Data.categories[category] || 0,
-      Dashboard2: dashboard2Data.categories[category] || 0,
+    return categoryRows.map((row) => ({
+      name: row.category,
+      Dashboard1: row.first,
+      Dashboard2: row.second,
     }));
   };
 
@@ -41,24 +41,49 @@ const FinanceChat: React.FC = () => {
         method: "POST",
         headers: { "Content-Type": "application/json" },
 
-        // Send user iD and message content
+        // Send user iD and message content, asking for the reply as a stream
         body: JSON.stringify({
           userId: localStorage.getItem("userId"),
           message: userMessage.content,
+          stream: true,
         }),
       });
 
-      // Parse response JSON
-      const data = await res.json();
-
-      // Create assistant (bot) response message object
-      const botMessage: Message = {
-        role: "assistant",
-        content: data.response,
+      if (!res.ok || !res.body) throw new Error(`Chat failed: ${res.status}`);
+
+      // Shows the reply received so far as the assistant (bot) message
+      let reply = "";
+      let shown = false;
+      const showReply = (content: string) => {
+        const botMessage: Message = { role: "assistant", content };
+        setMessages((prev) =>
+          shown ? [...prev.slice(0, -1), botMessage] : [...prev, botMessage]
+        );
+        shown = true;
       };
 
-      // Add bot message to the chat
-      setMessages((prev) => [...prev, botMessage]);
+      // Read the server-sent events: {"delta"} pieces, then {"done"} or {"error"}
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() || "";
+
+        for (const event of events) {
+          if (!event.startsWith("data: ")) continue;
+          const data = JSON.parse(event.slice(6));
+          if (data.error) throw new Error(data.error);
+          if (data.delta) reply += data.delta;
+        }
+
+        if (reply) showReply(reply);
+      }
     } catch (err) {
       // Handle errors by showing a fallback message
       setMessages((prev) => [
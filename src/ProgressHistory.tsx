@@ -19,7 +19,7 @@ const ProgressHistory: React.FC = () => {
   useEffect(() => {
     const userId = localStorage.getItem("userId");
 
-    fetch(`http://127.0.0.1:8000/progress-history?userId=${userId}`)
+    fetch(`http://127.0.0.1:8000/progress-history?userId=${userId}&summary=true`)
       .then((res) => res.json())
       .then((data) => {
         // Reverse data so most recent appears first
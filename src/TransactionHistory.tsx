@@ -25,7 +25,7 @@ const TransactionHistory: React.FC = () => {
   }
 
   // Base API URL
-  let url = `http://127.0.0.1:8000/history?userId=${userId}`;
+  let url = `http://127.0.0.1:8000/history?userId=${userId}&summary=true`;
 
   // Build query parameters dynamically
   const params = [];
@@ -0,0 +1,299 @@
+# Cross-month analytics over a user's stored transactions
+#
+# The transactions of every stored month are loaded once into parallel NumPy
+# arrays (day, amount in cents, category code, description code) and every
+# figure is computed with array operations (bincount, cumsum, lexsort) instead
+# of Python loops over lists of dicts:
+#   - monthly income/outcome with rolling averages,
+#   - per-category monthly spending and its trend,
+#   - recurring payments (same merchant, similar amount, about once a month),
+#   - anomalies: single expenses far above the usual for their category, and
+#     months where a category's spending is far above its average.
+from datetime import datetime
+
+import numpy as np
+
+from dashboard_storage import decode_dashboard, storage_projection
+
+INCOME_CATEGORY = "Income"
+ANOMALY_Z = 3.0  # standard deviations above the category mean
+MIN_CATEGORY_ROWS = 10  # a category needs this many expenses before its outliers are flagged
+MAX_ANOMALIES = 20
+
+
+class TransactionColumns:
+    def __init__(self, day, amount, category, description, categories, descriptions):
+        self.day = day  # datetime64[D]
+        self.amount = amount  # int64 cents, income positive, expenses negative
+        self.category = category  # int32 index into categories
+        self.description = description  # int32 index into descriptions
+        self.categories = categories
+        self.descriptions = descriptions
+
+    def __len__(self):
+        return len(self.amount)
+
+
+DAY_FORMATS = ("%d %b %Y", "%d %B %Y")  # "1 Sep 2025" and "1 September 2025"
+
+
+# The day of a transaction date, or None if it is not a date the statements use
+def parse_day(text):
+    text = text.replace("Sept ", "Sep ")
+    for day_format in DAY_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(text, day_format).date(), "D")
+        except ValueError:
+            pass
+    return None
+
+
+# Builds the columns from dashboard documents. When a month was uploaded more than once
+# only its newest dashboard is used (the same rule as the monthly aggregates)
+def columns_from_dashboards(docs):
+    latest = {}
+    for doc in sorted(docs, key=lambda d: d.get("timestamp", "")):
+        latest[doc["statement_month"]] = doc
+
+    latest = {month: decode_dashboard(doc) for month, doc in latest.items()}
+
+    # Dates are parsed once per distinct string; rows with a date that cannot be read are left out
+    day_cache = {}
+    rows = []
+    days = []
+    for doc in latest.values():
+        for tx in (doc.get("income") or []) + (doc.get("outcome") or []):
+            text = tx["date"]
+            if text not in day_cache:
+                day_cache[text] = parse_day(text)
+            if day_cache[text] is not None:
+                rows.append(tx)
+                days.append(day_cache[text])
+
+    # Strings are interned to integer codes
+    category_codes = {}
+    description_codes = {}
+    day = np.array(days, dtype="datetime64[D]")
+    amount = np.rint(np.array([tx["amount"] for tx in rows], dtype=np.float64) * 100).astype(np.int64)
+    category = np.array([
+        category_codes.setdefault(tx.get("category") or INCOME_CATEGORY, len(category_codes)) for tx in rows
+    ], dtype=np.int32)
+    description = np.array([
+        description_codes.setdefault(tx["description"], len(description_codes)) for tx in rows
+    ], dtype=np.int32)
+
+    return TransactionColumns(day, amount, category, description, list(category_codes), list(description_codes))
+
+
+async def load_dashboards(dashboards, user_id):
+    fields = {"_id": 0, "statement_month": 1, "timestamp": 1, "income": 1, "outcome": 1}
+    return await dashboards.find({"userId": user_id}, storage_projection(fields)).to_list()
+
+
+def to_euros(cents):
+    return np.round(np.asarray(cents, dtype=np.float64) / 100, 2)
+
+
+# Moving average over the last `window` values (fewer at the start of the series)
+def rolling_mean(values, window):
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+# Every month from the first to the last transaction (months without any are kept, as
+# zeros, so the rolling and anomaly windows only cover adjacent months) and each row's month
+def month_index(cols):
+    day_months = cols.day.astype("datetime64[M]")
+    first = day_months.min()
+    months = np.arange(first, day_months.max() + 1)
+    index = (day_months - first).astype(np.int64)
+    return months, index
+
+
+def monthly_series(cols, months, index, window):
+    income = np.bincount(index, weights=np.where(cols.amount > 0, cols.amount, 0), minlength=len(months))
+    outcome = np.bincount(index, weights=np.where(cols.amount < 0, -cols.amount, 0), minlength=len(months))
+    net = income - outcome
+
+    income_avg = rolling_mean(income, window)
+    outcome_avg = rolling_mean(outcome, window)
+    net_avg = rolling_mean(net, window)
+
+    return [
+        {
+            "month": str(months[i]),
+            "income": float(to_euros(income[i])),
+            "outcome": float(to_euros(outcome[i])),
+            "net": float(to_euros(net[i])),
+            "income_rolling": float(to_euros(income_avg[i])),
+            "outcome_rolling": float(to_euros(outcome_avg[i])),
+            "net_rolling": float(to_euros(net_avg[i])),
+        }
+        for i in range(len(months))
+    ]
+
+
+# Months x categories matrix of spending (cents)
+def category_matrix(cols, months, index):
+    expenses = cols.amount < 0
+    cells = index[expenses] * len(cols.categories) + cols.category[expenses]
+    totals = np.bincount(cells, weights=-cols.amount[expenses], minlength=len(months) * len(cols.categories))
+    return totals.reshape(len(months), len(cols.categories))
+
+
+def category_trends(cols, months, matrix):
+    totals = matrix.sum(axis=0)
+    spent = totals > 0
+    if not spent.any():
+        return []
+
+    # Least-squares slope of every category's monthly spending at once (euros per month)
+    x = np.arange(len(months), dtype=np.float64)
+    x -= x.mean()
+    denominator = (x * x).sum()
+    slopes = (x @ (matrix - matrix.mean(axis=0))) / denominator if denominator else np.zeros(matrix.shape[1])
+
+    share = totals / totals.sum()
+    trends = []
+    for c in np.flatnonzero(spent)[np.argsort(-totals[spent])]:
+        trends.append({
+            "category": cols.categories[c],
+            "total": float(to_euros(totals[c])),
+            "monthly_average": float(to_euros(totals[c] / len(months))),
+            "last_month": float(to_euros(matrix[-1, c])),
+            "share": round(float(share[c]), 4),
+            "trend_per_month": float(to_euros(slopes[c])),
+            "months": [float(v) for v in to_euros(matrix[:, c])],
+        })
+    return trends
+
+
+# Merchants charged in at least 3 different months, about once a month, for a similar amount
+def recurring_payments(cols, months, index, min_months=3, max_variation=0.15):
+    expenses = np.flatnonzero(cols.amount < 0)
+    if len(expenses) == 0:
+        return []
+
+    order = expenses[np.lexsort((cols.day[expenses], cols.description[expenses]))]
+    description = cols.description[order]
+    day = cols.day[order].astype(np.int64)
+    amount = -cols.amount[order].astype(np.float64)
+
+    # Group boundaries: one group per description
+    starts = np.flatnonzero(np.concatenate(([True], description[1:] != description[:-1])))
+    ends = np.concatenate((starts[1:], [len(order)]))
+    counts = ends - starts
+
+    sums = np.add.reduceat(amount, starts)
+    squares = np.add.reduceat(amount * amount, starts)
+    mean = sums / counts
+    variation = np.sqrt(np.maximum(squares / counts - mean * mean, 0)) / mean
+
+    # Distinct months per description
+    month_keys = np.unique(description.astype(np.int64) * len(months) + index[order])
+    distinct_months = np.bincount(month_keys // len(months), minlength=len(cols.descriptions))[description[starts]]
+
+    span = day[ends - 1] - day[starts]
+    interval = np.where(counts > 1, span / np.maximum(counts - 1, 1), 0)
+
+    recurring = (
+        (distinct_months >= min_months)
+        & (counts <= distinct_months * 1.5)
+        & (interval >= 25) & (interval <= 35)
+        & (variation <= max_variation)
+    )
+
+    payments = []
+    for g in np.flatnonzero(recurring)[np.argsort(-mean[recurring])]:
+        first = order[starts[g]]
+        payments.append({
+            "description": cols.descriptions[description[starts[g]]],
+            "category": cols.categories[cols.category[first]],
+            "average_amount": float(to_euros(mean[g])),
+            "payments": int(counts[g]),
+            "months": int(distinct_months[g]),
+            "interval_days": round(float(interval[g]), 1),
+            "last_payment": str(cols.day[order[ends[g] - 1]]),
+        })
+    return payments
+
+
+def transaction_anomalies(cols, threshold=ANOMALY_Z):
+    expenses = np.flatnonzero(cols.amount < 0)
+    if len(expenses) == 0:
+        return []
+
+    category = cols.category[expenses]
+    amount = -cols.amount[expenses].astype(np.float64)
+    n = len(cols.categories)
+
+    counts = np.bincount(category, minlength=n)
+    mean = np.bincount(category, weights=amount, minlength=n) / np.maximum(counts, 1)
+    squares = np.bincount(category, weights=amount * amount, minlength=n) / np.maximum(counts, 1)
+    std = np.sqrt(np.maximum(squares - mean * mean, 0))
+
+    usable = (counts[category] >= MIN_CATEGORY_ROWS) & (std[category] > 0)
+    z = np.zeros(len(expenses))
+    z[usable] = (amount[usable] - mean[category[usable]]) / std[category[usable]]
+
+    flagged = np.flatnonzero(z > threshold)
+    flagged = flagged[np.argsort(-z[flagged])][:MAX_ANOMALIES]
+    return [
+        {
+            "date": str(cols.day[expenses[i]]),
+            "description": cols.descriptions[cols.description[expenses[i]]],
+            "category": cols.categories[category[i]],
+            "amount": float(to_euros(amount[i])),
+            "category_average": float(to_euros(mean[category[i]])),
+            "z_score": round(float(z[i]), 2),
+        }
+        for i in flagged
+    ]
+
+
+# Months where a category's spending is far above its average over all months
+def month_anomalies(cols, months, matrix, threshold=2.0):
+    if len(months) < 3:
+        return []
+    mean = matrix.mean(axis=0)
+    std = matrix.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (matrix - mean) / std, 0)
+
+    rows, columns = np.nonzero(z > threshold)
+    order = np.argsort(-z[rows, columns])[:MAX_ANOMALIES]
+    return [
+        {
+            "month": str(months[rows[i]]),
+            "category": cols.categories[columns[i]],
+            "spent": float(to_euros(matrix[rows[i], columns[i]])),
+            "category_average": float(to_euros(mean[columns[i]])),
+            "z_score": round(float(z[rows[i], columns[i]]), 2),
+        }
+        for i in order
+    ]
+
+
+def analyse(cols, window=3):
+    if len(cols) == 0:
+        return {"transactions": 0, "months": [], "categories": [], "recurring": [],
+                "anomalies": {"transactions": [], "months": []}}
+
+    months, index = month_index(cols)
+    matrix = category_matrix(cols, months, index)
+    return {
+        "transactions": len(cols),
+        "months": monthly_series(cols, months, index, window),
+        "categories": category_trends(cols, months, matrix),
+        "recurring": recurring_payments(cols, months, index),
+        "anomalies": {
+            "transactions": transaction_anomalies(cols),
+            "months": month_anomalies(cols, months, matrix),
+        },
+    }
+
+
+def analyse_dashboards(docs, window=3):
+    return analyse(columns_from_dashboards(docs), window)
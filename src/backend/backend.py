@@ -1,24 +1,91 @@
 # imports needed for backend.py
 from unittest import result
 
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import pdfplumber
-import re
-from pymongo import MongoClient
 from datetime import datetime
 from fastapi import HTTPException
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
 from fastapi import Query
-from passlib.context import CryptContext
 from dotenv import load_dotenv
+from contextlib import aclosing, asynccontextmanager
 import os
+import asyncio
+import hashlib
+import json
+import logging
 
 # Load environment variables
 load_dotenv()
 
+from database import Database
+from pdf_engine import pdf_engine, PdfParseError
+from statement_parser import transaction_pattern, statement_month, PARSER_REVISION
+from parse_cache import ParseCache
+from keyword_matcher import CategoryMemo
+from category_rules import RuleStore
+from finbert_stage import finbert_stage
+from monthly_aggregates import MonthlyAggregates
+from pagination import list_projection, find_page, MAX_PAGE_SIZE
+from mongo_indexes import ensure_indexes, verify_query_plans
+from comparison import compare_dashboards, monthly_trend
+from llm_gateway import LlmGateway, reply_key
+from chat_context import ChatContextCache, CHAT_CONTEXT_SHARED
+from analytics import load_dashboards, analyse_dashboards
+from dashboard_storage import stored_dashboard, decode_dashboard, storage_projection
+from password_hasher import PasswordHasher, LoginLimiter
+from import_jobs import ImportJobs
+from observability import metrics, request_log, configure_logging, MetricsMiddleware
+from response_cache import ResponseCache
+
+# Leveled logging instead of print (LOG_LEVEL, LOG_SAMPLE_RATE, see observability.py)
+configure_logging()
+log = logging.getLogger(__name__)
+
+# Opens the Mongo connection pool and starts the PDF parsing workers with the app, stops them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.connect()
+    pdf_engine.start()
+    try:
+        await rule_store.seed()
+        await rule_store.load()
+    except Exception as e:
+        log.error("Could not load categorisation rules: %s", e)
+    try:
+        await parse_cache.purge_stale()
+    except Exception as e:
+        log.warning("Parse cache cleanup failed: %s", e)
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        log.error("Could not create indexes: %s", e)
+    # Diagnostic mode: refuse to start if any endpoint query would scan a whole collection
+    if MONGO_VERIFY_INDEXES:
+        failures = await verify_query_plans(db)
+        if failures:
+            raise RuntimeError(f"Queries without an index: {', '.join(failures)}")
+    password_hasher.start()
+    try:
+        await import_jobs.fail_unfinished()
+    except Exception as e:
+        log.warning("Could not clean up import jobs: %s", e)
+    import_jobs.start()
+    finbert_stage.start()
+    llm_gateway.start()
+    yield
+    await llm_gateway.stop()
+    await finbert_stage.stop()
+    await import_jobs.stop()
+    password_hasher.shutdown()
+    pdf_engine.shutdown()
+    await database.close()
+
 # Initialises FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allows requests from React frontend 
 app.add_middleware(
@@ -30,34 +97,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Times and counts every request for /metrics (added last, so it also times the CORS middleware)
+app.add_middleware(MetricsMiddleware)
+
 # MongoDB setup so that the uploaded dashboards can be stored
+# (async client with a connection pool, see database.py for the pool settings)
 MONGO_URI = os.getenv("MONGO_URI")
-client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
-
-try:
-    client.admin.command("ping")
-    print("MongoDB connected successfully")
-except Exception as e:
-    print("MongoDB CONNECTION ERROR:", e)
+database = Database(MONGO_URI)
      
-db = client["expense_db"] # creates the database expense_db
+db = database.db # creates the database expense_db
 users = db["users"] # creates a user collection in mongoDB
 dashboards = db["dashboards"] # creates a collection: dashboards
 budgets = db["budgets"] # creates a collection for budgets
 progress_reports = db["progress_reports"] # creates a collection to store budget progress reports
+parsed_statements = db["parsed_statements"] # caches the transactions parsed from each uploaded PDF
+category_rules = db["category_rules"] # global and per-user categorisation rules
+rules_meta = db["rules_meta"] # version stamp that changes whenever a rule is edited
+monthly_aggregates = db["monthly_aggregates"] # per-user, per-month totals for the history pages
+aggregate_users = db["aggregate_users"] # users whose monthly totals were built from their older data
+import_jobs_collection = db["import_jobs"] # progress of the bulk imports (see import_jobs.py)
+chat_contexts = db["chat_contexts"] # shared copy of the chat summaries (only with CHAT_CONTEXT_SHARED=1)
+response_versions = db["response_versions"] # per-user token in the ETags of the list endpoints (see response_cache.py)
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-MAX_PASSWORD_LENGTH = 72  # bcrypt limit
+aggregates = MonthlyAggregates(monthly_aggregates, dashboards, progress_reports, aggregate_users)
+
+# Financial summary of each user for the chat prompt, kept up to date by the write endpoints
+chat_context = ChatContextCache(dashboards, budgets, progress_reports, chat_contexts if CHAT_CONTEXT_SHARED else None)
+
+# ETags and encoded JSON of the read endpoints; the write endpoints bump the user's version
+response_cache = ResponseCache(response_versions)
+
+# Most statements accepted by one /upload-batch request
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", 24))
 
-def hash_password(password: str):
-    # Pass string directly, no manual encoding or truncation
-    return pwd_context.hash(password)
+# Set MONGO_VERIFY_INDEXES=1 to check the query plan of every endpoint at startup
+MONGO_VERIFY_INDEXES = os.getenv("MONGO_VERIFY_INDEXES") == "1"
 
-def verify_password(plain: str, hashed: str):
-    return pwd_context.verify(plain, hashed)
+# Password hashing setup (bcrypt on its own bounded executor, see password_hasher.py)
+password_hasher = PasswordHasher()
+login_limiter = LoginLimiter()
+MAX_PASSWORD_LENGTH = 72  # bcrypt limit
 
 @app.get("/ping")
 def ping():
@@ -65,7 +147,7 @@ def ping():
 
 # Register endpoint that will allow a user to create an account
 @app.post("/register")
-def register_user(payload: dict):
+async def register_user(payload: dict):
     email = payload.get("email")
     password = payload.get("password")
 
@@ -75,36 +157,58 @@ def register_user(payload: dict):
     if len(password.encode('utf-8')) > MAX_PASSWORD_LENGTH:
         raise HTTPException(400, "Password cannot be longer than 72 characters")
 
-    existing = users.find_one({"email": email})
+    existing = await users.find_one({"email": email})
     if existing:
         raise HTTPException(400, "Account already exists")
 
     user = {
         "email": email,
-        "password": hash_password(password),
+        "password": await password_hasher.hash(password), # bcrypt is slow, keep it off the event loop
         "createdAt": datetime.now().isoformat()
     }
 
-    users.insert_one(user)
+    await users.insert_one(user)
 
     return {"status": "ok"}
 
 # endpoint that allows user to login
 @app.post("/login")
-def login_user(payload: dict):
+async def login_user(payload: dict, request: Request):
     email = payload.get("email")
     password = payload.get("password")
 
-    user = users.find_one({"email": email})
-    if not user or not verify_password(password, user["password"]):
+    # Anything but strings cannot match an account (and would break the limiter's keys)
+    if not isinstance(email, str) or not isinstance(password, str):
+        raise HTTPException(401, "Invalid credentials")
+
+    # Too many attempts for this email or from this address: 429 before any bcrypt work
+    login_limiter.attempt(email, request.client.host if request.client else None)
+
+    user = await users.find_one({"email": email})
+    if not user or not password:
         raise HTTPException(401, "Invalid credentials")
 
+    valid, new_hash = await password_hasher.verify(password, user["password"])
+    if not valid:
+        raise HTTPException(401, "Invalid credentials")
+
+    login_limiter.succeeded(email)
+    # The hash was made with another BCRYPT_ROUNDS: store one with the current cost
+    if new_hash:
+        await users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+
     return {
         "userId": str(user["_id"]),
         "email": user["email"]
     }
 
+# Counters of the password hasher and the login attempt limiter
+@app.get("/login/stats")
+def get_login_stats():
+    return {"hasher": password_hasher.stats(), "limiter": login_limiter.stats()}
+
 # Keyword-based rule system for expense categorisation
+# These are the default global rules; the live rules are kept in the category_rules collection
 CATEGORIES = {
     "Groceries": ["tesco", "aldi", "lidl", "dunnes", "spar", "asialand"],
     "Transport": ["burkes bus", "irish rail", "transport for ireland", "tfi"],
@@ -114,120 +218,182 @@ CATEGORIES = {
     "Transfers": ["transfer to", "transfer from"],
 }
 
-# Function that catgeorises a single transaction's description using rules
-def categorise_description(text: str):
-    text = text.lower()
+# Compiled rule index, swapped in whenever the rules version stamp changes
+rule_store = RuleStore(category_rules, rules_meta, CATEGORIES)
 
-    # Loop through each category
-    for category, keywords in CATEGORIES.items():
-        # Check if any keyword appears in the text
-        if any(k in text for k in keywords):
+# Function that catgeorises a single transaction's description using rules
+# A matching override rule of the user wins, then the first global category
+# (in priority order) with a matching keyword, "Other" if nothing matched
+async def categorise_description(text: str, userId: str | None = None):
+    index = await rule_store.current()
+    user_matcher = index.user_matchers.get(userId)
+    if user_matcher:
+        category = user_matcher.match(text)
+        if category:
             return category
-    
-    # Default category if nothing matched
-    return "Other"
+    return index.global_matcher.match(text)
+
+# Categories of already seen merchant descriptions, shared by all requests
+category_memo = CategoryMemo()
+
+# Categorises many descriptions at once: each distinct merchant is only matched once
+async def categorise_batch(descriptions, userId: str | None = None):
+    index = await rule_store.current()
+    categories = category_memo.categorise_batch(index.global_matcher, descriptions)
+
+    # The user's own rules override the global ones
+    user_matcher = index.user_matchers.get(userId)
+    if user_matcher:
+        for i, description in enumerate(descriptions):
+            category = user_matcher.match(description)
+            if category:
+                categories[i] = category
+
+    return categories
+
+# Hit-rate of the merchant category memo
+@app.get("/category-cache/stats")
+def get_category_cache_stats():
+    return category_memo.stats()
+
+# Connection pool figures of the Mongo client
+@app.get("/mongo/stats")
+def get_mongo_stats():
+    return database.stats()
+
+# Batching figures of the FinBERT stage
+@app.get("/finbert/stats")
+def get_finbert_stats():
+    if not finbert_stage.enabled:
+        return {"enabled": False}
+    return {"enabled": True, **finbert_stage.batcher.stats()}
+
+# Converts the ObjectId of a rule document into a string
+def serialise_rule(rule):
+    rule["_id"] = str(rule["_id"])
+    return rule
+
+# Reads and validates the fields of a rule sent by the frontend
+def parse_rule_payload(payload: dict):
+    category = payload.get("category")
+    keywords = payload.get("keywords")
+
+    if not category or not isinstance(keywords, list) or not keywords:
+        raise HTTPException(400, "Category and a list of keywords required")
+
+    keywords = [str(k).strip().lower() for k in keywords if str(k).strip()]
+    if not keywords:
+        raise HTTPException(400, "Keywords cannot be empty")
+
+    return category, keywords
+
+# Lists the global rules and, if a userId is given, that user's override rules
+@app.get("/rules")
+async def get_rules(userId: str | None = Query(None)):
+    owners = [None, userId] if userId else [None]
+    records = category_rules.find({"userId": {"$in": owners}}).sort([("userId", 1), ("priority", 1)])
+    return [serialise_rule(r) async for r in records]
+
+# Creates a rule (global when no userId is sent, otherwise an override for that user)
+@app.post("/rules")
+async def create_rule(payload: dict):
+    category, keywords = parse_rule_payload(payload)
+    userId = payload.get("userId")
+    priority = payload.get("priority")
+
+    rule = {
+        "userId": userId,
+        "category": category,
+        "keywords": keywords,
+        "priority": priority if isinstance(priority, int) else await rule_store.next_priority(userId),
+        "updatedAt": datetime.utcnow().isoformat()
+    }
+    await category_rules.insert_one(rule)
+    await rule_store.bump()
 
-# Regex pattern to extract transactions from bank PDF text for example 12/11 Tesco -45.00
-transaction_pattern = re.compile(
-    r"(\d{1,2}\s+(?:\w{3}|\w+)\s+\d{4})\s+(.+?)\s+€?(\d+\.\d{2}|0\.00)\s+€?(\d+\.\d{2}|0\.00)"
-)
+    return serialise_rule(rule)
+
+# Updates the category, keywords or priority of a rule
+@app.put("/rules/{id}")
+async def update_rule(id: str, payload: dict):
+    if not ObjectId.is_valid(id):
+        raise HTTPException(404, "Rule not found")
 
+    category, keywords = parse_rule_payload(payload)
+    changes = {"category": category, "keywords": keywords, "updatedAt": datetime.utcnow().isoformat()}
+    if isinstance(payload.get("priority"), int):
+        changes["priority"] = payload["priority"]
 
-# GROUP 1 → date
-# GROUP 2 → description
-# GROUP 3 → amount (positive = income, negative = expense)
+    result = await category_rules.update_one({"_id": ObjectId(id)}, {"$set": changes})
+    if result.matched_count == 0:
+        raise HTTPException(404, "Rule not found")
+    await rule_store.bump()
 
-# Function that extracts transactions using the regex pattern above
-def extract_transactions(text: str):
-    transactions = []
+    return {"status": "ok"}
 
-    for match in transaction_pattern.finditer(text):
-        date, desc, money_out, money_in = match.groups()
+# Deletes a rule
+@app.delete("/rules/{id}")
+async def delete_rule(id: str):
+    if not ObjectId.is_valid(id):
+        raise HTTPException(404, "Rule not found")
 
-        money_out = float(money_out)
-        money_in = float(money_in)
-        desc_lower = desc.lower()
-        
-        if "pocket" in desc_lower:
-            continue    
-        
-        # Transfers via apple pay are now classed as income
-        if "apple pay top-up" in desc_lower or "apple pay top up" in desc_lower:
-            # money_out contains the real top-up amount
-            amount = money_out # classed as positive income
-            transactions.append({
-                "date": date,
-                "description": desc,
-                "amount": amount
-            })
-            continue
-
-        # Transfers from people should be classed as income
-        if "transfer from" in desc_lower:
-            amount = abs(money_out) # Revolut will print the actual transfer amount here
-            transactions.append({
-                "date": date,
-                "description": desc,
-                "amount": amount # classed as positive
-            })
-            continue
-        
-        # Transfers to people should be classed as outcome
-        if "transfer to" in desc_lower:
-            amount = -abs(money_out) # Revolut will print the actual transfer amount here
-            transactions.append({
-                "date": date,
-                "description": desc,
-                "amount": amount # classed as negative
-            })
-            continue
-        
-        # Determine actual transaction amount for regular transactions
-        if money_out > 0:
-            amount = -money_out
-        else:
-            amount = money_in  # true income (rare but possible)
+    result = await category_rules.delete_one({"_id": ObjectId(id)})
+    if result.deleted_count == 0:
+        raise HTTPException(404, "Rule not found")
+    await rule_store.bump()
 
-        transactions.append({
-            "date": date,
-            "description": desc,
-            "amount": amount
-        })
+    return {"status": "ok"}
+
+# Version stamp of the parsing rules: changes whenever the regex or the parser code change
+# (the cache holds the transactions before categorisation, so editing a category rule does not touch it)
+def parser_version():
+    rules = json.dumps({
+        "pattern": transaction_pattern.pattern,
+        "revision": PARSER_REVISION,
+    }, sort_keys=True)
+    return hashlib.sha256(rules.encode()).hexdigest()[:16]
+
+# Cache of parsed statements keyed by file hash + parser version
+parse_cache = ParseCache(parsed_statements, parser_version)
+
+# Reads the uploaded statement, reusing the cached parse if the same file was uploaded before
+async def read_statement(file: UploadFile):
+    return await parse_statement(await file.read())
+
+# Parses statement bytes in the PDF worker pool, or takes the transactions from the parse cache
+async def parse_statement(data: bytes):
+    key = parse_cache.key(data)
+
+    transactions = await parse_cache.get(key)
+    if transactions is None:
+        transactions = await pdf_engine.parse_statement(data)
+        await parse_cache.put(key, transactions)
 
     return transactions
 
-# FastAPI endpoint to receive the uploaded PDF file
-@app.post("/upload")
-async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
-    """
-    Main backend endpoint:
-    - Receives a PDF file from the React frontend
-    - Extracts all text using pdfplumber
-    - Uses regex to detect transactions
-    - Splits them into income vs outcome
-    - Categorises expenses using rules
-    - Returns structured JSON results
-    """
-    
-    # Extracts the PDF text
-    try:
-        with pdfplumber.open(file.file) as pdf:
-            # Joins text from all PDF pages
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-            print(text)
-    except  Exception as e:
-        return {"error": f"Could not read PDF: {e}"}
-    
-    # Extract transactions using regex
-    transactions = extract_transactions(text)
-    print(f"Extracted {len(transactions)} transactions")
-    if not transactions:
-        raise HTTPException(400, "No transactions found")
-           
+# Hit/miss counters of the parse cache
+@app.get("/parse-cache/stats")
+def get_parse_cache_stats():
+    return parse_cache.stats()
+
+# Adds a category to each expense, categorising the statement's merchants as one batch
+async def categorise_transactions(transactions, userId: str | None = None):
+    with metrics.span("categorisation"):
+        outcome = [tx for tx in transactions if tx["amount"] <= 0]
+        categories = await categorise_batch([tx["description"] for tx in outcome], userId)
+
+        for tx, category in zip(outcome, categories):
+            tx["category"] = category
+
+        # Expenses the rules left as "Other" go to the FinBERT model when it is enabled
+        await finbert_stage.refine(outcome, rule_store.index.global_matcher.categories)
+
+    return transactions
+
+# Builds the dashboard record of a parsed statement (income/outcome split, totals and category sums)
+async def build_dashboard(userId: str, transactions):
     # Bank statement timestamp (for dashboard storage) 
-    statement_month = transactions[0]["date"]
-    statement_month = statement_month.replace("Sept", "Sep")
-    statement_month = datetime.strptime(statement_month, "%d %b %Y").strftime("%Y-%m")
+    month = statement_month(transactions)
 
     # Structure that will be returned to frontend
     results = {
@@ -236,7 +402,7 @@ async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
     }
     
     # Classifies income/expense + Categorise
-    for tx in transactions:
+    for tx in await categorise_transactions(transactions, userId):
         amount = tx["amount"]
         
         if amount > 0:
@@ -244,8 +410,6 @@ async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
             results["income"].append(tx)
             
         else:
-            category = categorise_description(tx["description"])
-            tx["category"] = category
             results["outcome"].append(tx)
             
     # totals for dashboard storage
@@ -262,7 +426,7 @@ async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
     record = {
     "userId": userId, # dashboard belongs to the user that uploaded it
     "timestamp": datetime.now().isoformat(),
-    "statement_month": statement_month,
+    "statement_month": month,
     "income": results["income"],
     "outcome": results["outcome"],
     "total_income": total_income,
@@ -271,18 +435,187 @@ async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
     "categories": categoryTotals
 }
 
-    inserted = dashboards.insert_one(record)
+    return record
+
+# FastAPI endpoint to receive the uploaded PDF file
+@app.post("/upload")
+async def upload_file(userId: str = Form(...), file: UploadFile = File(...)):
+    """
+    Main backend endpoint:
+    - Receives a PDF file from the React frontend
+    - Streams the PDF pages through pdfplumber in the parsing worker pool
+    - Uses regex to detect transactions line by line
+    - Splits them into income vs outcome
+    - Categorises expenses using rules
+    - Returns structured JSON results
+    """
+    
+    # Extracts the transactions page by page in the parsing worker pool so the event loop stays free
+    # (a statement that was uploaded before comes straight from the parse cache)
+    try:
+        transactions = await read_statement(file)
+    except PdfParseError as e:
+        return {"error": f"Could not read PDF: {e}"}
+    
+    request_log.info("Extracted %d transactions", len(transactions))
+    if not transactions:
+        raise HTTPException(400, "No transactions found")
+
+    record = await build_dashboard(userId, transactions)
 
-    saved_record = dashboards.find_one({"_id": inserted.inserted_id})
+    # insert_one adds the new _id to what was stored, so the record is returned as is instead of being read back
+    # (stored as columns with DASHBOARD_STORAGE=columnar, see dashboard_storage.py)
+    stored = stored_dashboard(record)
+    await dashboards.insert_one(stored)
+    record["_id"] = stored["_id"]
+    await aggregates.record_dashboard(record) # keeps the monthly totals up to date
+    await chat_context.record_dashboard(record)
+    await response_cache.bump(userId)
 
     # Convert ObjectId → string
-    saved_record["_id"] = str(saved_record["_id"])
+    record["_id"] = str(record["_id"])
 
-    return saved_record
+    return record
+
+# Writes new dashboards with one unordered insert_many and the monthly totals with one bulk write
+# Adds the new _id to every record that was saved and returns the indexes of the ones that were not
+async def save_dashboards(records):
+    stored = [stored_dashboard(record) for record in records]
+    failed = set()
+    try:
+        await dashboards.insert_many(stored, ordered=False)
+    except BulkWriteError as e:
+        # Unordered: every other record was still written
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+
+    saved = []
+    for i, (record, doc) in enumerate(zip(records, stored)):
+        if i not in failed:
+            record["_id"] = doc["_id"]
+            saved.append(record)
+
+    await aggregates.record_dashboards(saved) # keeps the monthly totals up to date
+    for record in saved:
+        await chat_context.record_dashboard(record)
+    for user_id in {record["userId"] for record in saved}:
+        await response_cache.bump(user_id)
+    return failed
+
+# Upload several statements in one request (e.g. a year of PDFs at once)
+# The statements are parsed side by side, every dashboard is written with one unordered insert_many
+# and the monthly totals with one bulk write. A statement that cannot be read is listed in "errors"
+# and does not stop the others.
+@app.post("/upload-batch")
+async def upload_batch(userId: str = Form(...), files: list[UploadFile] = File(...)):
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(400, f"At most {UPLOAD_BATCH_MAX_FILES} statements per request")
+
+    # At most one statement per parsing worker at a time, so a big batch does not fill the queue on its own
+    slots = asyncio.Semaphore(pdf_engine.workers)
+
+    async def read_one(file: UploadFile):
+        async with slots:
+            return await read_statement(file)
+
+    parsed = await asyncio.gather(*(read_one(file) for file in files), return_exceptions=True)
+
+    records = []
+    filenames = []
+    errors = []
+    for file, transactions in zip(files, parsed):
+        if isinstance(transactions, PdfParseError):
+            errors.append({"filename": file.filename, "error": f"Could not read PDF: {transactions}"})
+        elif isinstance(transactions, HTTPException):
+            # the parsing pool was busy (503) or the statement took too long (504)
+            errors.append({"filename": file.filename, "error": transactions.detail})
+        elif isinstance(transactions, BaseException):
+            raise transactions
+        elif not transactions:
+            errors.append({"filename": file.filename, "error": "No transactions found"})
+        else:
+            records.append(await build_dashboard(userId, transactions))
+            filenames.append(file.filename)
+
+    request_log.info("Batch upload: %d statements read, %d failed", len(records), len(errors))
+
+    if records:
+        failed = await save_dashboards(records)
+        for i in sorted(failed):
+            errors.append({"filename": filenames[i], "error": "Could not save dashboard"})
+        records = [record for i, record in enumerate(records) if i not in failed]
+
+    for record in records:
+        record["_id"] = str(record["_id"])
+
+    return {"dashboards": records, "errors": errors}
+
+# Bulk import: the statements are read by background workers and the job is polled (see import_jobs.py)
+import_jobs = ImportJobs(import_jobs_collection, dashboards, parse_statement, build_dashboard, save_dashboards)
+
+def serialise_job(job):
+    job = dict(job)
+    job["jobId"] = job.pop("_id")
+    job["statements"] = [{k: v for k, v in entry.items() if k != "hash"} for entry in job["statements"]]
+    return job
+
+# Accepts any number of PDFs or ZIP files of PDFs and answers with the job straight away
+@app.post("/import", status_code=202)
+async def import_statements(userId: str = Form(...), files: list[UploadFile] = File(...)):
+    uploads = [(file.filename, await file.read()) for file in files]
+    job = await import_jobs.submit(userId, uploads)
+    log.info("Import %s: %d statements queued", job["_id"], job["total"])
+    return serialise_job(job)
+
+@app.get("/import/stats")
+def get_import_stats():
+    return import_jobs.stats()
+
+@app.get("/import/{job_id}")
+async def get_import(job_id: str):
+    job = await import_jobs.status(job_id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return serialise_job(job)
+
+# Lightweight history: the totals and category sums of each month (no transactions)
+@app.get("/history-summary")
+async def get_history_summary(request: Request, userId: str, month: int | None = Query(None),
+                              year: int | None = Query(None)):
+    month_prefix = None
+    if year:
+        month_prefix = f"{year}-{month:02d}" if month else str(year)
+
+    async def load():
+        return await aggregates.summary(userId, month_prefix), {}
+    return await response_cache.listing(request, userId, load)
+
+# Sort orders of the list endpoints (the cursor is built from these keys)
+HISTORY_SORT = [("statement_month", 1), ("_id", 1)]
+PROGRESS_SORT = [("statement_month", 1), ("_id", 1)]
+BUDGET_SORT = [("month", -1), ("_id", -1)]
+
+# Fields returned with summary=true: everything the list pages show, without the transaction arrays
+DASHBOARD_SUMMARY_FIELDS = ["statement_month", "timestamp", "total_income", "total_outcome", "net_balance", "categories"]
+PROGRESS_SUMMARY_FIELDS = ["statement_month", "timestamp", "budgetMonth", "currentTotal", "budgetTotal", "overallOverUnder"]
+
+# The header with the cursor of the next page (if there is one), cached with the page
+def next_cursor_headers(next_cursor):
+    return {"X-Next-Cursor": next_cursor} if next_cursor else {}
 
 # history endpoint to retrieve all stored dashboards
+# Optional: fields=a,b / summary=true to leave out the transactions, limit + cursor to read one page at a time
+# (answered from the response cache while the user has not written anything, see response_cache.py)
 @app.get("/history")
-def get_history(userId: str, month: int | None = Query(None), year: int | None = Query(None)):
+async def get_history(
+    request: Request,
+    userId: str,
+    month: int | None = Query(None),
+    year: int | None = Query(None),
+    fields: str | None = Query(None),
+    summary: bool = Query(False),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+):
     filter_query = {"userId": userId}
 
     # If a month + year were passed
@@ -295,43 +628,90 @@ def get_history(userId: str, month: int | None = Query(None), year: int | None =
         # So we filter by prefix "2025-12"
         filter_query["statement_month"] = f"{year_str}-{month_str}"
     
-    records = list(dashboards.find(filter_query))
-    for r in records:
-        r["_id"] = str(r["_id"])
-    return records
+    projection = list_projection(fields, summary, DASHBOARD_SUMMARY_FIELDS, HISTORY_SORT)
+
+    async def load():
+        records, next_cursor = await find_page(dashboards, filter_query, HISTORY_SORT, storage_projection(projection),
+                                               limit, cursor)
+        return [decode_dashboard(record) for record in records], next_cursor_headers(next_cursor)
+    return await response_cache.listing(request, userId, load)
 
 # endpoint to retrieve a specific dashboard by its ID
+# Dashboards never change, so the response is immutable: ETag + 304, and the JSON is cached (see response_cache.py)
 @app.get("/history/{id}")
-def get_dashboard(id: str):
-    data = dashboards.find_one({"_id": ObjectId(id)}, {"_id": 0})
-    if not data:
+async def get_dashboard(request: Request, id: str):
+    async def load():
+        data = await dashboards.find_one({"_id": ObjectId(id)}, {"_id": 0})
+        if not data:
+            raise HTTPException(status_code=404, detail="Dashboard not found")
+        return decode_dashboard(data)
+    return await response_cache.document(request, "dashboard", id, load)
+
+# Compares two of the user's dashboards: totals, their differences (first - second) and category sums
+# side by side, computed in Mongo so the transactions of the two months are never sent
+@app.get("/compare")
+async def compare(userId: str, first: str, second: str):
+    if not ObjectId.is_valid(first) or not ObjectId.is_valid(second):
         raise HTTPException(status_code=404, detail="Dashboard not found")
-    return data
 
-# Get all progress reports
+    result = await compare_dashboards(dashboards, userId, ObjectId(first), ObjectId(second))
+    if not result:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return result
+
+# Multi-month trend from the monthly totals: month-on-month changes, running net balance and category series
+# Optional: start / end as "YYYY-MM" to limit the range
+@app.get("/compare/trend")
+async def compare_trend(request: Request, userId: str, start: str | None = Query(None), end: str | None = Query(None)):
+    async def load():
+        await aggregates.ensure_built(userId)
+        return await monthly_trend(monthly_aggregates, userId, start, end), {}
+    return await response_cache.listing(request, userId, load)
+
+# Cross-month analytics of the user's transactions: rolling averages, category trends,
+# recurring payments and anomalies (window = months in the rolling averages)
+@app.get("/analytics")
+async def get_analytics(request: Request, userId: str, window: int = Query(3, ge=1, le=24)):
+    async def load():
+        docs = await load_dashboards(dashboards, userId)
+        # Building the arrays is CPU work, so it runs in the threadpool instead of on the event loop
+        return await run_in_threadpool(analyse_dashboards, docs, window), {}
+    return await response_cache.listing(request, userId, load)
+
+# Get all progress reports (same fields/summary/limit/cursor options as /history)
 @app.get("/progress-history")
-def get_progress_history(userId: str):
-    records = list(progress_reports.find({"userId": userId}))
-    
-    for r in records:
-        r["_id"] = str(r["_id"])
-    
-    return records
+async def get_progress_history(
+    request: Request,
+    userId: str,
+    fields: str | None = Query(None),
+    summary: bool = Query(False),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+):
+    projection = list_projection(fields, summary, PROGRESS_SUMMARY_FIELDS, PROGRESS_SORT)
+
+    async def load():
+        records, next_cursor = await find_page(progress_reports, {"userId": userId}, PROGRESS_SORT, projection,
+                                               limit, cursor)
+        return records, next_cursor_headers(next_cursor)
+    return await response_cache.listing(request, userId, load)
 
 
-# Get single progress report
+# Get single progress report (immutable like /history/{id})
 @app.get("/progress-history/{id}")
-def get_single_progress(id: str):
-    data = progress_reports.find_one({"_id": ObjectId(id)})
-    
-    if not data:
-        raise HTTPException(status_code=404, detail="Progress report not found")
-    
-    data["_id"] = str(data["_id"])
-    return data
+async def get_single_progress(request: Request, id: str):
+    async def load():
+        data = await progress_reports.find_one({"_id": ObjectId(id)})
+
+        if not data:
+            raise HTTPException(status_code=404, detail="Progress report not found")
+
+        data["_id"] = str(data["_id"])
+        return data
+    return await response_cache.document(request, "progress", id, load)
   
 @app.post("/save-budget")
-def save_budget(payload: dict):
+async def save_budget(payload: dict):
     userId = payload.get("userId")
     # Extract month from timestamp-like input
     # (e.g. "2025-12", "2025-12-09T15:33:20")
@@ -344,7 +724,7 @@ def save_budget(payload: dict):
 
 
     # Upsert (update or insert new)
-    budgets.update_one(
+    await budgets.update_one(
     {"userId": userId, "month": month},
     {
         "$set": {
@@ -357,19 +737,21 @@ def save_budget(payload: dict):
     },
     upsert=True
 )
+    await chat_context.record_budget({"userId": userId, "month": month, "totalBudget": total, "categories": categories})
+    await response_cache.bump(userId)
 
     return {"status": "ok"}
 
 # Endpoint that checks if the user has at least one saved budget
 # Endpoint to get a specific budget for a month
 @app.get("/get-budget")
-def get_budget(userId: str, month: str = Query(None)):
+async def get_budget(userId: str, month: str = Query(None)):
     if month:
         # Get budget for specific month
-        budget = budgets.find_one({"userId": userId, "month": month})
+        budget = await budgets.find_one({"userId": userId, "month": month})
     else:
         # Get the most recent budget
-        budget = budgets.find_one({"userId": userId}, sort=[("month", -1)])
+        budget = await budgets.find_one({"userId": userId}, sort=[("month", -1)])
     
     if not budget:
         return {"hasBudget": False}
@@ -379,7 +761,7 @@ def get_budget(userId: str, month: str = Query(None)):
     return budget
 
 @app.post("/save-budget")
-def save_budget(payload: dict):
+async def save_budget(payload: dict):
     userId = payload.get("userId")
     month = payload.get("month")
     total = payload.get("totalBudget")
@@ -389,7 +771,7 @@ def save_budget(payload: dict):
         raise HTTPException(400, "Month and userId required")
 
     # Upsert (update or insert new)
-    result = budgets.update_one(
+    result = await budgets.update_one(
         {"userId": userId, "month": month},
         {
             "$set": {
@@ -402,6 +784,8 @@ def save_budget(payload: dict):
         },
         upsert=True
     )
+    await chat_context.record_budget({"userId": userId, "month": month, "totalBudget": total, "categories": categories})
+    await response_cache.bump(userId)
 
     return {
         "status": "ok",
@@ -409,13 +793,13 @@ def save_budget(payload: dict):
     }
     
 @app.get("/has-budget")
-def has_budget(userId: str, month: str | None = Query(None)):
+async def has_budget(userId: str, month: str | None = Query(None)):
     if month:
         # Check specific month
-        budget = budgets.find_one({"userId": userId, "month": month})
+        budget = await budgets.find_one({"userId": userId, "month": month})
     else:
         # Check if user has ANY budget
-        budget = budgets.find_one({"userId": userId})
+        budget = await budgets.find_one({"userId": userId})
 
     return {
         "hasBudget": budget is not None
@@ -428,29 +812,24 @@ async def upload_progress(
     userId: str = Form(...), 
     file: UploadFile = File(...)
 ):
-    # Reads the PDF file
+    # Reads the PDF file in the parsing worker pool
     try:
-        with pdfplumber.open(file.file) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-    except Exception as e:
+        transactions = await read_statement(file)
+    except PdfParseError as e:
         raise HTTPException(400, f"PDF error: {e}")
 
-    transactions = extract_transactions(text)
-
     if not transactions:
         raise HTTPException(400, "No transactions found")
 
     # Detect current statement month
-    statement_month = transactions[0]["date"]
-    statement_month = statement_month.replace("Sept", "Sep")
-    current_month = datetime.strptime(statement_month, "%d %b %Y").strftime("%Y-%m")
+    current_month = statement_month(transactions)
 
     # Get user's budget for THIS specific month (or most recent if not found)
-    budget = budgets.find_one({"userId": userId, "month": current_month})
+    budget = await budgets.find_one({"userId": userId, "month": current_month})
     
     if not budget:
         # Try to get the most recent budget
-        budget = budgets.find_one({"userId": userId}, sort=[("month", -1)])
+        budget = await budgets.find_one({"userId": userId}, sort=[("month", -1)])
     
     if not budget:
         raise HTTPException(404, "No budget set. Please set a budget first.")
@@ -458,11 +837,10 @@ async def upload_progress(
     # Process current month like normal
     results = {"income": [], "outcome": []}
 
-    for tx in transactions:
+    for tx in await categorise_transactions(transactions, userId):
         if tx["amount"] > 0:
             results["income"].append(tx)
         else:
-            tx["category"] = categorise_description(tx["description"])
             results["outcome"].append(tx)
 
     total_income = sum(tx["amount"] for tx in results["income"])
@@ -510,61 +888,65 @@ async def upload_progress(
     "categories": category_comparison
 }
 
-    inserted = progress_reports.insert_one(record)
+    await progress_reports.insert_one(record)
+    await aggregates.record_progress(record) # keeps the monthly totals up to date
+    await chat_context.record_progress(record)
+    await response_cache.bump(userId)
 
-    saved_record = progress_reports.find_one({"_id": inserted.inserted_id})
-    saved_record["_id"] = str(saved_record["_id"])
+    record["_id"] = str(record["_id"])
 
-    return saved_record
+    return record
 
-    
-import requests
-from fastapi import HTTPException
 
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
-HF_MODEL_URL = "https://router.huggingface.co/v1/chat/completions"
-
-headers = {
-    "Authorization": f"Bearer {HF_API_TOKEN}",
-    "Content-Type": "application/json"
-}
-
+# Can be pointed at benchmarks/llm_stub.py to load test the chat offline
+HF_MODEL_URL = os.getenv("HF_MODEL_URL", "https://router.huggingface.co/v1/chat/completions")
+
+# Pooled async client for the model with coalescing and a reply cache (see llm_gateway.py)
+llm_gateway = LlmGateway(HF_MODEL_URL, HF_API_TOKEN)
+
+# Hit-rate of the per-user chat summaries
+@app.get("/chat-context/stats")
+def get_chat_context_stats():
+    return chat_context.stats()
+
+# Cache and coalescing figures of the model gateway
+@app.get("/finance-chat/stats")
+def get_finance_chat_stats():
+    return llm_gateway.stats()
+
+# Server-sent events of the streaming mode: {"delta": text} for each piece of the reply,
+# then {"done": true} (or {"error": message} if the model failed part way)
+async def chat_events(request: Request, payload: dict, key: str):
+    async with aclosing(llm_gateway.stream(payload, key)) as pieces:
+        try:
+            async for piece in pieces:
+                # Stop reading from the model as soon as the browser has gone away
+                if await request.is_disconnected():
+                    return
+                yield f"data: {json.dumps({'delta': piece})}\n\n"
+        except HTTPException as e:
+            yield f"data: {json.dumps({'error': e.detail})}\n\n"
+            return
+        except Exception as e:
+            log.exception("Chat stream failed")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+
+    yield f"data: {json.dumps({'done': True})}\n\n"
+
+# Send "stream": true to get the reply as server-sent events while it is being generated
 @app.post("/finance-chat")
-async def chat_with_llm(data: dict):
+async def chat_with_llm(data: dict, request: Request):
     user_message = data.get("message")
     user_id = data.get("userId")
 
     if not user_message or not user_id:
         raise HTTPException(status_code=400, detail="Missing data")
 
-    latest_dashboard = dashboards.find_one({"userId": user_id}, sort=[("statement_month", -1)])
-    latest_budget = budgets.find_one({"userId": user_id}, sort=[("month", -1)])
-    latest_progress = progress_reports.find_one({"userId": user_id}, sort=[("statement_month", -1)])
-
-    context = "User financial summary:\n"
-
-    if latest_dashboard:
-        context += f"- Last month income: €{latest_dashboard['total_income']:.2f}\n"
-        context += f"- Last month spending: €{latest_dashboard['total_outcome']:.2f}\n"
-        context += f"- Net balance: €{latest_dashboard['net_balance']:.2f}\n"
-        if "categories" in latest_dashboard:
-            top_cat = max(latest_dashboard["categories"], key=latest_dashboard["categories"].get)
-            context += f"- Top spending category: {top_cat}\n"
-            context += "- Spending by category:\n"
-            for cat, amount in latest_dashboard["categories"].items():
-                context += f"  - {cat}: €{amount:.2f}\n"
-
-    if latest_budget:
-        context += f"- Monthly budget total: €{latest_budget['totalBudget']:.2f}\n"
-        if "categories" in latest_budget:
-            context += "- Budget by category:\n"
-            for cat, amount in latest_budget["categories"].items():
-                context += f"  - {cat}: €{amount:.2f}\n"
-
-    if latest_progress:
-        over_under = latest_progress["overallOverUnder"]
-        status = "over budget" if over_under > 0 else "under budget"
-        context += f"- Currently {status} by €{abs(over_under):.2f}\n"
+    # Cached summary of the user's latest dashboard, budget and progress report
+    # (no database call unless the user's data changed since their last message)
+    context = await chat_context.get(user_id)
 
     payload = {
         "model": "Qwen/Qwen2.5-72B-Instruct",
@@ -586,46 +968,61 @@ Be concise, friendly, and practical. Always refer to amounts in euros (€).
         "temperature": 0.7
     }
 
-    try:
-        response = requests.post(HF_MODEL_URL, headers=headers, json=payload, timeout=60)
-
-        print("STATUS CODE:", response.status_code)
-        print("RAW RESPONSE:", repr(response.text))
-
-        # Check for non-200 status before trying to parse JSON
-        if response.status_code == 404:
-            raise HTTPException(500, "Model endpoint not found - check the URL")
-        
-        if response.status_code == 503 or not response.text.strip():
-            return {"response": "The AI model is warming up. Please wait 20 seconds and try again."}
-
-        if response.status_code != 200:
-            return {"response": f"HuggingFace returned status {response.status_code}: {response.text}"}
+    key = reply_key(context, user_message)
 
-        result = response.json()
-        print("HF RESPONSE:", result)
+    if data.get("stream"):
+        return StreamingResponse(
+            chat_events(request, payload, key),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-        if isinstance(result, dict) and "error" in result:
-            error_msg = result["error"]
-            if "loading" in error_msg.lower():
-                return {"response": "The AI model is loading. Please wait 20 seconds and try again."}
-            raise HTTPException(500, f"HuggingFace error: {error_msg}")
-
-        reply = result["choices"][0]["message"]["content"]
-        return {"response": reply}
+    try:
+        # Identical questions about unchanged data are answered from the cache or share one model call
+        return await llm_gateway.complete(payload, key)
 
     except HTTPException:
         raise
     except Exception as e:
-        print("ERROR:", e)
+        log.exception("Chat request failed")
         raise HTTPException(500, str(e))
     
     
+# Budgets newest month first (fields/limit/cursor work like /history)
 @app.get("/budget-history")
-def get_budget_history(userId: str):
-    records = list(budgets.find({"userId": userId}).sort("month", -1))
-    
-    for r in records:
-        r["_id"] = str(r["_id"])
-    
-    return records
+async def get_budget_history(
+    request: Request,
+    userId: str,
+    fields: str | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+):
+    projection = list_projection(fields, False, [], BUDGET_SORT)
+
+    async def load():
+        records, next_cursor = await find_page(budgets, {"userId": userId}, BUDGET_SORT, projection, limit, cursor)
+        return records, next_cursor_headers(next_cursor)
+    return await response_cache.listing(request, userId, load)
+
+# Hit-rate of the cached read responses and the 304s sent (see response_cache.py)
+@app.get("/response-cache/stats")
+def get_response_cache_stats():
+    return response_cache.stats()
+
+# The counters of the /x/stats endpoints, exported with the request and stage metrics
+metrics.register_stats("pdf_engine", lambda: {"workers": pdf_engine.workers, "inFlight": pdf_engine.in_flight})
+metrics.register_stats("parse_cache", get_parse_cache_stats)
+metrics.register_stats("category_cache", get_category_cache_stats)
+metrics.register_stats("mongo", get_mongo_stats)
+metrics.register_stats("finbert", get_finbert_stats)
+metrics.register_stats("password_hasher", password_hasher.stats)
+metrics.register_stats("login_limiter", login_limiter.stats)
+metrics.register_stats("import", get_import_stats)
+metrics.register_stats("chat_context", get_chat_context_stats)
+metrics.register_stats("finance_chat", get_finance_chat_stats)
+metrics.register_stats("response_cache", get_response_cache_stats)
+
+# Prometheus scrape endpoint (text exposition format)
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
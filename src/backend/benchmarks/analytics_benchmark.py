@@ -0,0 +1,97 @@
+# Benchmark: /analytics over one user's whole history, NumPy columns vs plain Python loops
+#
+# Run from src/backend:
+#   python benchmarks/analytics_benchmark.py --months 500 --rows 2000
+#
+# Builds the dashboards in memory (1M transactions with the defaults) and times
+# the two steps of /analytics separately: turning the documents into columns,
+# and the analysis itself. The loop version computes the monthly totals,
+# category totals and per-merchant/per-category statistics the way a list of
+# dicts would be walked, and both are checked to agree on the monthly totals.
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analyse, columns_from_dashboards
+from seed_data import make_dashboard, month_list
+
+
+def loop_analysis(docs):
+    months = {}
+    categories = {}
+    merchants = {}
+    per_category = {}
+    for doc in docs:
+        for tx in doc["income"] + doc["outcome"]:
+            month = datetime.strptime(tx["date"].replace("Sept", "Sep"), "%d %b %Y").strftime("%Y-%m")
+            totals = months.setdefault(month, [0.0, 0.0])
+            if tx["amount"] > 0:
+                totals[0] += tx["amount"]
+                continue
+            totals[1] += -tx["amount"]
+            category = tx["category"]
+            categories.setdefault(category, {}).setdefault(month, 0.0)
+            categories[category][month] += -tx["amount"]
+            merchants.setdefault(tx["description"], []).append((tx["date"], -tx["amount"], month))
+            per_category.setdefault(category, []).append(-tx["amount"])
+
+    recurring = {}
+    for description, payments in merchants.items():
+        amounts = [amount for _, amount, _ in payments]
+        mean = sum(amounts) / len(amounts)
+        spread = math.sqrt(sum((a - mean) ** 2 for a in amounts) / len(amounts))
+        recurring[description] = (len({month for _, _, month in payments}), spread / mean)
+
+    anomalies = []
+    for category, amounts in per_category.items():
+        mean = sum(amounts) / len(amounts)
+        spread = math.sqrt(sum((a - mean) ** 2 for a in amounts) / len(amounts))
+        anomalies.extend(a for a in amounts if spread and (a - mean) / spread > 3)
+
+    return months, categories, recurring, anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    docs = [make_dashboard("bench", month, args.rows, rng) for month in month_list(args.months)]
+    count = sum(len(d["income"]) + len(d["outcome"]) for d in docs)
+    print(f"{args.months} months, {count} transactions")
+
+    def best(fn):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    cols, build_s = best(lambda: columns_from_dashboards(docs))
+    result, analyse_s = best(lambda: analyse(cols))
+    loop, loop_s = best(lambda: loop_analysis(docs))
+
+    print(f"columns from dashboards: {build_s * 1000:.0f} ms")
+    print(f"numpy analysis:          {analyse_s * 1000:.0f} ms")
+    print(f"python loops:            {loop_s * 1000:.0f} ms ({loop_s / analyse_s:.1f}x the analysis, "
+          f"{loop_s / (build_s + analyse_s):.1f}x end to end)")
+
+    expected = {month: (round(i, 2), round(o, 2)) for month, (i, o) in loop[0].items()}
+    got = {m["month"]: (m["income"], m["outcome"]) for m in result["months"]}
+    mismatched = [m for m in expected if abs(expected[m][0] - got[m][0]) > 0.01 or abs(expected[m][1] - got[m][1]) > 0.01]
+    print(f"monthly totals agree: {not mismatched} ({len(got)} months)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Microbenchmark: nested keyword scan vs the compiled KeywordMatcher
+#
+# Run from src/backend:
+#   python benchmarks/categorise_match.py --keywords 10000 --descriptions 1000000
+#
+# The old scan is far too slow to run over every description with thousands of
+# keywords, so it is timed on a sample and extrapolated. The matcher runs over
+# all descriptions, and both are checked to agree on the sample.
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher
+
+
+def nested_scan(rules, text):
+    text = text.lower()
+    for category, keywords in rules.items():
+        if any(k in text for k in keywords):
+            return category
+    return "Other"
+
+
+def build_rules(keyword_count, categories, rng):
+    rules = {f"Category {i}": [] for i in range(categories)}
+    names = list(rules)
+    for _ in range(keyword_count):
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        rules[rng.choice(names)].append(word)
+    return rules
+
+
+def build_descriptions(count, rules, rng):
+    keywords = [k for words in rules.values() for k in words]
+    descriptions = []
+    for _ in range(count):
+        filler = "".join(rng.choice(string.ascii_letters + " ") for _ in range(rng.randint(8, 30)))
+        # About half of the descriptions contain a known merchant keyword
+        if rng.random() < 0.5:
+            descriptions.append(f"{filler} {rng.choice(keywords).title()} Dublin")
+        else:
+            descriptions.append(filler)
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--descriptions", type=int, default=1000000)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = build_rules(args.keywords, args.categories, rng)
+    descriptions = build_descriptions(args.descriptions, rules, rng)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(rules)
+    build_seconds = time.perf_counter() - start
+
+    sample = descriptions[:args.sample]
+    start = time.perf_counter()
+    expected = [nested_scan(rules, d) for d in sample]
+    scan_per_row = (time.perf_counter() - start) / len(sample)
+
+    assert [matcher.match(d) for d in sample] == expected, "matcher disagrees with the nested scan"
+
+    start = time.perf_counter()
+    for d in descriptions:
+        matcher.match(d)
+    matcher_seconds = time.perf_counter() - start
+
+    print(f"{args.keywords} keywords, {args.descriptions} descriptions")
+    print(f"matcher build:   {build_seconds:.2f} s")
+    print(f"nested scan:     {scan_per_row * 1e6:.1f} us/row, "
+          f"~{scan_per_row * args.descriptions:.0f} s for all rows (from {len(sample)} samples)")
+    print(f"compiled matcher: {matcher_seconds / len(descriptions) * 1e6:.1f} us/row, "
+          f"{matcher_seconds:.1f} s for all rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Latency and throughput of /finance-chat under load
+#
+# Run the backend against benchmarks/llm_stub.py (see that file), then e.g.:
+#   python benchmarks/chat_load.py --user-id <id> --clients 50 --repeat-ratio 0.5
+#
+# Each client sends --messages questions; --repeat-ratio of them are drawn from
+# a small set of common questions (cache hits / coalesced calls), the rest are
+# unique. Prints p50/p99 latency, requests/s and the gateway counters.
+import argparse
+import random
+import statistics
+import threading
+import time
+
+import requests
+
+from upload_load import percentile
+
+COMMON_QUESTIONS = [
+    "How can I save more money?",
+    "Where am I overspending?",
+    "Am I on track with my budget?",
+    "What is my biggest expense?",
+]
+
+
+def client_loop(base_url, user_id, messages, repeat_ratio, seed, samples, errors):
+    rng = random.Random(seed)
+    session = requests.Session()
+    for i in range(messages):
+        if rng.random() < repeat_ratio:
+            question = rng.choice(COMMON_QUESTIONS)
+        else:
+            question = f"Question {seed}-{i}: how much did I spend on groceries?"
+        start = time.perf_counter()
+        response = session.post(
+            f"{base_url}/finance-chat", json={"userId": user_id, "message": question}, timeout=120
+        )
+        if response.status_code == 200:
+            samples.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(response.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--repeat-ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    samples, errors = [], []
+    threads = [
+        threading.Thread(target=client_loop, args=(
+            args.base_url, args.user_id, args.messages, args.repeat_ratio, n, samples, errors
+        ))
+        for n in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(samples)} ok, {len(errors)} failed in {elapsed:.1f}s ({len(samples) / elapsed:.1f} req/s)")
+    if samples:
+        print(f"p50 {percentile(samples, 50):.0f} ms, p99 {percentile(samples, 99):.0f} ms, "
+              f"mean {statistics.mean(samples):.0f} ms")
+    print("gateway:", requests.get(f"{args.base_url}/finance-chat/stats", timeout=10).json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Time to first token of /finance-chat: streaming vs waiting for the whole reply
+#
+# Run the backend against benchmarks/llm_stub.py (see that file), then e.g.:
+#   python benchmarks/chat_ttft.py --user-id <id> --runs 20
+#
+# Every run uses a new question so the reply cache is not hit. The last phase
+# closes each stream after the first piece and reads the stub's counters to
+# check that the upstream stream was cancelled too.
+import argparse
+import json
+import time
+import uuid
+
+import requests
+
+from upload_load import percentile
+
+
+def ask(session, base_url, user_id, stream, close_after_first=False):
+    question = f"How can I save more money? ({uuid.uuid4().hex[:8]})"
+    start = time.perf_counter()
+    response = session.post(
+        f"{base_url}/finance-chat",
+        json={"userId": user_id, "message": question, "stream": stream},
+        stream=stream,
+        timeout=120,
+    )
+    if not stream:
+        response.json()
+        elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, elapsed
+
+    first = None
+    for line in response.iter_lines():
+        if not line.startswith(b"data:"):
+            continue
+        event = json.loads(line[len(b"data:"):])
+        if "delta" in event and first is None:
+            first = (time.perf_counter() - start) * 1000
+            if close_after_first:
+                response.close()
+                break
+        if "done" in event or "error" in event:
+            break
+    return first, (time.perf_counter() - start) * 1000
+
+
+def report(label, samples):
+    print(f"{label}: p50 {percentile(samples, 50):.0f} ms, p99 {percentile(samples, 99):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stub-url", default="http://127.0.0.1:8100")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    session = requests.Session()
+
+    full = [ask(session, args.base_url, args.user_id, stream=False) for _ in range(args.runs)]
+    report("without streaming, reply shown after", [total for _, total in full])
+
+    streamed = [ask(session, args.base_url, args.user_id, stream=True) for _ in range(args.runs)]
+    report("streaming, first token after", [first for first, _ in streamed])
+    report("streaming, whole reply after", [total for _, total in streamed])
+
+    before = requests.get(f"{args.stub_url}/stats", timeout=10).json()
+    for _ in range(args.runs):
+        ask(session, args.base_url, args.user_id, stream=True, close_after_first=True)
+        session = requests.Session()  # the closed stream's connection cannot be reused
+    time.sleep(1)
+    after = requests.get(f"{args.stub_url}/stats", timeout=10).json()
+    print(f"closed {args.runs} streams after the first token: "
+          f"{after['streams_cancelled'] - before['streams_cancelled']} upstream streams cancelled, "
+          f"{after['tokens_sent'] - before['tokens_sent']} tokens sent upstream")
+
+
+if __name__ == "__main__":
+    main()
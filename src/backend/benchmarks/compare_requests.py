@@ -0,0 +1,87 @@
+# Bytes and latency of comparing two dashboards: /compare vs the old three-request flow
+#
+# The old comparison page fetched the dashboard list and then both complete
+# dashboards from /history/{id} to diff them in the browser. Seeds a throw-away
+# user into the database in MONGO_URI, measures both against a running
+# backend, then deletes the user again. Run from src/backend:
+#   python benchmarks/compare_requests.py --months 120 --rows 200
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import requests
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed_data import remove_user, seed_user
+
+
+def timed_flow(session, calls, repeat):
+    sizes, times = [], []
+    for _ in range(repeat):
+        total = 0
+        start = time.perf_counter()
+        for url, params in calls:
+            response = session.get(url, params=params, timeout=120)
+            response.raise_for_status()
+            total += len(response.content)
+        times.append((time.perf_counter() - start) * 1000)
+        sizes.append(total)
+    return sizes[-1], statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--months", type=int, default=120)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))["expense_db"]
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    seed_user(db, user_id, args.months, args.rows)
+
+    session = requests.Session()
+    base = args.base_url
+    try:
+        listing = session.get(f"{base}/history", params={"userId": user_id, "summary": "true"}, timeout=120).json()
+        first, second = listing[-1]["_id"], listing[-2]["_id"]
+
+        flows = {
+            "list + 2x /history/{id} (old)": [
+                (f"{base}/history", {"userId": user_id, "summary": "true"}),
+                (f"{base}/history/{first}", None),
+                (f"{base}/history/{second}", None),
+            ],
+            "2x /history/{id} only": [
+                (f"{base}/history/{first}", None),
+                (f"{base}/history/{second}", None),
+            ],
+            "/compare": [
+                (f"{base}/compare", {"userId": user_id, "first": first, "second": second}),
+            ],
+            "full /history (client-side trend)": [
+                (f"{base}/history", {"userId": user_id}),
+            ],
+            "/compare/trend": [
+                (f"{base}/compare/trend", {"userId": user_id}),
+            ],
+        }
+
+        print("flow,bytes,median_ms")
+        for name, calls in flows.items():
+            size, ms = timed_flow(session, calls, args.repeat)
+            print(f"{name},{size},{ms:.1f}")
+    finally:
+        remove_user(db, user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Throughput of the read endpoints at 50-500 concurrent clients
+#
+# Seeds a throw-away user into the database in MONGO_URI, then for each
+# --clients level keeps that many clients (one thread + keep-alive session
+# each) requesting a mix of /history, /get-budget, /has-budget and
+# /history-summary for --duration seconds against a running backend. Prints
+# requests/s, p50/p99 latency and the Mongo pool figures from /mongo/stats.
+# Run from src/backend, e.g. with a smaller pool:
+#   MONGO_MAX_POOL_SIZE=20 uvicorn backend:app
+#   python benchmarks/concurrency.py --clients 50 100 200 500
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+import requests
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed_data import month_list, remove_user, seed_user
+from upload_load import percentile
+
+
+def requests_for(user_id, months):
+    return [
+        ("/history", {"userId": user_id, "summary": "true", "limit": 20}),
+        ("/get-budget", {"userId": user_id}),
+        ("/get-budget", {"userId": user_id, "month": months[-1]}),
+        ("/has-budget", {"userId": user_id}),
+        ("/history-summary", {"userId": user_id}),
+    ]
+
+
+def client_loop(base_url, mix, offset, end, samples, errors):
+    session = requests.Session()
+    i = offset
+    while time.perf_counter() < end:
+        path, params = mix[i % len(mix)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{path}", params=params, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            samples.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(path)
+
+
+def run_level(base_url, mix, clients, duration):
+    samples, errors = [], []
+    end = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(base_url, mix, n, end, samples, errors))
+        for n in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--months", type=int, default=36)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))["expense_db"]
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    seed_user(db, user_id, args.months, rows=30)
+    mix = requests_for(user_id, month_list(args.months))
+
+    try:
+        # Warm-up so connection set-up is not part of the first level
+        run_level(args.base_url, mix, 10, 2)
+
+        print("clients,requests,errors,req_per_s,p50_ms,p99_ms,pool_open,pool_peak_checked_out")
+        for clients in args.clients:
+            samples, errors, elapsed = run_level(args.base_url, mix, clients, args.duration)
+            pool = requests.get(f"{args.base_url}/mongo/stats", timeout=10).json()
+            p50 = percentile(samples, 50) if samples else 0
+            p99 = percentile(samples, 99) if samples else 0
+            print(f"{clients},{len(samples)},{len(errors)},{len(samples) / elapsed:.0f},"
+                  f"{p50:.1f},{p99:.1f},{pool['openConnections']},{pool['peakCheckedOut']}")
+    finally:
+        remove_user(db, user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+# End-to-end benchmark suite: latency and throughput of the main endpoints,
+# written as JSON so runs on two commits can be compared
+#
+# Run from src/backend:
+#   python benchmarks/e2e_suite.py --mongo mock --output before.json
+#   git checkout <other commit>
+#   python benchmarks/e2e_suite.py --mongo mock --output after.json --compare before.json
+#
+# The suite starts its own backend (uvicorn in a subprocess) against either
+# mongomock (--mongo mock, no server needed, see mongomock_async.py) or the
+# database in MONGO_URI (--mongo uri, e.g. a local mongod), with the chat model
+# replaced by benchmarks/llm_stub.py. With --base-url it targets a backend that
+# is already running instead; seed data then goes through MONGO_URI, and the
+# backend should be started with HF_MODEL_URL pointing at llm_stub.py and a high
+# LOGIN_MAX_ATTEMPTS_PER_IP (every client logs in from the same address).
+#
+# Seeded users get --months of dashboards, budgets and progress reports
+# (seed_data.py). The upload scenarios write to users of their own, so what
+# /history reads does not depend on the order the scenarios ran in. The statements uploaded are --pdfs synthetic PDFs of --pages
+# pages (synthetic_pdf.py). Once every one of them has been uploaded the
+# parse cache serves them, so raise --pdfs to keep measuring the PDF workers.
+# Every scenario runs for --duration seconds at each --concurrency level, with
+# one thread and keep-alive session per client. The report holds requests,
+# errors, throughput and p50/p95/p99 latency per scenario and level. At the
+# end /metrics is checked with the strict parser in metrics_format.py.
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, BENCHMARKS)
+
+from metrics_format import MetricsFormatError, check_endpoint
+from seed_data import month_list, remove_user, seed_user
+from synthetic_pdf import build_statement_pdf
+from upload_load import percentile
+
+PASSWORD = "benchmark-password"
+SCENARIOS = ["upload", "upload-progress", "history", "finance-chat", "login"]
+
+
+# Each scenario sends one request for client number `client`; i counts that client's requests
+def upload(session, setup, client, i):
+    name, data = setup["pdfs"][(client + i) % len(setup["pdfs"])]
+    return session.post(f"{setup['base_url']}/upload", data={"userId": setup["writer_ids"][client]},
+                        files={"file": (name, data, "application/pdf")}, timeout=120)
+
+
+def upload_progress(session, setup, client, i):
+    name, data = setup["pdfs"][(client + i) % len(setup["pdfs"])]
+    return session.post(f"{setup['base_url']}/upload-progress", data={"userId": setup["writer_ids"][client]},
+                        files={"file": (name, data, "application/pdf")}, timeout=120)
+
+
+def history(session, setup, client, i):
+    return session.get(f"{setup['base_url']}/history", params={"userId": setup["reader_ids"][client]}, timeout=60)
+
+
+def finance_chat(session, setup, client, i):
+    # A new question every time, so the reply cache does not answer it
+    message = f"How can I spend less on groceries next month? ({client}-{i})"
+    return session.post(f"{setup['base_url']}/finance-chat",
+                        json={"userId": setup["reader_ids"][client], "message": message}, timeout=120)
+
+
+def login(session, setup, client, i):
+    return session.post(f"{setup['base_url']}/login",
+                        json={"email": setup["emails"][client], "password": PASSWORD}, timeout=60)
+
+
+REQUESTS = {
+    "upload": upload,
+    "upload-progress": upload_progress,
+    "history": history,
+    "finance-chat": finance_chat,
+    "login": login,
+}
+
+
+# Collects the latencies (ms) of the successful requests and counts the others by status
+def client_loop(send, setup, client, end, samples, errors):
+    session = requests.Session()
+    i = 0
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            status = send(session, setup, client, i).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        i += 1
+        if status == 200:
+            samples.append((time.perf_counter() - start) * 1000)
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+
+def run_level(scenario, setup, clients, duration):
+    end = time.perf_counter() + duration
+    per_client = [([], {}) for _ in range(clients)]
+    threads = [
+        threading.Thread(target=client_loop, args=(REQUESTS[scenario], setup, n, end, *per_client[n]))
+        for n in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    samples, errors = [], {}
+    for client_samples, client_errors in per_client:
+        samples.extend(client_samples)
+        for status, count in client_errors.items():
+            errors[status] = errors.get(status, 0) + count
+
+    return {
+        "scenario": scenario,
+        "concurrency": clients,
+        "requests": len(samples),
+        "errors": sum(errors.values()),
+        "error_statuses": errors,
+        "throughput_per_s": round(len(samples) / elapsed, 2),
+        "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+        "p95_ms": round(percentile(samples, 95), 2) if samples else None,
+        "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+        "mean_ms": round(sum(samples) / len(samples), 2) if samples else None,
+        "max_ms": round(max(samples), 2) if samples else None,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=120):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+def seed_users(db, user_ids, months, rows):
+    for n, user_id in enumerate(user_ids):
+        seed_user(db, user_id, months, rows, seed=n)
+
+
+# Runs inside the backend subprocess (--serve): mongomock has to be installed
+# before backend.py is imported, and the seed data has to live in the same process
+def serve(args):
+    import uvicorn
+
+    if args.mongo == "mock":
+        import mongomock_async
+        db = mongomock_async.install()["expense_db"]
+        seed_users(db, user_ids_for(args), args.months, args.rows)
+
+    os.chdir(BACKEND)
+    import backend
+    uvicorn.run(backend.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# Users the read scenarios use, then the users the upload scenarios write to
+def user_ids_for(args):
+    return [f"e2e-{args.run_id}-{n}" for n in range(args.users)] + \
+        [f"e2e-{args.run_id}-w{n}" for n in range(args.users)]
+
+
+def start_processes(args):
+    processes = []
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS, "llm_stub.py"), "--port", str(stub_port),
+         "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", "0", "--token-ms", str(args.llm_token_ms)],
+        cwd=BACKEND,
+    )
+    processes.append(stub)
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "HF_MODEL_URL": f"http://127.0.0.1:{stub_port}/v1/chat/completions",
+        "LOGIN_MAX_ATTEMPTS_PER_IP": "1000000000",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "ERROR"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--mongo", args.mongo,
+         "--run-id", args.run_id, "--users", str(args.users), "--months", str(args.months), "--rows", str(args.rows)],
+        cwd=BACKEND, env=env,
+    )
+    processes.append(server)
+
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(f"http://127.0.0.1:{stub_port}/stats", stub)
+        wait_until_up(f"{base_url}/ping", server)
+    except Exception:
+        stop_processes(processes)
+        raise
+    return base_url, processes
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print("scenario,concurrency,requests,errors,req_per_s,p50_ms,p95_ms,p99_ms")
+    for r in results:
+        print(f"{r['scenario']},{r['concurrency']},{r['requests']},{r['errors']},{r['throughput_per_s']},"
+              f"{r['p50_ms']},{r['p95_ms']},{r['p99_ms']}")
+
+
+# Change of every figure from the baseline report, in percent (latency up or throughput down is worse)
+def print_comparison(results, baseline):
+    before = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+
+    def change(new, old):
+        if new is None or not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nChange from {baseline.get('commit') or 'baseline'}:")
+    print("scenario,concurrency,req_per_s,p50,p95,p99")
+    for r in results:
+        old = before.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        print(f"{r['scenario']},{r['concurrency']},{change(r['throughput_per_s'], old['throughput_per_s'])},"
+              f"{change(r['p50_ms'], old['p50_ms'])},{change(r['p95_ms'], old['p95_ms'])},"
+              f"{change(r['p99_ms'], old['p99_ms'])}")
+
+
+def run(args):
+    user_ids = user_ids_for(args)
+    readers, writers = user_ids[:args.users], user_ids[args.users:]
+    emails = [f"{user_id}@example.com" for user_id in readers]
+    seeded_db = None
+    processes = []
+
+    # With a real database the data is seeded from here (and removed afterwards)
+    if args.mongo == "uri" or args.base_url:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+
+        load_dotenv(os.path.join(BACKEND, ".env"))
+        seeded_db = MongoClient(os.getenv("MONGO_URI"))["expense_db"]
+        seed_users(seeded_db, user_ids, args.months, args.rows)
+
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            base_url, processes = start_processes(args)
+
+        for email in emails:
+            requests.post(f"{base_url}/register", json={"email": email, "password": PASSWORD}, timeout=60)
+
+        # Statements of different months, so the progress reports find a budget of their own month
+        months = month_list(args.pdfs, start_year=2015)
+        pdfs = [
+            (f"statement-{month}.pdf", build_statement_pdf(args.pages, seed=n, year=int(month[:4]), month=int(month[5:])))
+            for n, month in enumerate(months)
+        ]
+
+        setup = {
+            "base_url": base_url,
+            # More clients than users: clients share the users round-robin
+            "reader_ids": [readers[n % len(readers)] for n in range(max(args.concurrency))],
+            "writer_ids": [writers[n % len(writers)] for n in range(max(args.concurrency))],
+            "emails": [emails[n % len(emails)] for n in range(max(args.concurrency))],
+            "pdfs": pdfs,
+        }
+
+        results = []
+        for scenario in args.scenarios:
+            if args.warmup:
+                run_level(scenario, setup, min(args.concurrency), args.warmup)
+            for clients in args.concurrency:
+                result = run_level(scenario, setup, clients, args.duration)
+                results.append(result)
+                print(f"{scenario} x{clients}: {result['throughput_per_s']} req/s, p50 {result['p50_ms']} ms, "
+                      f"p99 {result['p99_ms']} ms, {result['errors']} errors", file=sys.stderr)
+
+        # Every endpoint and stage has been used by now, so all the series are in the scrape
+        try:
+            metrics = {"valid": True, "metrics": len(check_endpoint(base_url))}
+        except MetricsFormatError as e:
+            metrics = {"valid": False, "error": str(e)}
+            print(f"/metrics is not valid: {e}", file=sys.stderr)
+    finally:
+        stop_processes(processes)
+        if seeded_db is not None:
+            for user_id in user_ids:
+                remove_user(seeded_db, user_id)
+            seeded_db["users"].delete_many({"email": {"$in": emails}})
+
+    return {
+        "commit": git_commit(),
+        "createdAt": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "mongo": "external" if args.base_url else args.mongo,
+            "users": args.users, "months": args.months, "rows": args.rows,
+            "pdfs": args.pdfs, "pages": args.pages, "duration": args.duration,
+            "llm_latency_ms": args.llm_latency_ms, "llm_token_ms": args.llm_token_ms,
+        },
+        "results": results,
+        "metrics": metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency and throughput of the backend")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="clients per level")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before each scenario (not measured)")
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    parser.add_argument("--base-url", help="use a running backend instead of starting one")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--months", type=int, default=24, help="seeded dashboards/budgets per user")
+    parser.add_argument("--rows", type=int, default=60, help="transactions per seeded dashboard")
+    parser.add_argument("--pdfs", type=int, default=20, help="distinct statements to upload")
+    parser.add_argument("--pages", type=int, default=4, help="pages per statement")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="stub model: time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=5, help="stub model: time per further token")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="report of an earlier run to compare with")
+    parser.add_argument("--run-id", default=uuid.uuid4().hex[:8], help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = run(args)
+    print_results(report["results"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report["results"], json.load(f))
+
+
+if __name__ == "__main__":
+    main()
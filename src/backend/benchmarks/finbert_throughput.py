@@ -0,0 +1,45 @@
+# Throughput benchmark for the FinBERT inference stage
+#
+# Run from src/backend (needs torch and transformers, plus optimum[onnxruntime] for onnx):
+#   python benchmarks/finbert_throughput.py --model ./finbert-finetuned-ie --optimise none int8 onnx
+#
+# Prints rows/sec of FinbertClassifier.predict at each batch size.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from finbert_stage import FinbertClassifier
+from synthetic_pdf import MERCHANTS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--optimise", nargs="+", default=["none", "int8"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64, 128])
+    parser.add_argument("--rows", type=int, default=2048)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    descriptions = [f"{rng.choice(MERCHANTS)} {rng.randint(1, 9999)} Dublin" for _ in range(args.rows)]
+
+    print("optimise,batch_size,rows_per_sec")
+    for optimise in args.optimise:
+        classifier = FinbertClassifier(args.model, optimise)
+        classifier.predict(descriptions[:8])  # warm-up
+
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            for i in range(0, len(descriptions), batch_size):
+                classifier.predict(descriptions[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"{optimise},{batch_size},{len(descriptions) / elapsed:.0f}")
+
+
+if __name__ == "__main__":
+    main()
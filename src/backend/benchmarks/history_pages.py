@@ -0,0 +1,86 @@
+# Response size and latency of the history list endpoints, full vs summary vs paged
+#
+# Seeds a throw-away user with --months dashboards (plus budgets and progress
+# reports) into the database in MONGO_URI, measures the endpoints of a running
+# backend, then deletes the user again. Run from src/backend:
+#   python benchmarks/history_pages.py --months 500
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import requests
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed_data import remove_user, seed_user
+
+
+def measure(session, url, params, repeat):
+    sizes, times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = session.get(url, params=params, timeout=120)
+        times.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(response.content))
+    return sizes[-1], statistics.median(times)
+
+
+# Reads every page of a paginated endpoint; returns total bytes, total time and page count
+def measure_paged(session, url, params, limit):
+    total_bytes, pages = 0, 0
+    cursor = None
+    start = time.perf_counter()
+    while True:
+        page_params = dict(params, limit=limit)
+        if cursor:
+            page_params["cursor"] = cursor
+        response = session.get(url, params=page_params, timeout=120)
+        total_bytes += len(response.content)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return total_bytes, (time.perf_counter() - start) * 1000, pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--months", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))["expense_db"]
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    seed_user(db, user_id, args.months, args.rows)
+
+    session = requests.Session()
+    try:
+        print("request,bytes,median_ms")
+        for endpoint in ("history", "progress-history"):
+            url = f"{args.base_url}/{endpoint}"
+            size, ms = measure(session, url, {"userId": user_id}, args.repeat)
+            print(f"/{endpoint} full,{size},{ms:.1f}")
+            size, ms = measure(session, url, {"userId": user_id, "summary": "true"}, args.repeat)
+            print(f"/{endpoint} summary=true,{size},{ms:.1f}")
+            size, ms = measure(session, url, {"userId": user_id, "summary": "true", "limit": args.page_size}, args.repeat)
+            print(f"/{endpoint} summary first page of {args.page_size},{size},{ms:.1f}")
+            size, ms, pages = measure_paged(session, url, {"userId": user_id, "summary": "true"}, args.page_size)
+            print(f"/{endpoint} summary all {pages} pages,{size},{ms:.1f}")
+
+        size, ms = measure(session, f"{args.base_url}/history-summary", {"userId": user_id}, args.repeat)
+        print(f"/history-summary,{size},{ms:.1f}")
+    finally:
+        remove_user(db, user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Bulk import benchmark: a year (or more) of statements through POST /import
+# vs the same number of statements posted one by one to /upload
+#
+# Start the backend first (uvicorn backend:app) and then run for example:
+#   python benchmarks/import_throughput.py --statements 12 --pages 4
+#
+# Every statement is a different month (benchmarks/synthetic_pdf.py) and every
+# run uses a new user id, so nothing is skipped as already imported. The
+# sequential phase uses other seeds than the import, so the parse cache does
+# not help it. Restart the backend with another IMPORT_WORKERS / PDF_WORKERS
+# to compare worker counts.
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+import zipfile
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import build_statement_pdf
+
+
+def statements(count, pages, seed):
+    for i in range(count):
+        year, month = 2020 + i // 12, i % 12 + 1
+        yield f"statement-{year}-{month:02d}.pdf", build_statement_pdf(pages, seed=seed + i, year=year, month=month)
+
+
+def run_import(base_url, user_id, pdfs, as_zip, poll):
+    if as_zip:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in pdfs:
+                archive.writestr(name, data)
+        files = [("files", ("statements.zip", buffer.getvalue(), "application/zip"))]
+    else:
+        files = [("files", (name, data, "application/pdf")) for name, data in pdfs]
+
+    start = time.perf_counter()
+    response = requests.post(f"{base_url}/import", data={"userId": user_id}, files=files, timeout=300)
+    response.raise_for_status()
+    accepted = time.perf_counter() - start
+
+    job_id = response.json()["jobId"]
+    while True:
+        job = requests.get(f"{base_url}/import/{job_id}", timeout=60).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(poll)
+    return accepted, time.perf_counter() - start, job
+
+
+def run_uploads(base_url, user_id, pdfs):
+    session = requests.Session()
+    start = time.perf_counter()
+    for name, data in pdfs:
+        session.post(f"{base_url}/upload", data={"userId": user_id},
+                     files={"file": (name, data, "application/pdf")}, timeout=300).raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--statements", type=int, default=12)
+    parser.add_argument("--pages", type=int, default=4, help="pages per statement")
+    parser.add_argument("--zip", action="store_true", help="send the statements as one ZIP file")
+    parser.add_argument("--poll", type=float, default=0.2, help="seconds between status requests")
+    args = parser.parse_args()
+
+    pdfs = list(statements(args.statements, args.pages, seed=0))
+    # The parsing pool starts its worker processes on the first statement
+    run_uploads(args.base_url, f"warmup-{uuid.uuid4().hex[:12]}", list(statements(1, 1, seed=2000)))
+    stats = requests.get(f"{args.base_url}/import/stats", timeout=10).json()
+    accepted, elapsed, job = run_import(args.base_url, f"import-{uuid.uuid4().hex[:12]}", pdfs, args.zip, args.poll)
+
+    counts = {}
+    for entry in job["statements"]:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print(f"/import ({stats['workers']} workers): job {job['status']}, {counts}")
+    print(f"  accepted in {accepted * 1000:.0f} ms, done in {elapsed:.2f} s, "
+          f"{args.statements / elapsed:.1f} statements/s")
+
+    sequential = run_uploads(args.base_url, f"upload-{uuid.uuid4().hex[:12]}",
+                             list(statements(args.statements, args.pages, seed=1000)))
+    print(f"/upload one by one: {sequential:.2f} s, {args.statements / sequential:.1f} statements/s")
+
+
+if __name__ == "__main__":
+    main()
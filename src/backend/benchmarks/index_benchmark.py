@@ -0,0 +1,107 @@
+# Query latency with and without the indexes from mongo_indexes.py
+#
+# Needs a local mongod (the data goes to a separate smartpocket_index_bench
+# database, which is dropped at the end). Run from src/backend:
+#   python benchmarks/index_benchmark.py --dashboards 1000000 --users 10000
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from pymongo import AsyncMongoClient, MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mongo_indexes import QUERY_SHAPES, SAMPLE_USER, ensure_indexes, plan_stages
+from seed_data import make_budget, make_dashboard, month_list
+
+BATCH = 10000
+
+
+def seed(db, dashboards, users, rows):
+    rng = random.Random(0)
+    months = month_list(max(dashboards // users, 1))
+    user_ids = [f"{i:024x}" for i in range(users)]
+
+    batch = []
+    for i in range(dashboards):
+        batch.append(make_dashboard(user_ids[i % users], months[(i // users) % len(months)], rows, rng))
+        if len(batch) == BATCH:
+            db["dashboards"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db["dashboards"].insert_many(batch, ordered=False)
+
+    db["budgets"].insert_many(
+        [make_budget(user_id, month, rng) for user_id in user_ids for month in months[:12]], ordered=False
+    )
+
+    db["users"].insert_many([{"email": f"user{i}@example.com", "password": "x"} for i in range(users)])
+    return user_ids
+
+
+def time_shapes(db, user_ids, repeat):
+    rng = random.Random(1)
+    results = {}
+    for name, collection, filter_query, sort in QUERY_SHAPES:
+        samples = []
+        for _ in range(repeat):
+            user_id = rng.choice(user_ids)
+            query = {k: (user_id if v == SAMPLE_USER else v) for k, v in filter_query.items()}
+            start = time.perf_counter()
+            cursor = db[collection].find(query).limit(50)
+            if sort:
+                cursor = cursor.sort(sort)
+            list(cursor)
+            samples.append((time.perf_counter() - start) * 1000)
+        stages = plan_stages(db[collection].find(query).sort(sort or [("_id", 1)]).limit(1)
+                             .explain()["queryPlanner"]["winningPlan"])
+        results[name] = (statistics.median(samples), "COLLSCAN" if "COLLSCAN" in stages else "IXSCAN")
+    return results
+
+
+async def build_indexes(uri):
+    client = AsyncMongoClient(uri)
+    try:
+        await ensure_indexes(client["smartpocket_index_bench"])
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--dashboards", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database("smartpocket_index_bench")
+    db = client["smartpocket_index_bench"]
+
+    try:
+        start = time.perf_counter()
+        user_ids = seed(db, args.dashboards, args.users, args.rows)
+        print(f"Seeded {args.dashboards} dashboards in {time.perf_counter() - start:.0f}s")
+
+        before = time_shapes(db, user_ids, args.repeat)
+        start = time.perf_counter()
+        asyncio.run(build_indexes(args.uri))
+        print(f"Built indexes in {time.perf_counter() - start:.0f}s")
+        after = time_shapes(db, user_ids, args.repeat)
+
+        print("query,no_index_ms,plan,indexed_ms,plan")
+        for name in before:
+            print(f"{name},{before[name][0]:.2f},{before[name][1]},{after[name][0]:.2f},{after[name][1]}")
+    finally:
+        client.drop_database("smartpocket_index_bench")
+
+
+if __name__ == "__main__":
+    main()
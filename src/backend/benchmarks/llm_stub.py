@@ -0,0 +1,95 @@
+# Local stand-in for the hosted chat-completions endpoint, for offline load tests of /finance-chat
+#
+# Answers POST /v1/chat/completions with a canned reply of max_tokens words and
+# counts the calls it received. The first token takes --latency-ms (plus up to
+# --jitter-ms), every further token --token-ms. With "stream": true the tokens
+# are sent as SSE chunks as they are "generated", otherwise the whole reply is
+# sent at the end; streams the client closes early are counted as cancelled. Start
+# it and point the backend at it, from src/backend:
+#   python benchmarks/llm_stub.py --port 8100 --latency-ms 800 --token-ms 40
+#   HF_MODEL_URL=http://127.0.0.1:8100/v1/chat/completions uvicorn backend:app
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+settings = {"latency_ms": 800.0, "jitter_ms": 200.0, "token_ms": 40.0}
+counters = {"calls": 0, "active": 0, "peak_active": 0, "streams": 0, "streams_cancelled": 0, "tokens_sent": 0}
+
+
+def reply_tokens(payload):
+    question = payload["messages"][-1]["content"]
+    words = f"Stub answer to: {question}".split(" ")
+    # pad the reply up to max_tokens words so a stream lasts about as long as a real one
+    words += ["lorem"] * max(0, payload.get("max_tokens", 0) - len(words))
+    return [word + " " for word in words]
+
+
+async def stream_tokens(payload):
+    counters["streams"] += 1
+    counters["active"] += 1
+    counters["peak_active"] = max(counters["peak_active"], counters["active"])
+    finished = False
+    try:
+        await asyncio.sleep((settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])) / 1000)
+        for token in reply_tokens(payload):
+            chunk = {"choices": [{"delta": {"content": token}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            counters["tokens_sent"] += 1
+            await asyncio.sleep(settings["token_ms"] / 1000)
+        yield "data: [DONE]\n\n"
+        finished = True
+    finally:
+        counters["active"] -= 1
+        if not finished:
+            counters["streams_cancelled"] += 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    counters["calls"] += 1
+    if payload.get("stream"):
+        return StreamingResponse(stream_tokens(payload), media_type="text/event-stream")
+
+    counters["active"] += 1
+    counters["peak_active"] = max(counters["peak_active"], counters["active"])
+    # Same total time as a stream of the same reply
+    tokens = reply_tokens(payload)
+    try:
+        await asyncio.sleep((settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+                             + len(tokens) * settings["token_ms"]) / 1000)
+    finally:
+        counters["active"] -= 1
+
+    return {
+        "choices": [{"message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+        "usage": {"completion_tokens": len(tokens)},
+    }
+
+
+@app.get("/stats")
+def stats():
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    settings["latency_ms"] = args.latency_ms
+    settings["jitter_ms"] = args.jitter_ms
+    settings["token_ms"] = args.token_ms
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
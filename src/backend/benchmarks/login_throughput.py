@@ -0,0 +1,89 @@
+# Login throughput vs bcrypt cost factor, and what a login burst does to other requests
+#
+# Run from src/backend:
+#   python benchmarks/login_throughput.py --rounds 8 10 12 --logins 200
+#
+# For every cost factor, fires a burst of concurrent password checks through
+# PasswordHasher (its own bounded executor) and through run_in_threadpool (the
+# shared threadpool the endpoints used before). Meanwhile a probe keeps running
+# a trivial function on the shared threadpool every 10 ms, standing in for the
+# sync endpoints; its latency shows whether the burst holds them up.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.concurrency import run_in_threadpool
+
+from password_hasher import PasswordHasher
+from upload_load import percentile
+
+
+async def probe(stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await run_in_threadpool(lambda: None)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def burst(check, logins):
+    latencies = []
+
+    async def one():
+        start = time.perf_counter()
+        valid = await check()
+        latencies.append((time.perf_counter() - start) * 1000)
+        return valid
+
+    stop = asyncio.Event()
+    probe_samples = []
+    probe_task = asyncio.create_task(probe(stop, probe_samples))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    assert all(results)
+    return logins / elapsed, latencies, probe_samples
+
+
+async def run(args):
+    print("rounds,mode,logins_per_s,login_p50_ms,login_p99_ms,other_request_p50_ms,other_request_p99_ms")
+    for rounds in args.rounds:
+        hasher = PasswordHasher(rounds=rounds, workers=args.workers, queue_depth=args.logins)
+        hasher.start()
+        hashed = await hasher.hash("correct horse battery staple")
+
+        modes = {
+            "dedicated executor": lambda: hasher.verify("correct horse battery staple", hashed),
+            "shared threadpool": lambda: run_in_threadpool(hasher.context.verify, "correct horse battery staple", hashed),
+        }
+        for mode, check in modes.items():
+            async def login():
+                result = await check()
+                return result[0] if isinstance(result, tuple) else result
+
+            rate, latencies, probe_samples = await burst(login, args.logins)
+            print(f"{rounds},{mode},{rate:.1f},{percentile(latencies, 50):.0f},{percentile(latencies, 99):.0f},"
+                  f"{percentile(probe_samples, 50):.1f},{percentile(probe_samples, 99):.1f}")
+        hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--logins", type=int, default=200, help="concurrent logins per burst")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Strict check of the /metrics output against the Prometheus text format (0.0.4)
+#
+# Run from src/backend against a running backend:
+#   python benchmarks/metrics_format.py --base-url http://127.0.0.1:8000
+#
+# Prometheus rejects the whole scrape when one line is wrong, so every line is
+# checked: metric and label names, label escaping, sample values (Go float
+# syntax, so True/False or "nan" are errors), HELP/TYPE before the samples of
+# their metric, no series twice, and histogram buckets cumulative with a +Inf
+# bucket equal to _count. Also used by e2e_suite.py after every run.
+import argparse
+import re
+import sys
+
+import requests
+
+NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+VALUE = r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?|NaN|[+-]?Inf"
+SAMPLE = re.compile(rf"({NAME})(?:\{{((?:{LABEL})(?:,{LABEL})*,?)?\}})? ({VALUE})(?: (-?\d+))?")
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"')
+HELP = re.compile(rf"# HELP ({NAME})(?: .*)?")
+TYPE = re.compile(rf"# TYPE ({NAME}) (counter|gauge|histogram|summary|untyped)")
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "summary": ("_sum", "_count", "")}
+
+
+class MetricsFormatError(ValueError):
+    pass
+
+
+# Name of the metric family a sample belongs to (histogram/summary samples carry a suffix)
+def family_of(name, types):
+    for family, kind in types.items():
+        for suffix in SUFFIXES.get(kind, ("",)):
+            if name == family + suffix:
+                return family
+    return name
+
+
+# Parses the exposition text; returns {family: type} or raises MetricsFormatError
+def parse_metrics(text):
+    if text and not text.endswith("\n"):
+        raise MetricsFormatError("the last line does not end with a newline")
+
+    types = {}
+    helps = set()
+    sampled = set()  # families that already had samples
+    series = set()
+    buckets = {}  # (family, labels without le) -> [(le, count)]
+    counts = {}
+
+    for number, line in enumerate(text.split("\n")[:-1], start=1):
+        def fail(reason):
+            raise MetricsFormatError(f"line {number}: {reason}: {line!r}")
+
+        if not line.strip():
+            continue
+        if line.startswith("# HELP "):
+            match = HELP.fullmatch(line)
+            if not match:
+                fail("bad HELP line")
+            if match.group(1) in helps:
+                fail("second HELP for the metric")
+            helps.add(match.group(1))
+        elif line.startswith("# TYPE "):
+            match = TYPE.fullmatch(line)
+            if not match:
+                fail("bad TYPE line")
+            name = match.group(1)
+            if name in types:
+                fail("second TYPE for the metric")
+            if name in sampled:
+                fail("TYPE after the metric's samples")
+            types[name] = match.group(2)
+        elif line.startswith("#"):
+            continue
+        else:
+            match = SAMPLE.fullmatch(line)
+            if not match:
+                fail("bad sample line")
+            name, label_text, value = match.group(1), match.group(2) or "", match.group(3)
+            labels = tuple(LABEL_PAIR.findall(label_text))
+            if len({key for key, _ in labels}) != len(labels):
+                fail("label given twice")
+            if (name, tuple(sorted(labels))) in series:
+                fail("series given twice")
+            series.add((name, tuple(sorted(labels))))
+
+            family = family_of(name, types)
+            sampled.add(family)
+            if types.get(family) == "histogram":
+                rest = tuple(sorted(pair for pair in labels if pair[0] != "le"))
+                if name.endswith("_bucket"):
+                    le = dict(labels).get("le")
+                    if le is None:
+                        fail("bucket without le")
+                    buckets.setdefault((family, rest), []).append((float(le), float(value)))
+                elif name.endswith("_count"):
+                    counts[(family, rest)] = float(value)
+
+    for (family, labels), values in buckets.items():
+        bounds = [le for le, _ in values]
+        if bounds != sorted(bounds) or bounds[-1] != float("inf"):
+            raise MetricsFormatError(f"{family}{dict(labels)}: buckets out of order or no +Inf bucket")
+        cumulative = [count for _, count in values]
+        if cumulative != sorted(cumulative):
+            raise MetricsFormatError(f"{family}{dict(labels)}: bucket counts are not cumulative")
+        if counts.get((family, labels)) != cumulative[-1]:
+            raise MetricsFormatError(f"{family}{dict(labels)}: +Inf bucket differs from _count")
+
+    return types
+
+
+def check_endpoint(base_url):
+    response = requests.get(f"{base_url}/metrics", timeout=30)
+    response.raise_for_status()
+    return parse_metrics(response.text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    args = parser.parse_args()
+
+    try:
+        types = check_endpoint(args.base_url)
+    except MetricsFormatError as e:
+        print(f"/metrics is not valid: {e}")
+        sys.exit(1)
+    print(f"/metrics is valid: {len(types)} metrics")
+
+
+if __name__ == "__main__":
+    main()
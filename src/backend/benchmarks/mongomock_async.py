@@ -0,0 +1,124 @@
+# Async stand-in for pymongo's AsyncMongoClient backed by mongomock, so the
+# backend can be benchmarked without a MongoDB server (e2e_suite.py --mongo mock)
+#
+# Only covers what the backend calls: awaitable collection methods, find()
+# cursors (sort/limit/skip, async for, to_list()), aggregate() and bulk_write()
+# with the pymongo operation classes. Every client in the process shares one
+# in-memory server. install() has to run before backend.py is imported.
+# Timings with it show the API's own cost; they say nothing about Mongo's.
+import mongomock
+import pymongo
+
+server = mongomock.MongoClient()
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.iterator = None
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count):
+        self.cursor = self.cursor.limit(count)
+        return self
+
+    def skip(self, count):
+        self.cursor = self.cursor.skip(count)
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self.cursor)
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        self.iterator = iter(self.cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+# Receives the operations of bulk_write() through pymongo's own _add_to_bulk()
+class BulkRecorder:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add_insert(self, document):
+        self.collection.insert_one(document)
+
+    def add_update(self, selector, update, multi, upsert, **kwargs):
+        if multi:
+            self.collection.update_many(selector, update, upsert=upsert)
+        else:
+            self.collection.update_one(selector, update, upsert=upsert)
+
+    def add_replace(self, selector, replacement, upsert, **kwargs):
+        self.collection.replace_one(selector, replacement, upsert=upsert)
+
+    def add_delete(self, selector, limit, **kwargs):
+        if limit == 1:
+            self.collection.delete_one(selector)
+        else:
+            self.collection.delete_many(selector)
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(iter(list(self.collection.aggregate(pipeline))))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        recorder = BulkRecorder(self.collection)
+        for request in requests:
+            request._add_to_bulk(recorder)
+
+    # insert_one, find_one, update_one, create_index...: mongomock's method, awaitable
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.database[name])
+
+    async def command(self, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class AsyncMongoClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getitem__(self, name):
+        return AsyncDatabase(server[name])
+
+    @property
+    def admin(self):
+        return AsyncDatabase(server["admin"])
+
+    async def close(self):
+        pass
+
+
+# Makes the backend use mongomock; returns the (sync) client to seed data with
+def install():
+    pymongo.AsyncMongoClient = AsyncMongoClient
+    return server
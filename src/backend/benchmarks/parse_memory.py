@@ -0,0 +1,65 @@
+# Memory benchmark: joined-text parsing vs streaming page-by-page parsing
+#
+# Run from src/backend:
+#   python benchmarks/parse_memory.py --pages 50 200 500
+#
+# Every measurement runs in a fresh process so the peak RSS of one run does not
+# leak into the next. "joined" is the old approach (all page text joined into
+# one string before the regex runs), "streaming" is pdf_engine.parse_page_range.
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import build_statement_pdf
+
+
+def run_once(mode, pages):
+    import pdfplumber
+    from pdf_engine import parse_page_range
+    from statement_parser import extract_transactions
+
+    data = build_statement_pdf(pages)
+    start = time.perf_counter()
+
+    if mode == "joined":
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+        transactions = extract_transactions(text)
+    else:
+        transactions, _, _ = parse_page_range(data, 0, pages)
+
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode},{pages},{len(transactions)},{elapsed:.2f},{peak_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(args.run[0], int(args.run[1]))
+        return
+
+    print("mode,pages,transactions,seconds,peak_rss_mb")
+    for pages in args.pages:
+        for mode in ("joined", "streaming"):
+            result = subprocess.run(
+                [sys.executable, __file__, "--run", mode, str(pages)],
+                capture_output=True, text=True, check=True,
+            )
+            print(result.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
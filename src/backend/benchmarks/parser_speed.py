@@ -0,0 +1,61 @@
+# Speed of the line parser (statement_parser.py) vs the regex parser it replaced
+# (benchmarks/regex_parser.py) on large synthetic statements
+#
+# Run from src/backend:
+#   python benchmarks/parser_speed.py --rows 100000
+#
+# "statement" is the layout of benchmarks/synthetic_pdf.py (a row plus its
+# To:/Card: lines). "long lines" adds lines full of dates and numbers but no
+# amounts, the case where the old pattern backtracked at every date on the line.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import regex_parser
+import statement_parser
+from synthetic_pdf import statement_lines
+
+
+def long_lines(rows, width):
+    noise = " ".join(f"{1 + i % 28} Nov 2025 ref {i}" for i in range(width))
+    for i, line in enumerate(statement_lines(rows)):
+        yield line
+        if i % 10 == 0:
+            yield noise
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--width", type=int, default=50, help="dates on each long noise line")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    corpora = {
+        "statement": "\n".join(statement_lines(args.rows)),
+        "long lines": "\n".join(long_lines(args.rows // 10, args.width)),
+    }
+
+    print("corpus,lines,transactions,regex_ms,line_ms,speedup,same_output")
+    for name, text in corpora.items():
+        old, old_s = best_of(lambda: regex_parser.extract_transactions(text), args.repeat)
+        new, new_s = best_of(lambda: statement_parser.extract_transactions(text), args.repeat)
+        print(f"{name},{text.count(chr(10)) + 1},{len(new)},{old_s * 1000:.0f},{new_s * 1000:.0f},"
+              f"{old_s / new_s:.1f}x,{repr(old) == repr(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# The statement parser as it was before the line parser (statement_parser.py),
+# kept as the reference the regression corpus and the speed benchmark compare against
+from statement_parser import CARRY_LINES, iter_lines, transaction_pattern
+
+
+def transaction_from_match(match):
+    date, desc, money_out, money_in = match.groups()
+
+    money_out = float(money_out)
+    money_in = float(money_in)
+    desc_lower = desc.lower()
+
+    if "pocket" in desc_lower:
+        return None
+
+    if "apple pay top-up" in desc_lower or "apple pay top up" in desc_lower:
+        amount = money_out
+    elif "transfer from" in desc_lower:
+        amount = abs(money_out)
+    elif "transfer to" in desc_lower:
+        amount = -abs(money_out)
+    elif money_out > 0:
+        amount = -money_out
+    else:
+        amount = money_in
+
+    return {
+        "date": date,
+        "description": desc,
+        "amount": amount
+    }
+
+
+def iter_matches(lines, skip_lines=0, final=True, carry_lines=CARRY_LINES):
+    pending = []
+
+    for count, line in enumerate(lines, start=1):
+        pending.append(line)
+        if len(pending) <= carry_lines:
+            continue
+
+        text = "\n".join(pending)
+        cut = len(text) - len("\n".join(pending[-carry_lines:]))
+        consumed = 0
+
+        for match in transaction_pattern.finditer(text):
+            if match.start() >= cut:
+                break
+            if count > skip_lines:
+                yield match
+            consumed = match.end()
+
+        pending = text[max(cut, consumed):].split("\n")
+
+    if final and pending:
+        yield from transaction_pattern.finditer("\n".join(pending))
+
+
+def iter_transactions(lines, skip_lines=0, final=True):
+    for match in iter_matches(lines, skip_lines, final):
+        tx = transaction_from_match(match)
+        if tx is not None:
+            yield tx
+
+
+def extract_transactions(text: str):
+    return list(iter_transactions(iter_lines([text])))
@@ -0,0 +1,103 @@
+# Builds synthetic users, dashboards, budgets and progress reports for the benchmarks
+#
+# The documents have the same shape as the ones the API writes, so they can be
+# inserted straight into Mongo with seed_user().
+import random
+from datetime import datetime
+
+from synthetic_pdf import INCOME, MERCHANTS
+
+CATEGORY_NAMES = ["Groceries", "Transport", "Food", "Subscriptions", "Education", "Transfers", "Other"]
+
+
+def month_list(count, start_year=2015):
+    return [f"{start_year + i // 12}-{i % 12 + 1:02d}" for i in range(count)]
+
+
+def make_dashboard(user_id, month, rows, rng):
+    year, mon = month.split("-")
+    label = datetime(int(year), int(mon), 1).strftime("%b %Y")
+    income, outcome = [], []
+    for i in range(rows):
+        date = f"{1 + i % 28} {label}"
+        if rng.random() < 0.15:
+            income.append({"date": date, "description": rng.choice(INCOME), "amount": round(rng.uniform(10, 200), 2)})
+        else:
+            outcome.append({
+                "date": date,
+                "description": rng.choice(MERCHANTS),
+                "amount": -round(rng.uniform(1, 80), 2),
+                "category": rng.choice(CATEGORY_NAMES),
+            })
+
+    categories = {}
+    for tx in outcome:
+        categories[tx["category"]] = categories.get(tx["category"], 0) + abs(tx["amount"])
+    total_income = sum(tx["amount"] for tx in income)
+    total_outcome = sum(abs(tx["amount"]) for tx in outcome)
+
+    return {
+        "userId": user_id,
+        "timestamp": datetime.now().isoformat(),
+        "statement_month": month,
+        "income": income,
+        "outcome": outcome,
+        "total_income": total_income,
+        "total_outcome": total_outcome,
+        "net_balance": total_income - total_outcome,
+        "categories": categories,
+    }
+
+
+def make_budget(user_id, month, rng):
+    categories = {name: rng.randint(20, 200) for name in CATEGORY_NAMES[:5]}
+    return {
+        "userId": user_id,
+        "month": month,
+        "totalBudget": sum(categories.values()),
+        "categories": categories,
+        "updatedAt": datetime.utcnow().isoformat(),
+    }
+
+
+def make_progress(user_id, dashboard, budget):
+    category_comparison = [
+        {
+            "category": cat,
+            "current": dashboard["categories"].get(cat, 0),
+            "budget": amount,
+            "overUnder": dashboard["categories"].get(cat, 0) - amount,
+        }
+        for cat, amount in budget["categories"].items()
+    ]
+    return {
+        "userId": user_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "statement_month": dashboard["statement_month"],
+        "budgetMonth": budget["month"],
+        "currentTotal": dashboard["total_outcome"],
+        "budgetTotal": budget["totalBudget"],
+        "overallOverUnder": dashboard["total_outcome"] - budget["totalBudget"],
+        "categories": category_comparison,
+    }
+
+
+# Inserts dashboards, budgets and progress reports for one user into the given database
+def seed_user(db, user_id, months=500, rows=60, seed=0):
+    rng = random.Random(seed)
+    dashboards, budgets, progress = [], [], []
+    for month in month_list(months):
+        dashboard = make_dashboard(user_id, month, rows, rng)
+        budget = make_budget(user_id, month, rng)
+        dashboards.append(dashboard)
+        budgets.append(budget)
+        progress.append(make_progress(user_id, dashboard, budget))
+
+    db["dashboards"].insert_many(dashboards, ordered=False)
+    db["budgets"].insert_many(budgets, ordered=False)
+    db["progress_reports"].insert_many(progress, ordered=False)
+
+
+def remove_user(db, user_id):
+    for name in ("dashboards", "budgets", "progress_reports", "monthly_aggregates"):
+        db[name].delete_many({"userId": user_id})
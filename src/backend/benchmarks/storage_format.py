@@ -0,0 +1,84 @@
+# Size and read cost of dashboards stored as rows vs the columnar format (dashboard_storage.py)
+#
+# Run from src/backend:
+#   python benchmarks/storage_format.py --months 120 --rows 60
+#
+# Builds synthetic dashboards (the same shape the API writes, see seed_data.py)
+# and reports, per dashboard, the BSON size (what Mongo stores and sends), the
+# zlib-compressed size (roughly what a compressed wire connection sends) and the
+# time to read one back: BSON decode, plus the decode to rows for the columnar
+# form, since /history still returns rows. Also checks that every columnar
+# dashboard decodes back to exactly the original JSON.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard_storage import decode_dashboard, encode_dashboard
+from seed_data import make_dashboard, month_list
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=120)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    docs = [make_dashboard("bench", month, args.rows, rng) for month in month_list(args.months)]
+    encoded = [encode_dashboard(doc) for doc in docs]
+    kept = sum(1 for doc, enc in zip(docs, encoded) if enc is doc)
+
+    row_bytes = [bson.encode(doc) for doc in docs]
+    column_bytes = [bson.encode(doc) for doc in encoded]
+
+    exact = all(json.dumps(decode_dashboard(bson.decode(raw))) == json.dumps(doc)
+                for raw, doc in zip(column_bytes, docs))
+
+    rows_s = best_of(lambda: [bson.decode(raw) for raw in row_bytes], args.repeat)
+    bson_s = best_of(lambda: [bson.decode(raw) for raw in column_bytes], args.repeat)
+    columns_s = best_of(lambda: [decode_dashboard(bson.decode(raw)) for raw in column_bytes], args.repeat)
+    encode_s = best_of(lambda: [encode_dashboard(doc) for doc in docs], args.repeat)
+
+    def size(label, blobs):
+        raw = statistics.mean(len(b) for b in blobs)
+        packed = statistics.mean(len(zlib.compress(b)) for b in blobs)
+        print(f"{label:<10} {raw:>10.0f} B {packed:>10.0f} B zlib")
+        return raw
+
+    count = len(docs)
+    print(f"{count} dashboards x {args.rows} transactions ({kept} kept as rows)")
+    print("average size per dashboard:")
+    rows_size = size("rows", row_bytes)
+    columns_size = size("columnar", column_bytes)
+    print(f"columnar is {columns_size / rows_size:.0%} of the rows size")
+
+    print("read time per dashboard:")
+    print(f"rows       bson decode                 {rows_s / count * 1e6:8.1f} us")
+    print(f"columnar   bson decode                 {bson_s / count * 1e6:8.1f} us")
+    print(f"columnar   bson decode + back to rows  {columns_s / count * 1e6:8.1f} us")
+    print(f"encoding a new dashboard (on upload)   {encode_s / count * 1e6:8.1f} us")
+    print(f"decodes to the same JSON: {exact}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Generates synthetic Revolut-style statement PDFs for the benchmarks
+#
+# The PDF is written by hand (Helvetica text only) so no extra packages are
+# needed. pdfplumber reads the rows back in the same layout as a real
+# statement: "<day> <Mon> <year> <description> €<amount> €<balance>".
+import argparse
+import random
+
+MERCHANTS = [
+    "Tesco", "Aldi", "Lidl", "Dunnes Stores", "Spar", "Asialand",
+    "Burkes Bus", "Irish Rail", "Transport for Ireland - TFI",
+    "McDonald's", "Just Eat", "BDS Vending", "Spotify", "Apple", "GoMo",
+    "Atlantic Technological University", "Amazon", "Penneys", "Boots",
+]
+INCOME = [
+    "Transfer from MARTINA ADEOLA OSIKOYA", "Apple Pay top-up by *7529",
+]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+ROWS_PER_PAGE = 12  # each row also prints a "To:" and "Card:" line like Revolut does
+
+
+def statement_lines(rows, seed=0, year=2025, month=11):
+    rng = random.Random(seed)
+    balance = 500.0
+    for i in range(rows):
+        day = 1 + i * 28 // max(rows, 1)
+        date = f"{day} {MONTHS[month - 1]} {year}"
+        if rng.random() < 0.15:
+            desc = rng.choice(INCOME)
+            amount = round(rng.uniform(10, 200), 2)
+            balance += amount
+            yield f"{date} {desc} €{amount:.2f} €{balance:.2f}"
+            yield "Reference: synthetic"
+        else:
+            desc = rng.choice(MERCHANTS)
+            if rng.random() < 0.05:
+                desc = f"Transfer to {desc.upper()}"
+            amount = round(rng.uniform(1, 80), 2)
+            balance = max(balance - amount, 0.0)
+            yield f"{date} {desc} €{amount:.2f} €{balance:.2f}"
+            yield f"To: {desc}, Galway"
+            yield "Card: 535456******3470"
+
+
+def _escape(line):
+    data = line.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _page_stream(lines):
+    parts = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+    for line in lines:
+        parts.append(b"(" + _escape(line) + b") Tj T*")
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+# Builds the PDF bytes for a statement with the given number of pages
+def build_statement_pdf(pages, rows_per_page=ROWS_PER_PAGE, seed=0, year=2025, month=11):
+    lines = list(statement_lines(pages * rows_per_page, seed, year, month))
+    per_page = len(lines) // pages + 1
+
+    page_streams = []
+    for p in range(pages):
+        body = lines[p * per_page:(p + 1) * per_page]
+        header = ["EUR Statement", "Revolut Bank UAB", "Date Description Money out Money in Balance"]
+        footer = [f"Page {p + 1} of {pages}"]
+        page_streams.append(_page_stream(header + body + footer))
+
+    # Object 1: catalog, 2: page tree, 3: font, then a page and content stream per page
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for stream in page_streams:
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R".encode())
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count " + str(len(kids)).encode() + b" >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic statement PDF")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as f:
+        f.write(build_statement_pdf(args.pages, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
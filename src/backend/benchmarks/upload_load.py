@@ -0,0 +1,85 @@
+# Load benchmark: latency of /history while statements are being uploaded
+#
+# Start the backend first (uvicorn backend:app) and then run for example:
+#   python benchmarks/upload_load.py --user-id <id> --pdf ../../public/account-statement_2025-11-01_2025-11-24_en-ie_64729d.pdf
+#
+# The script measures /history on its own, then again while --uploaders threads
+# keep posting the PDF to /upload, and prints p50/p99 for both phases.
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_history(base_url, user_id, duration):
+    samples = []
+    session = requests.Session()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        session.get(f"{base_url}/history", params={"userId": user_id}, timeout=60)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def upload_loop(base_url, user_id, pdf_bytes, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(
+            f"{base_url}/upload",
+            data={"userId": user_id},
+            files={"file": ("statement.pdf", pdf_bytes, "application/pdf")},
+            timeout=120,
+        )
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+def report(label, samples):
+    print(f"{label}: {len(samples)} requests, "
+          f"p50 {percentile(samples, 50):.1f} ms, "
+          f"p99 {percentile(samples, 99):.1f} ms, "
+          f"mean {statistics.mean(samples):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--uploaders", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        pdf_bytes = f.read()
+
+    report("/history idle", measure_history(args.base_url, args.user_id, args.duration))
+
+    stop = threading.Event()
+    counts = {}
+    threads = [
+        threading.Thread(target=upload_loop, args=(args.base_url, args.user_id, pdf_bytes, stop, counts))
+        for _ in range(args.uploaders)
+    ]
+    for t in threads:
+        t.start()
+
+    report(f"/history with {args.uploaders} uploaders",
+           measure_history(args.base_url, args.user_id, args.duration))
+
+    stop.set()
+    for t in threads:
+        t.join()
+    print("upload status codes:", counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Categorisation rules stored in Mongo
+#
+# Rules live in the category_rules collection: global rules (userId None) and
+# per-user override rules. Each API worker compiles them into a RuleIndex held
+# in memory and only swaps in a new index when the rules version stamp in
+# rules_meta changes, so categorising a transaction never touches Mongo.
+import logging
+import os
+import time
+from datetime import datetime
+
+from keyword_matcher import KeywordMatcher
+
+log = logging.getLogger(__name__)
+
+RULES_REFRESH_SECONDS = float(os.getenv("RULES_REFRESH_SECONDS", 5))  # how often workers check the version stamp
+
+
+# Groups rule documents into an ordered {category: keywords} mapping (lowest priority number first)
+def rules_to_mapping(docs):
+    mapping = {}
+    for doc in sorted(docs, key=lambda d: d.get("priority", 0)):
+        mapping.setdefault(doc["category"], []).extend(doc["keywords"])
+    return mapping
+
+
+# Compiled, read-only snapshot of every rule; replaced as a whole, never modified
+class RuleIndex:
+    def __init__(self, version, global_rules: dict, user_rules: dict):
+        self.version = version
+        self.global_matcher = KeywordMatcher(global_rules)
+        # default=None so a description no override matches falls through to the global rules
+        self.user_matchers = {
+            user_id: KeywordMatcher(rules, default=None) for user_id, rules in user_rules.items()
+        }
+
+
+class RuleStore:
+    def __init__(self, rules_collection, meta_collection, default_rules: dict):
+        self.rules = rules_collection
+        self.meta = meta_collection
+        self.default_rules = default_rules
+        # Built from the default rules so categorisation works before Mongo has been read
+        self.index = RuleIndex(None, default_rules, {})
+        self.checked_at = 0.0
+
+    # Inserts the default rules as global rules the first time the app runs
+    async def seed(self):
+        if await self.rules.count_documents({"userId": None}, limit=1):
+            return
+        now = datetime.utcnow().isoformat()
+        await self.rules.insert_many([
+            {"userId": None, "category": category, "keywords": keywords, "priority": priority, "updatedAt": now}
+            for priority, (category, keywords) in enumerate(self.default_rules.items())
+        ])
+        await self.bump()
+
+    async def stored_version(self):
+        doc = await self.meta.find_one({"_id": "rules"})
+        return doc["version"] if doc else 0
+
+    # Reads every rule and atomically swaps in a freshly compiled index
+    async def load(self):
+        version = await self.stored_version()
+        global_docs = []
+        user_docs = {}
+        async for doc in self.rules.find({}, {"userId": 1, "category": 1, "keywords": 1, "priority": 1}):
+            if doc.get("userId") is None:
+                global_docs.append(doc)
+            else:
+                user_docs.setdefault(doc["userId"], []).append(doc)
+
+        self.index = RuleIndex(
+            version,
+            rules_to_mapping(global_docs) or self.default_rules,
+            {user_id: rules_to_mapping(docs) for user_id, docs in user_docs.items()},
+        )
+        self.checked_at = time.monotonic()
+
+    # Returns the current index, reloading it if another worker changed the rules
+    async def current(self):
+        if time.monotonic() - self.checked_at >= RULES_REFRESH_SECONDS:
+            self.checked_at = time.monotonic()
+            try:
+                if await self.stored_version() != self.index.version:
+                    await self.load()
+            except Exception as e:
+                # Keep categorising with the rules we already have
+                log.warning("Could not refresh categorisation rules: %s", e)
+        return self.index
+
+    # Marks the rules as changed for every worker and reloads this one straight away
+    async def bump(self):
+        await self.meta.update_one({"_id": "rules"}, {"$inc": {"version": 1}}, upsert=True)
+        await self.load()
+
+    # Priority for a new rule: after every existing rule of the same owner
+    async def next_priority(self, user_id):
+        last = await self.rules.find_one({"userId": user_id}, {"priority": 1}, sort=[("priority", -1)])
+        return last["priority"] + 1 if last else 0
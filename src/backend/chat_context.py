@@ -0,0 +1,191 @@
+# Per-user financial summary sent to the chat model with every /finance-chat message
+#
+# The summary only depends on the user's latest dashboard, budget and progress
+# report, which change on /upload, /save-budget and /upload-progress. A
+# snapshot of those three (only the fields the prompt uses) is kept per user
+# in a bounded in-process LRU and updated in place by the write endpoints, so
+# a chat message normally needs no database call at all.
+#
+# With CHAT_CONTEXT_SHARED=1 the snapshots are also stored in the
+# chat_contexts collection for deployments with several API workers: a write
+# removes the shared copy and bumps the user's version there, and a worker only
+# trusts its own copy for CHAT_CONTEXT_LOCAL_TTL seconds before reading the
+# shared one again. A snapshot is only stored back if the version is still the
+# one read before loading, so a load that raced a write on another worker
+# cannot bring back the old documents.
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from pymongo.errors import DuplicateKeyError
+
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", 10000))  # users kept in memory
+CHAT_CONTEXT_SHARED = os.getenv("CHAT_CONTEXT_SHARED") == "1"
+CHAT_CONTEXT_LOCAL_TTL = float(os.getenv("CHAT_CONTEXT_LOCAL_TTL", 5))  # seconds, only with the shared tier
+
+DASHBOARD_FIELDS = ["statement_month", "total_income", "total_outcome", "net_balance", "categories"]
+BUDGET_FIELDS = ["month", "totalBudget", "categories"]
+PROGRESS_FIELDS = ["statement_month", "overallOverUnder"]
+
+
+def pick(doc, fields):
+    return {name: doc[name] for name in fields if name in doc} if doc else None
+
+
+# The text of the summary, built from a snapshot
+def render_context(snapshot):
+    latest_dashboard = snapshot["dashboard"]
+    latest_budget = snapshot["budget"]
+    latest_progress = snapshot["progress"]
+
+    lines = ["User financial summary:"]
+
+    if latest_dashboard:
+        lines.append(f"- Last month income: €{latest_dashboard['total_income']:.2f}")
+        lines.append(f"- Last month spending: €{latest_dashboard['total_outcome']:.2f}")
+        lines.append(f"- Net balance: €{latest_dashboard['net_balance']:.2f}")
+        if "categories" in latest_dashboard:
+            top_cat = max(latest_dashboard["categories"], key=latest_dashboard["categories"].get)
+            lines.append(f"- Top spending category: {top_cat}")
+            lines.append("- Spending by category:")
+            for cat, amount in latest_dashboard["categories"].items():
+                lines.append(f"  - {cat}: €{amount:.2f}")
+
+    if latest_budget:
+        lines.append(f"- Monthly budget total: €{latest_budget['totalBudget']:.2f}")
+        if "categories" in latest_budget:
+            lines.append("- Budget by category:")
+            for cat, amount in latest_budget["categories"].items():
+                lines.append(f"  - {cat}: €{amount:.2f}")
+
+    if latest_progress:
+        over_under = latest_progress["overallOverUnder"]
+        status = "over budget" if over_under > 0 else "under budget"
+        lines.append(f"- Currently {status} by €{abs(over_under):.2f}")
+
+    return "\n".join(lines) + "\n"
+
+
+class ChatContextCache:
+    def __init__(self, dashboards, budgets, progress_reports, shared=None,
+                 max_entries=CHAT_CONTEXT_CACHE_SIZE, local_ttl=CHAT_CONTEXT_LOCAL_TTL):
+        self.dashboards = dashboards
+        self.budgets = budgets
+        self.progress_reports = progress_reports
+        self.shared = shared  # optional collection shared by all workers
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.entries = OrderedDict()  # userId -> (stored at, snapshot, context text)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.writes = 0  # bumped by every write, to spot a snapshot loaded while a write happened
+
+    def _remember(self, user_id, snapshot):
+        self.entries[user_id] = (time.monotonic(), snapshot, render_context(snapshot))
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _local(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        if self.shared is not None and time.monotonic() - entry[0] > self.local_ttl:
+            return None
+        self.entries.move_to_end(user_id)
+        return entry[2]
+
+    # Reads the three latest documents (the only database work of a chat message on a miss)
+    async def load(self, user_id):
+        latest_dashboard, latest_budget, latest_progress = await asyncio.gather(
+            self.dashboards.find_one({"userId": user_id}, {name: 1 for name in DASHBOARD_FIELDS},
+                                     sort=[("statement_month", -1)]),
+            self.budgets.find_one({"userId": user_id}, {name: 1 for name in BUDGET_FIELDS},
+                                  sort=[("month", -1)]),
+            self.progress_reports.find_one({"userId": user_id}, {name: 1 for name in PROGRESS_FIELDS},
+                                           sort=[("statement_month", -1)]),
+        )
+        return {
+            "dashboard": pick(latest_dashboard, DASHBOARD_FIELDS),
+            "budget": pick(latest_budget, BUDGET_FIELDS),
+            "progress": pick(latest_progress, PROGRESS_FIELDS),
+        }
+
+    # The summary text of a user
+    async def get(self, user_id):
+        context = self._local(user_id)
+        if context is not None:
+            self.hits += 1
+            return context
+
+        doc = None
+        if self.shared is not None:
+            doc = await self.shared.find_one({"_id": user_id})
+            if doc is not None and "snapshot" in doc:
+                self.shared_hits += 1
+                self._remember(user_id, doc["snapshot"])
+                return self.entries[user_id][2]
+
+        self.misses += 1
+        writes = self.writes
+        snapshot = await self.load(user_id)
+        if self.writes != writes or not await self._store_shared(user_id, doc, snapshot):
+            # Something was written while loading: use the snapshot once but do not keep it
+            return render_context(snapshot)
+
+        self._remember(user_id, snapshot)
+        return self.entries[user_id][2]
+
+    # Stores a loaded snapshot in the shared tier unless a write bumped the version since doc was read
+    async def _store_shared(self, user_id, doc, snapshot):
+        if self.shared is None:
+            return True
+        if doc is None:
+            try:
+                await self.shared.insert_one({"_id": user_id, "version": 0, "snapshot": snapshot})
+            except DuplicateKeyError:
+                return False  # a write created the document meanwhile
+            return True
+        result = await self.shared.update_one({"_id": user_id, "version": doc.get("version", 0)},
+                                              {"$set": {"snapshot": snapshot}})
+        return result.matched_count == 1
+
+    # Replaces one part of a cached snapshot if the written document is at least as recent
+    async def _update(self, user_id, part, doc, month_field):
+        self.writes += 1
+        entry = self.entries.get(user_id)
+        if entry is not None:
+            snapshot = dict(entry[1])
+            current = snapshot[part]
+            if current is None or doc[month_field] >= current[month_field]:
+                snapshot[part] = doc
+                self._remember(user_id, snapshot)
+
+        # Other workers rebuild their copy from the database on their next read
+        if self.shared is not None:
+            await self.shared.update_one({"_id": user_id},
+                                         {"$unset": {"snapshot": ""}, "$inc": {"version": 1}}, upsert=True)
+
+    # Called by the write endpoints after the document has been stored
+    async def record_dashboard(self, record):
+        await self._update(record["userId"], "dashboard", pick(record, DASHBOARD_FIELDS), "statement_month")
+
+    async def record_budget(self, budget):
+        await self._update(budget["userId"], "budget", pick(budget, BUDGET_FIELDS), "month")
+
+    async def record_progress(self, record):
+        await self._update(record["userId"], "progress", pick(record, PROGRESS_FIELDS), "statement_month")
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
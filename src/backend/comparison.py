@@ -0,0 +1,129 @@
+# Dashboard comparison and monthly trends, computed inside Mongo
+#
+# The comparison page used to download the dashboard list plus two complete
+# dashboards (every transaction) and diff the category totals in the browser.
+# These pipelines project the stored totals and category sums, turn the
+# categories into rows with $objectToArray and $group them per category in a
+# $facet, so only the compact result leaves the database.
+from bson.objectid import ObjectId
+
+TOTAL_FIELDS = ["total_income", "total_outcome", "net_balance"]
+
+
+def compare_pipeline(user_id, first: ObjectId, second: ObjectId):
+    return [
+        {"$match": {"userId": user_id, "_id": {"$in": [first, second]}}},
+        {"$project": {
+            "statement_month": 1,
+            **{name: 1 for name in TOTAL_FIELDS},
+            "categories": {"$objectToArray": {"$ifNull": ["$categories", {}]}},
+        }},
+        {"$facet": {
+            "dashboards": [{"$project": {"categories": 0}}],
+            "categories": [
+                {"$unwind": "$categories"},
+                {"$group": {
+                    "_id": "$categories.k",
+                    "first": {"$sum": {"$cond": [{"$eq": ["$_id", first]}, "$categories.v", 0]}},
+                    "second": {"$sum": {"$cond": [{"$eq": ["$_id", second]}, "$categories.v", 0]}},
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "category": "$_id",
+                    "first": 1,
+                    "second": 1,
+                    "difference": {"$subtract": ["$first", "$second"]},
+                }},
+                {"$sort": {"category": 1}},
+            ],
+        }},
+    ]
+
+
+# Totals of two dashboards, their differences (first - second) and the per-category sums side by side
+# Returns None if either dashboard does not exist for this user
+async def compare_dashboards(dashboards, user_id, first: ObjectId, second: ObjectId):
+    cursor = await dashboards.aggregate(compare_pipeline(user_id, first, second))
+    result = await cursor.to_list()
+    found = {doc["_id"]: doc for doc in result[0]["dashboards"]} if result else {}
+    if first not in found or second not in found:
+        return None
+
+    for doc in found.values():
+        doc["_id"] = str(doc["_id"])
+
+    return {
+        "first": found[first],
+        "second": found[second],
+        "changes": {name: found[first][name] - found[second][name] for name in TOTAL_FIELDS},
+        "categories": result[0]["categories"],
+    }
+
+
+def trend_pipeline(user_id, start=None, end=None):
+    # Months that only have a progress report have no dashboard totals
+    match = {"userId": user_id, "dashboardCount": {"$gte": 1}}
+    if start or end:
+        match["month"] = {}
+        if start:
+            match["month"]["$gte"] = start
+        if end:
+            match["month"]["$lte"] = end
+
+    return [
+        {"$match": match},
+        {"$sort": {"month": 1}},
+        {"$facet": {
+            "months": [
+                {"$project": {"_id": 0, "month": 1, **{name: 1 for name in TOTAL_FIELDS}}},
+            ],
+            "categories": [
+                {"$project": {"month": 1, "categories": {"$objectToArray": {"$ifNull": ["$categories", {}]}}}},
+                {"$unwind": "$categories"},
+                {"$group": {
+                    "_id": "$categories.k",
+                    "total": {"$sum": "$categories.v"},
+                    "average": {"$avg": "$categories.v"},
+                    "months": {"$push": {"month": "$month", "amount": "$categories.v"}},
+                }},
+                {"$project": {"_id": 0, "category": "$_id", "total": 1, "average": 1, "months": 1}},
+                {"$sort": {"total": -1}},
+            ],
+            "overall": [
+                {"$group": {
+                    "_id": None,
+                    "months": {"$sum": 1},
+                    "total_income": {"$sum": "$total_income"},
+                    "total_outcome": {"$sum": "$total_outcome"},
+                    "net_balance": {"$sum": "$net_balance"},
+                    "average_income": {"$avg": "$total_income"},
+                    "average_outcome": {"$avg": "$total_outcome"},
+                }},
+                {"$project": {"_id": 0}},
+            ],
+        }},
+    ]
+
+
+# Month-by-month totals with the change from the previous month and the running net balance,
+# plus each category's series and the totals over the whole range
+async def monthly_trend(collection, user_id, start=None, end=None):
+    cursor = await collection.aggregate(trend_pipeline(user_id, start, end))
+    result = await cursor.to_list()
+    facets = result[0] if result else {"months": [], "categories": [], "overall": []}
+
+    # The months list is already small (one row per month), so the deltas are added here
+    running_net = 0
+    previous = None
+    for month in facets["months"]:
+        running_net += month.get("net_balance", 0)
+        month["cumulative_net_balance"] = running_net
+        for name in TOTAL_FIELDS:
+            month[f"{name}_change"] = month.get(name, 0) - previous.get(name, 0) if previous else None
+        previous = month
+
+    return {
+        "months": facets["months"],
+        "categories": facets["categories"],
+        "overall": facets["overall"][0] if facets["overall"] else None,
+    }
@@ -0,0 +1,220 @@
+# Compact (columnar) storage of the transactions inside dashboard documents
+#
+# A dashboard normally stores "income" and "outcome" as lists of rows that
+# repeat the keys date/description/amount/category for every transaction, with
+# the date as text ("12 Nov 2025"). With DASHBOARD_STORAGE=columnar new
+# dashboards are stored with one "columns" field instead:
+#   {"version": 1,
+#    "categories": [...], "descriptions": [...],      # every distinct string once
+#    "income":  {"day": [...], "description": [...], "cents": [...]},
+#    "outcome": {"day": [...], "description": [...], "cents": [...], "category": [...]}}
+# day is the date as days since 1970-01-01, cents the amount as an integer and
+# description/category are indexes into the string lists (category -1: none).
+# A date whose text is not what "D Mon YYYY" would print is kept in "date_text".
+#
+# decode_dashboard() turns either format back into the rows the API has always
+# returned, so the endpoints and the frontend do not care how a dashboard is
+# stored. A dashboard that cannot be stored exactly (unknown row fields, an
+# amount with more than two decimals...) is kept as rows.
+#
+# Existing dashboards can be converted (and converted back) with:
+#   python dashboard_storage.py [--revert] [--user-id <id>]
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import bson
+from pymongo import ReplaceOne
+
+DASHBOARD_STORAGE = os.getenv("DASHBOARD_STORAGE", "rows")  # "rows" or "columnar"
+
+FORMAT_VERSION = 1
+PARTS = ["income", "outcome"]
+ROW_FIELDS = {"date", "description", "amount", "category"}
+EPOCH = date(1970, 1, 1)
+
+
+# Statements only use a few hundred distinct dates, so both conversions are cached
+@lru_cache(maxsize=4096)
+def parse_day(text):
+    return (datetime.strptime(text.replace("Sept", "Sep"), "%d %b %Y").date() - EPOCH).days
+
+
+@lru_cache(maxsize=4096)
+def render_day(day):
+    value = EPOCH + timedelta(days=day)
+    return f"{value.day} {value:%b %Y}"
+
+
+def encode_rows(rows, categories, descriptions):
+    column = {"day": [], "description": [], "cents": []}
+    codes = []
+    texts = {}
+    for i, tx in enumerate(rows):
+        if not ROW_FIELDS.issuperset(tx):
+            raise ValueError(f"unknown transaction fields {sorted(set(tx) - ROW_FIELDS)}")
+
+        text = tx["date"]
+        day = parse_day(text)
+        if render_day(day) != text:
+            texts[str(i)] = text
+
+        column["day"].append(day)
+        column["description"].append(descriptions.setdefault(tx["description"], len(descriptions)))
+        column["cents"].append(round(tx["amount"] * 100))
+        codes.append(categories.setdefault(tx["category"], len(categories)) if "category" in tx else -1)
+
+    if any(code >= 0 for code in codes):
+        column["category"] = codes
+    if texts:
+        column["date_text"] = texts
+    return column
+
+
+def decode_rows(column, categories, descriptions):
+    dates = [render_day(day) for day in column["day"]]
+    for i, text in (column.get("date_text") or {}).items():
+        dates[int(i)] = text
+    names = [descriptions[code] for code in column["description"]]
+    amounts = [cents / 100 for cents in column["cents"]]
+
+    codes = column.get("category")
+    if not codes:
+        return [{"date": d, "description": n, "amount": a} for d, n, a in zip(dates, names, amounts)]
+
+    rows = []
+    for d, n, a, code in zip(dates, names, amounts, codes):
+        tx = {"date": d, "description": n, "amount": a}
+        if code >= 0:
+            tx["category"] = categories[code]
+        rows.append(tx)
+    return rows
+
+
+# The dashboard with its income/outcome rows (a dashboard stored as rows is returned as is).
+# Works on projected documents too, see storage_projection()
+def decode_dashboard(doc):
+    columns = doc.get("columns")
+    if columns is None:
+        return doc
+
+    decoded = {}
+    for name, value in doc.items():
+        if name != "columns":
+            decoded[name] = value
+            continue
+        # The rows go where the columns are, so the fields keep their usual order
+        for part in PARTS:
+            if part in columns:
+                decoded[part] = decode_rows(columns[part], columns["categories"], columns["descriptions"])
+    return decoded
+
+
+# The columnar form of a dashboard, or the dashboard itself if it cannot be stored exactly that way
+def encode_dashboard(doc):
+    if "columns" in doc or not any(part in doc for part in PARTS):
+        return doc
+
+    categories, descriptions = {}, {}
+    try:
+        parts = {part: encode_rows(doc[part] or [], categories, descriptions) for part in PARTS if part in doc}
+    except (KeyError, TypeError, ValueError):
+        return doc
+
+    columns = {"version": FORMAT_VERSION, "categories": list(categories), "descriptions": list(descriptions), **parts}
+    encoded = {}
+    for name, value in doc.items():
+        if name in PARTS:
+            encoded.setdefault("columns", columns)
+        else:
+            encoded[name] = value
+
+    # Only kept if it decodes back to exactly the same rows (repr also tells -0.0 from 0.0 and 5 from 5.0)
+    decoded = decode_dashboard(encoded)
+    if any(repr(decoded.get(part)) != repr(doc[part] or []) for part in PARTS if part in doc):
+        return doc
+    return encoded
+
+
+# What a new dashboard is written as, following DASHBOARD_STORAGE
+def stored_dashboard(record, storage=DASHBOARD_STORAGE):
+    return encode_dashboard(record) if storage == "columnar" else record
+
+
+# A find() projection that also works on columnar dashboards: asking for income/outcome
+# also asks for their columns and the string lists
+def storage_projection(projection):
+    if not projection or not any(projection.get(part) for part in PARTS):
+        return projection
+
+    projection = dict(projection)
+    projection["columns.version"] = 1
+    projection["columns.categories"] = 1
+    projection["columns.descriptions"] = 1
+    for part in PARTS:
+        if projection.get(part):
+            projection[f"columns.{part}"] = 1
+    return projection
+
+
+# Converts stored dashboards to the columnar form (or back with revert=True) in batches
+async def migrate(dashboards, user_id=None, revert=False, batch_size=500):
+    filter_query = {"columns": {"$exists": revert}}
+    if user_id:
+        filter_query["userId"] = user_id
+
+    counts = {"converted": 0, "unchanged": 0, "bytes_before": 0, "bytes_after": 0}
+    batch = []
+
+    async def flush():
+        if batch:
+            await dashboards.bulk_write(batch, ordered=False)
+            batch.clear()
+
+    async for doc in dashboards.find(filter_query):
+        converted = decode_dashboard(doc) if revert else encode_dashboard(doc)
+        if converted is doc:
+            counts["unchanged"] += 1
+            continue
+
+        counts["converted"] += 1
+        counts["bytes_before"] += len(bson.encode(doc))
+        counts["bytes_after"] += len(bson.encode(converted))
+        batch.append(ReplaceOne({"_id": doc["_id"]}, converted))
+        if len(batch) >= batch_size:
+            await flush()
+
+    await flush()
+    return counts
+
+
+async def run(args):
+    from dotenv import load_dotenv
+    from pymongo import AsyncMongoClient
+
+    load_dotenv()
+    client = AsyncMongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=2000)
+    try:
+        counts = await migrate(client["expense_db"]["dashboards"], args.user_id, args.revert, args.batch_size)
+    finally:
+        await client.close()
+
+    print(f"{counts['converted']} dashboards converted to {'rows' if args.revert else 'columns'}, "
+          f"{counts['unchanged']} left as they were")
+    if counts["converted"]:
+        print(f"{counts['bytes_before']} -> {counts['bytes_after']} bytes "
+              f"({counts['bytes_after'] / counts['bytes_before']:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored dashboards to or from the columnar format")
+    parser.add_argument("--revert", action="store_true", help="convert columnar dashboards back to rows")
+    parser.add_argument("--user-id", help="only this user's dashboards")
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Async MongoDB access for the API
+#
+# Every handler awaits the collections of one AsyncMongoClient, so a query no
+# longer blocks the event loop (or a threadpool thread) while it waits for
+# Mongo. The client owns a single connection pool per API worker; it is opened
+# in the app's lifespan and closed on shutdown. The pool counters are exposed
+# at /mongo/stats to help pick MONGO_MAX_POOL_SIZE for a deployment, and the
+# time of every read and write command goes to the /metrics stage histograms.
+import logging
+import os
+
+from pymongo import AsyncMongoClient
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+
+from observability import metrics
+
+log = logging.getLogger(__name__)
+
+
+# Reads an optional millisecond setting; unset or 0 means "no limit"
+def env_ms(name, default=None):
+    value = int(os.getenv(name, default or 0))
+    return value or None
+
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))  # connections per API worker
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))  # connections kept open while idle
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", 2))  # connections opened at the same time
+MONGO_SERVER_SELECTION_TIMEOUT_MS = env_ms("MONGO_SERVER_SELECTION_TIMEOUT_MS", 2000)
+MONGO_CONNECT_TIMEOUT_MS = env_ms("MONGO_CONNECT_TIMEOUT_MS", 5000)
+MONGO_SOCKET_TIMEOUT_MS = env_ms("MONGO_SOCKET_TIMEOUT_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = env_ms("MONGO_WAIT_QUEUE_TIMEOUT_MS")  # wait for a free connection
+MONGO_MAX_IDLE_MS = env_ms("MONGO_MAX_IDLE_MS")
+
+
+# Counts connection pool events (pymongo calls these synchronously)
+class PoolMonitor(ConnectionPoolListener):
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+# Times the commands the endpoints send as the mongo_read and mongo_write stages
+# (admin commands such as ping or createIndexes are left out)
+class CommandTimer(CommandListener):
+    STAGES = {
+        "find": "mongo_read", "getMore": "mongo_read", "aggregate": "mongo_read",
+        "count": "mongo_read", "distinct": "mongo_read",
+        "insert": "mongo_write", "update": "mongo_write", "delete": "mongo_write", "findAndModify": "mongo_write",
+    }
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stage = self.STAGES.get(event.command_name)
+        if stage:
+            metrics.observe_stage(stage, event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        stage = self.STAGES.get(event.command_name)
+        if stage:
+            metrics.observe_stage(stage, event.duration_micros / 1_000_000, failed=True)
+
+
+class Database:
+    def __init__(self, uri, name="expense_db"):
+        self.pool_monitor = PoolMonitor()
+        # The client does not connect until the first operation, so creating it at import time is fine
+        self.client = AsyncMongoClient(
+            uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxConnecting=MONGO_MAX_CONNECTING,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+            event_listeners=[self.pool_monitor, CommandTimer()],
+        )
+        self.db = self.client[name]
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    # Called from the lifespan: checks the server is reachable (the app still starts if not)
+    async def connect(self):
+        try:
+            await self.client.admin.command("ping")
+            log.info("MongoDB connected successfully")
+        except Exception as e:
+            log.error("MongoDB connection error: %s", e)
+
+    async def close(self):
+        await self.client.close()
+
+    def stats(self):
+        return {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "openConnections": self.pool_monitor.open,
+            "checkedOut": self.pool_monitor.checked_out,
+            "peakCheckedOut": self.pool_monitor.peak_checked_out,
+            "checkouts": self.pool_monitor.checkouts,
+            "checkoutFailures": self.pool_monitor.checkout_failures,
+        }
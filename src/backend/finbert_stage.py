@@ -0,0 +1,209 @@
+# Optional FinBERT inference stage for the upload pipeline
+#
+# Rows the keyword rules leave as "Other" can be sent to a fine-tuned FinBERT
+# model (see finetuning.py). The model is loaded once at startup and the
+# descriptions from concurrent uploads are grouped into micro-batches: a batch
+# runs as soon as it holds FINBERT_MAX_BATCH rows or the oldest row has waited
+# FINBERT_MAX_WAIT_MS. The stage is off unless FINBERT_MODEL_DIR is set, and
+# torch/transformers are only imported when it is switched on.
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+FINBERT_MODEL_DIR = os.getenv("FINBERT_MODEL_DIR")  # e.g. ./finbert-finetuned-category
+FINBERT_MAX_BATCH = int(os.getenv("FINBERT_MAX_BATCH", 32))
+FINBERT_MAX_WAIT_MS = float(os.getenv("FINBERT_MAX_WAIT_MS", 10))
+FINBERT_OPTIMISE = os.getenv("FINBERT_OPTIMISE", "int8")  # "int8", "onnx" or "none"
+FINBERT_MIN_CONFIDENCE = float(os.getenv("FINBERT_MIN_CONFIDENCE", 0.6))
+FINBERT_MAX_LENGTH = 64  # transaction descriptions are short
+
+
+class FinbertClassifier:
+    def __init__(self, model_dir, optimise=FINBERT_OPTIMISE):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        if optimise == "onnx":
+            # Exports the model to ONNX and runs it with onnxruntime (needs optimum[onnxruntime])
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            self.model = ORTModelForSequenceClassification.from_pretrained(model_dir, export=True)
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+            self.model.eval()
+            if optimise == "int8":
+                # Dynamic int8 quantisation of the Linear layers for faster CPU inference
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+
+        self.labels = self.model.config.id2label
+
+    # Returns (label, confidence) for every text
+    def predict(self, texts):
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=FINBERT_MAX_LENGTH, return_tensors="pt"
+        )
+        with self.torch.inference_mode():
+            logits = self.model(**enc).logits
+        probs = self.torch.softmax(logits, dim=-1)
+        confidence, index = probs.max(dim=-1)
+        return [(self.labels[int(i)], float(c)) for i, c in zip(index, confidence)]
+
+
+class MicroBatcher:
+    def __init__(self, classifier, max_batch=FINBERT_MAX_BATCH, max_wait_ms=FINBERT_MAX_WAIT_MS):
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+        self.executor = None
+        self.current = []  # batch being classified
+        self.batches = 0
+        self.rows = 0
+        self.failures = 0
+
+    # Created here (not in __init__) so a stopped batcher can be started again
+    def start(self):
+        # One inference thread: torch already spreads a batch over the CPU cores
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+        # Callers still waiting get an error instead of waiting forever
+        waiting = list(self.current)
+        while self.queue and not self.queue.empty():
+            waiting.append(self.queue.get_nowait())
+        for _, future in waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("FinBERT batcher stopped"))
+        self.current = []
+
+    # Queues the texts and waits for their predictions
+    async def classify(self, texts):
+        if self.task is None:
+            raise RuntimeError("FinBERT batcher is not running")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((text, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self.current = await self._next_batch()
+            texts = [text for text, _ in batch]
+            try:
+                predictions = await loop.run_in_executor(self.executor, self.classifier.predict, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self.current = []
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+            self.current = []
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "averageBatchSize": self.rows / self.batches if self.batches else 0.0,
+            "maxBatch": self.max_batch,
+            "maxWaitMs": self.max_wait * 1000,
+            "failures": self.failures,
+        }
+
+
+class FinbertStage:
+    def __init__(self, model_dir=FINBERT_MODEL_DIR):
+        self.model_dir = model_dir
+        self.batcher = None
+
+    @property
+    def enabled(self):
+        return self.batcher is not None
+
+    # Loads the model once; the stage stays off if it is not configured or cannot load
+    def start(self):
+        if not self.model_dir:
+            return
+        try:
+            classifier = FinbertClassifier(self.model_dir)
+        except Exception as e:
+            log.warning("FinBERT stage disabled: %s", e)
+            return
+        self.batcher = MicroBatcher(classifier)
+        self.batcher.start()
+
+    async def stop(self):
+        if self.batcher:
+            await self.batcher.stop()
+            self.batcher = None
+
+    # Re-labels "Other" expenses the model is confident about (only with labels that are real categories)
+    async def refine(self, transactions, categories):
+        if not self.enabled:
+            return
+        others = [tx for tx in transactions if tx.get("category") == "Other"]
+        if not others:
+            return
+
+        batcher = self.batcher
+        try:
+            predictions = await batcher.classify([tx["description"] for tx in others])
+        except Exception as e:
+            # The stage only refines: a model error keeps the rule labels, it never fails the upload
+            batcher.failures += 1
+            log.warning("FinBERT refinement skipped: %s", e)
+            return
+
+        for tx, (label, confidence) in zip(others, predictions):
+            if label in categories and confidence >= FINBERT_MIN_CONFIDENCE:
+                tx["category"] = label
+
+
+# Shared stage used by the upload endpoints
+finbert_stage = FinbertStage()
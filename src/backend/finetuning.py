@@ -1,83 +1,179 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments
-import torch
-from torch.utils.data import Dataset
+# Fine-tunes FinBERT on labelled transaction descriptions
+#
+# Example:
+#   python finetuning.py --csv transactions_labeled.csv --label-column label_income_expense --output ./finbert-finetuned-ie
+#
+# The CSV is tokenised once and cached as an Arrow dataset (memory-mapped on
+# later runs), batches are padded only to their longest row and grouped by
+# length, and the model is evaluated on a held-out validation split.
+# Throughput and wall time for every epoch are saved to training_metrics.json.
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
 import pandas as pd
-
-# Loads in data
-class TransactionDataset(Dataset):
-    def __init__(self, texts, labels):
-        self.texts = texts
-        self.labels = labels
-
-    def __len__(self):
-        return len(self.texts)
-
-    def __getitem__(self, idx):
-        return {
-            "text": self.texts[idx],
-            "label": self.labels[idx]
-        }
-
-
-# Loads in CSV file with data for fine tuning
-df = pd.read_csv("transactions_labeled.csv")
-texts = df["text"].tolist()
-labels_ie = df["label_income_expense"].tolist()
-
-dataset = TransactionDataset(texts, labels_ie)
-
-# Loads in tokenizer and model
-model_name = "yiyanghkust/finbert-tone"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)  
-
-# Tokenises data
-def tokenize_fn(examples):
-    return tokenizer(examples["text"], padding="max_length", truncation=True, max_length=128)
-
-# Wraps the dataset from the csv file
-class TokenizedDataset(Dataset):
-    def __init__(self, ds, tokenizer):
-        self.ds = ds
-        self.tokenizer = tokenizer
-
-    def __len__(self):
-        return len(self.ds)
-
-    def __getitem__(self, idx):
-        item = self.ds[idx]
-        enc = self.tokenizer(item["text"], padding="max_length", truncation=True, max_length=128, return_tensors="pt")
-        return {
-            "input_ids": enc["input_ids"].squeeze(),
-            "attention_mask": enc["attention_mask"].squeeze(),
-            "labels": torch.tensor(item["label"], dtype=torch.long)
-        }
-
-tokenized = TokenizedDataset(dataset, tokenizer)
-
-# Sets up trainer that will fine-tune finBERT
-# 4. Set up Trainer
-training_args = TrainingArguments(
-    output_dir="./finbert-finetuned",
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    num_train_epochs=3,
-    save_steps=500,
-    save_total_limit=2,
-    evaluation_strategy="epoch",
-    logging_steps=100
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized,
-    eval_dataset=tokenized,
+from datasets import Dataset, load_from_disk
+from transformers import (
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    DataCollatorWithPadding,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
+    set_seed,
 )
 
-# Trains the model
-trainer.train()
-
-# Saves everything
-model.save_pretrained("./finbert-finetuned-ie")
-tokenizer.save_pretrained("./finbert-finetuned-ie")
\ No newline at end of file
+MODEL_NAME = "yiyanghkust/finbert-tone"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fine-tune FinBERT on transaction descriptions")
+    parser.add_argument("--csv", default="transactions_labeled.csv")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label_income_expense")
+    parser.add_argument("--output", default="./finbert-finetuned-ie")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--cache-dir", default="./tokenized-cache")
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--val-size", type=float, default=0.1)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# Label names by id: the distinct labels (0/1, or category names) are numbered 0..n-1
+def label_mapping(labels):
+    return dict(enumerate(str(label) for label in sorted(labels.unique())))
+
+
+# Loads the tokenised dataset from the cache, or tokenises the CSV once and caches it
+def load_tokenized(args, tokenizer):
+    with open(args.csv, "rb") as f:
+        csv_hash = hashlib.sha256(f.read()).hexdigest()
+    key = hashlib.sha256(
+        f"{csv_hash}:{args.model}:{args.max_length}:{args.text_column}:{args.label_column}".encode()
+    ).hexdigest()[:16]
+    path = os.path.join(args.cache_dir, key)
+
+    df = pd.read_csv(args.csv)
+    id2label = label_mapping(df[args.label_column])
+
+    if os.path.isdir(path):
+        print(f"Using cached tokenised dataset {path}")
+        return load_from_disk(path), id2label
+
+    label2id = {label: i for i, label in id2label.items()}
+    dataset = Dataset.from_dict({
+        "text": df[args.text_column].astype(str).tolist(),
+        "labels": [label2id[str(label)] for label in df[args.label_column]],
+    })
+
+    # No padding here: the collator pads each batch to its own longest row
+    def tokenize(batch):
+        enc = tokenizer(batch["text"], truncation=True, max_length=args.max_length)
+        enc["length"] = [len(ids) for ids in enc["input_ids"]]
+        return enc
+
+    dataset = dataset.map(tokenize, batched=True, remove_columns=["text"])
+    dataset.save_to_disk(path)
+    return load_from_disk(path), id2label
+
+
+# Records wall time and samples/sec for every epoch
+class EpochTimer(TrainerCallback):
+    def __init__(self, train_size):
+        self.train_size = train_size
+        self.epochs = []
+        self.started = None
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        seconds = time.perf_counter() - self.started
+        self.epochs.append({
+            "epoch": len(self.epochs) + 1,
+            "seconds": round(seconds, 2),
+            "samplesPerSec": round(self.train_size / seconds, 1),
+        })
+        print(f"Epoch {len(self.epochs)}: {seconds:.1f}s, {self.train_size / seconds:.1f} samples/sec")
+
+
+def compute_metrics(eval_pred):
+    logits, labels = eval_pred
+    return {"accuracy": float((np.argmax(logits, axis=-1) == labels).mean())}
+
+
+def main():
+    args = parse_args()
+    set_seed(args.seed)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    dataset, id2label = load_tokenized(args, tokenizer)
+
+    # Held-out validation split (the model is never evaluated on its own training rows)
+    split = dataset.train_test_split(test_size=args.val_size, seed=args.seed)
+
+    model = AutoModelForSequenceClassification.from_pretrained(
+        args.model,
+        num_labels=len(id2label),
+        id2label=id2label,
+        label2id={label: i for i, label in id2label.items()},
+        ignore_mismatched_sizes=True,
+    )
+
+    training_args = TrainingArguments(
+        output_dir=args.output + "-checkpoints",
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        num_train_epochs=args.epochs,
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        save_total_limit=2,
+        logging_steps=100,
+        group_by_length=True,  # batches rows of similar length together so padding stays small
+        length_column_name="length",
+        seed=args.seed,
+        data_seed=args.seed,
+        report_to=[],
+    )
+
+    timer = EpochTimer(len(split["train"]))
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=split["train"],
+        eval_dataset=split["test"],
+        data_collator=DataCollatorWithPadding(tokenizer),
+        compute_metrics=compute_metrics,
+        callbacks=[timer],
+    )
+
+    # Trains the model
+    started = time.perf_counter()
+    trainer.train()
+    wall_time = time.perf_counter() - started
+    metrics = trainer.evaluate()
+
+    # Saves everything
+    model.save_pretrained(args.output)
+    tokenizer.save_pretrained(args.output)
+
+    report = {
+        "trainSize": len(split["train"]),
+        "validationSize": len(split["test"]),
+        "wallTimeSeconds": round(wall_time, 2),
+        "epochs": timer.epochs,
+        "validation": metrics,
+    }
+    with open(os.path.join(args.output, "training_metrics.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# Bulk import of many statements as a background job
+#
+# POST /import takes any number of PDFs (or ZIP files of PDFs) and answers
+# straight away with a job id. The statements go on a local queue that
+# IMPORT_WORKERS background tasks drain through the PDF parsing pool and the
+# parse cache, so a year of statements is read as fast as the pool allows and
+# no request waits for it. Once every statement of a job has been read:
+#   - files that are byte-for-byte copies of another file of the job are dropped,
+#   - one statement is kept per month (the one with the most transactions),
+#   - months whose stored dashboard already has the same transactions are skipped,
+# and the remaining dashboards are written with one bulk insert.
+# Progress is kept in the import_jobs collection, so GET /import/{id} can be
+# polled from any API worker. Each job records the worker running it and a
+# heartbeat that worker refreshes every IMPORT_HEARTBEAT seconds; a job whose
+# heartbeat is older than IMPORT_STALE_AFTER seconds lost its worker (a restart
+# or a crash) and is marked as failed by whichever worker notices first.
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+from dashboard_storage import decode_dashboard, storage_projection
+from statement_parser import statement_month
+
+log = logging.getLogger(__name__)
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.getenv("PDF_WORKERS", os.cpu_count() or 2)))
+IMPORT_QUEUE_DEPTH = int(os.getenv("IMPORT_QUEUE_DEPTH", 500))  # statements waiting in all jobs together
+IMPORT_MAX_FILES = int(os.getenv("IMPORT_MAX_FILES", 120))  # statements per job (after unzipping)
+IMPORT_MAX_FILE_BYTES = int(os.getenv("IMPORT_MAX_FILE_BYTES", 20 * 1024 * 1024))  # per statement
+IMPORT_HEARTBEAT = float(os.getenv("IMPORT_HEARTBEAT", 15))  # seconds between heartbeats of running jobs
+IMPORT_STALE_AFTER = float(os.getenv("IMPORT_STALE_AFTER", 120))  # seconds without a heartbeat before a job is failed
+IMPORT_BUSY_RETRIES = 20  # times a statement is retried while the parsing pool is busy
+
+
+# The PDFs in the uploaded files: (filename, bytes), ZIP files are unpacked
+def expand_files(files, max_files=IMPORT_MAX_FILES, max_bytes=IMPORT_MAX_FILE_BYTES):
+    statements = []
+
+    def add(filename, size, read):
+        if len(statements) >= max_files:
+            raise HTTPException(400, f"At most {max_files} statements per import")
+        if size > max_bytes:
+            raise HTTPException(400, f"{filename} is larger than {max_bytes} bytes")
+        statements.append((filename, read()))
+
+    for filename, data in files:
+        if not zipfile.is_zipfile(io.BytesIO(data)):
+            add(filename, len(data), lambda: data)
+            continue
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in archive.infolist():
+                    name = member.filename
+                    if member.is_dir() or not name.lower().endswith(".pdf") or name.startswith("__MACOSX/"):
+                        continue
+                    # The size is checked before unpacking, so a zip bomb is never expanded
+                    add(f"{filename}/{name}", member.file_size, lambda: archive.read(member))
+        except zipfile.BadZipFile as e:
+            raise HTTPException(400, f"Could not read {filename}: {e}")
+
+    if not statements:
+        raise HTTPException(400, "No statements found")
+    return statements
+
+
+# Identifies the transactions of a statement, whatever categories they were given
+def transactions_fingerprint(transactions):
+    rows = sorted((tx["date"], tx["description"], tx["amount"]) for tx in transactions)
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+class ImportJobs:
+    # parse(data) -> transactions, build(user_id, transactions) -> dashboard record,
+    # save(records) -> indexes of the records that could not be written
+    def __init__(self, collection, dashboards, parse, build, save,
+                 workers=IMPORT_WORKERS, queue_depth=IMPORT_QUEUE_DEPTH):
+        self.collection = collection
+        self.dashboards = dashboards
+        self.parse = parse
+        self.build = build
+        self.save = save
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.queue = None
+        self.tasks = []
+        self.stopping = False
+        self.worker_id = uuid.uuid4().hex  # this process, recorded on the jobs it runs
+        self.jobs = {}  # job id -> parsed statements of the jobs this process is running
+        self.statements_read = 0
+        self.jobs_finished = 0
+
+    def start(self):
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        self.stopping = False
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        # The flag as well as the cancel: on Python 3.11 wait_for() can swallow a cancel
+        # that arrives just as the parse finishes, and the worker would wait for the next statement
+        self.stopping = True
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    # Jobs whose worker stopped heartbeating (it restarted or crashed) cannot be finished;
+    # jobs of workers that are still alive are left alone
+    async def fail_unfinished(self):
+        stale = (datetime.now() - timedelta(seconds=IMPORT_STALE_AFTER)).isoformat()
+        await self.collection.update_many(
+            {"status": {"$in": ["queued", "running"]}, "workerId": {"$ne": self.worker_id},
+             "$or": [{"heartbeatAt": {"$lt": stale}}, {"heartbeatAt": {"$exists": False}}]},
+            {"$set": {"status": "failed", "error": "The server restarted during the import",
+                      "finishedAt": datetime.now().isoformat()}},
+        )
+
+    # Keeps the jobs of this worker alive and fails the ones other workers left behind
+    async def _heartbeat(self):
+        while not self.stopping:
+            await asyncio.sleep(IMPORT_HEARTBEAT)
+            try:
+                if self.jobs:
+                    await self.collection.update_many(
+                        {"_id": {"$in": list(self.jobs)}, "status": {"$in": ["queued", "running"]}},
+                        {"$set": {"heartbeatAt": datetime.now().isoformat()}},
+                    )
+                await self.fail_unfinished()
+            except Exception as e:
+                log.warning("Import heartbeat failed: %s", e)
+
+    # Creates the job and queues its statements, returns the job document
+    async def submit(self, user_id, files):
+        statements = expand_files(files)
+        if self.queue.qsize() + len(statements) > self.queue_depth:
+            raise HTTPException(503, "Too many statements waiting to be imported, please try again shortly",
+                                headers={"Retry-After": "30"})
+
+        job_id = uuid.uuid4().hex
+        entries = []
+        seen = {}
+        for index, (filename, data) in enumerate(statements):
+            digest = hashlib.sha256(data).hexdigest()
+            entry = {"filename": filename, "hash": digest, "status": "queued"}
+            if digest in seen:
+                entry["status"] = "duplicate"
+                entry["duplicateOf"] = seen[digest]
+            else:
+                seen[digest] = filename
+            entries.append(entry)
+
+        queued = [i for i, entry in enumerate(entries) if entry["status"] == "queued"]
+        job = {
+            "_id": job_id,
+            "userId": user_id,
+            "status": "queued",
+            "createdAt": datetime.now().isoformat(),
+            "workerId": self.worker_id,
+            "heartbeatAt": datetime.now().isoformat(),
+            "total": len(entries),
+            "read": 0,
+            "saved": 0,
+            "statements": entries,
+        }
+        await self.collection.insert_one(job)
+
+        self.jobs[job_id] = {"userId": user_id, "pending": len(queued), "parsed": {}}
+        for i in queued:
+            self.queue.put_nowait((job_id, i, statements[i][1]))
+        return job
+
+    async def status(self, job_id):
+        return await self.collection.find_one({"_id": job_id})
+
+    async def _worker(self):
+        while not self.stopping:
+            job_id, index, data = await self.queue.get()
+            try:
+                await self._read(job_id, index, data)
+            except Exception:
+                log.exception("Import worker error")
+            finally:
+                self.queue.task_done()
+
+    async def _parse(self, data):
+        # The parsing pool answers 503 while it is full; a background job can simply wait
+        for attempt in range(IMPORT_BUSY_RETRIES):
+            try:
+                return await self.parse(data)
+            except HTTPException as e:
+                if e.status_code != 503 or attempt == IMPORT_BUSY_RETRIES - 1:
+                    raise
+                await asyncio.sleep(0.5)
+
+    async def _read(self, job_id, index, data):
+        job = self.jobs[job_id]
+        update = {"status": "running"}
+        try:
+            transactions = await self._parse(data)
+            if not transactions:
+                raise HTTPException(400, "No transactions found")
+            month = statement_month(transactions)
+        except HTTPException as e:
+            # no transactions, the statement took too long (504) or the pool stayed busy (503)
+            update[f"statements.{index}.status"] = "error"
+            update[f"statements.{index}.error"] = e.detail
+        except Exception as e:
+            update[f"statements.{index}.status"] = "error"
+            update[f"statements.{index}.error"] = f"Could not read PDF: {e}"
+        else:
+            job["parsed"][index] = (month, transactions)
+            update[f"statements.{index}.status"] = "read"
+            update[f"statements.{index}.month"] = month
+            update[f"statements.{index}.transactions"] = len(transactions)
+
+        self.statements_read += 1
+        job["pending"] -= 1
+        try:
+            await self.collection.update_one({"_id": job_id}, {"$set": update, "$inc": {"read": 1}})
+        finally:
+            if job["pending"] == 0:
+                await self._finish(job_id)
+
+    async def _finish(self, job_id):
+        # The job stays in self.jobs (and keeps its heartbeat) until its dashboards are written
+        job = self.jobs[job_id]
+        try:
+            await self._save(job_id, job)
+        except Exception as e:
+            log.exception("Import %s failed", job_id)
+            await self.collection.update_one({"_id": job_id}, {"$set": {
+                "status": "failed", "error": str(e) or type(e).__name__, "finishedAt": datetime.now().isoformat(),
+            }})
+        finally:
+            self.jobs.pop(job_id, None)
+
+    # Dedupes the statements of a job that has been read by month and writes the dashboards
+    async def _save(self, job_id, job):
+        user_id = job["userId"]
+        update = {}
+
+        # One statement per month: the one with the most transactions (e.g. a full month over a partial one)
+        by_month = {}
+        for index, (month, transactions) in sorted(job["parsed"].items()):
+            best = by_month.get(month)
+            if best is None or len(transactions) > len(job["parsed"][best][1]):
+                if best is not None:
+                    update[f"statements.{best}.status"] = "duplicate"
+                by_month[month] = index
+            else:
+                update[f"statements.{index}.status"] = "duplicate"
+
+        # Months the user already has with exactly these transactions
+        stored = {}
+        fields = storage_projection({"statement_month": 1, "income": 1, "outcome": 1})
+        async for doc in self.dashboards.find({"userId": user_id, "statement_month": {"$in": list(by_month)}}, fields):
+            doc = decode_dashboard(doc)
+            stored.setdefault(doc["statement_month"], set()).add(
+                transactions_fingerprint((doc.get("income") or []) + (doc.get("outcome") or [])))
+
+        indexes = []
+        for month, index in by_month.items():
+            transactions = job["parsed"][index][1]
+            if transactions_fingerprint(transactions) in stored.get(month, ()):
+                update[f"statements.{index}.status"] = "already_imported"
+            else:
+                indexes.append(index)
+
+        records = [await self.build(user_id, job["parsed"][i][1]) for i in indexes]
+        failed = await self.save(records) if records else set()
+        for position, (i, record) in enumerate(zip(indexes, records)):
+            if position in failed:
+                update[f"statements.{i}.status"] = "error"
+                update[f"statements.{i}.error"] = "Could not save dashboard"
+            else:
+                update[f"statements.{i}.status"] = "saved"
+                update[f"statements.{i}.dashboardId"] = str(record["_id"])
+
+        self.jobs_finished += 1
+        update["status"] = "done"
+        update["saved"] = len(records) - len(failed)
+        update["finishedAt"] = datetime.now().isoformat()
+        await self.collection.update_one({"_id": job_id}, {"$set": update})
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "runningJobs": len(self.jobs),
+            "statementsRead": self.statements_read,
+            "jobsFinished": self.jobs_finished,
+        }
@@ -0,0 +1,129 @@
+# Precompiled keyword matcher used to categorise transaction descriptions
+#
+# The rules are an ordered mapping of category -> keywords, and the first
+# category (in rule order) with a keyword inside the description wins. Instead
+# of testing every keyword against every description, all keywords are
+# compiled once into an Aho-Corasick automaton that finds every keyword in a
+# single pass over the text, whatever the number of keywords.
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+CATEGORY_MEMO_SIZE = int(os.getenv("CATEGORY_MEMO_SIZE", 10000))  # merchants remembered across requests
+
+
+# Memo key for a description: case and spacing differences map to the same merchant
+def normalise_description(text: str):
+    return " ".join(text.lower().split())
+
+
+class KeywordMatcher:
+    def __init__(self, rules: dict, default="Other"):
+        self.categories = list(rules)
+        self.default = default
+        # Fingerprint of the rules this matcher was built from
+        self.version = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:16]
+
+        # Trie of all keywords: goto[state] maps a character to the next state
+        self.goto = [{}]
+        # Lowest category index (= highest priority) of any keyword ending at each state
+        self.best = [None]
+
+        for priority, keywords in enumerate(rules.values()):
+            for keyword in keywords:
+                state = 0
+                for ch in keyword.lower():
+                    if ch not in self.goto[state]:
+                        self.goto.append({})
+                        self.best.append(None)
+                        self.goto[state][ch] = len(self.goto) - 1
+                    state = self.goto[state][ch]
+                if self.best[state] is None or priority < self.best[state]:
+                    self.best[state] = priority
+
+        # Failure links (breadth-first); each state also inherits the best
+        # priority of its failure state so overlapping keywords are not missed
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+
+    # Returns the category of the highest priority keyword found in the text
+    def match(self, text: str):
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = None
+
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                # Nothing can beat the first category
+                if found == 0:
+                    break
+
+        return self.categories[found] if found is not None else self.default
+
+
+# Remembers the category of each merchant description across requests
+# Descriptions repeat a lot ("Tesco", "Spotify", ...), so each distinct one is
+# only matched once. The memo empties itself when the rules (matcher) change.
+class CategoryMemo:
+    def __init__(self, max_entries=CATEGORY_MEMO_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None  # version of the matcher the entries were made with
+        self.hits = 0
+        self.misses = 0
+        self.rows = 0
+        self.flushes = 0
+
+    # Returns the category of every description, in the same order
+    def categorise_batch(self, matcher: KeywordMatcher, descriptions):
+        if matcher.version != self.version:
+            self.entries.clear()
+            self.version = matcher.version
+            self.flushes += 1
+
+        keys = [normalise_description(d) for d in descriptions]
+        self.rows += len(keys)
+
+        found = {}
+        for key in dict.fromkeys(keys):
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                found[key] = self.entries[key]
+            else:
+                self.misses += 1
+                found[key] = self.entries[key] = matcher.match(key)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "rows": self.rows,
+            "uniqueDescriptions": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "flushes": self.flushes,
+        }
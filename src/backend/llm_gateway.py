@@ -0,0 +1,242 @@
+# Async gateway to the hosted chat model used by /finance-chat
+#
+# One httpx.AsyncClient keeps a pool of keep-alive connections to the model
+# endpoint, so a chat message no longer pays for a new TLS handshake and no
+# longer blocks the event loop while the model is generating. On top of it:
+#   - a semaphore caps how many completions run upstream at once,
+#   - identical requests that arrive while one is already running wait for
+#     that one instead of calling the model again (request coalescing),
+#   - successful replies are cached, keyed by the version of the user's data
+#     and the normalised question, so a repeated question about unchanged data
+#     is answered without calling the model.
+# stream() is the streaming variant used by /finance-chat with "stream": true.
+# Upstream calls are timed as the llm_call / llm_stream stages in /metrics.
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+import httpx
+from fastapi import HTTPException
+
+from observability import metrics
+
+log = logging.getLogger(__name__)
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))  # keep-alive connections to the model
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # completions running upstream at once
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))  # seconds per completion
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1000))  # cached replies
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 600))  # seconds a cached reply is reused
+
+
+# Questions that only differ in case, spacing or trailing punctuation share a cache entry
+def normalise_question(text: str):
+    return re.sub(r"\s+", " ", text.lower()).strip().rstrip("?!. ")
+
+
+# Cache key: a hash of the user's data as sent to the model (changes whenever that data changes)
+# plus the normalised question
+def reply_key(context: str, question: str):
+    data_version = hashlib.sha256(context.encode()).hexdigest()[:16]
+    return f"{data_version}:{normalise_question(question)}"
+
+
+class LlmGateway:
+    def __init__(self, url, token, max_connections=LLM_MAX_CONNECTIONS, max_concurrency=LLM_MAX_CONCURRENCY,
+                 timeout=LLM_TIMEOUT, cache_size=LLM_CACHE_SIZE, cache_ttl=LLM_CACHE_TTL):
+        self.url = url
+        self.token = token
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.client = None
+        self.slots = None
+        self.cache = OrderedDict()  # key -> (stored at, reply)
+        self.in_flight = {}  # key -> task of the upstream call
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.streams = 0
+        self.streams_cancelled = 0
+
+    # Called from the app's lifespan
+    def start(self):
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=self.timeout,
+        )
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def stop(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def _cached(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        stored_at, reply = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return reply
+
+    def _remember(self, key, reply):
+        self.cache[key] = (time.monotonic(), reply)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    # Returns {"response": text} for the payload; key identifies identical requests
+    async def complete(self, payload: dict, key: str):
+        self.requests += 1
+
+        reply = self._cached(key)
+        if reply is not None:
+            self.cache_hits += 1
+            return {"response": reply}
+
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(payload, key))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+
+        # shield: a client that disconnects must not cancel the call other requests are waiting on
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self.in_flight.pop(key, None)
+        # Marks the error as seen even if every waiting client has gone away
+        if not task.cancelled():
+            task.exception()
+
+    # Fallback reply (or HTTPException) for a response the model did not answer with 200
+    def _status_reply(self, response):
+        # Check for non-200 status before trying to parse JSON
+        if response.status_code == 404:
+            self.upstream_errors += 1
+            raise HTTPException(500, "Model endpoint not found - check the URL")
+
+        if response.status_code == 503 or not response.text.strip():
+            return "The AI model is warming up. Please wait 20 seconds and try again."
+
+        if response.status_code != 200:
+            self.upstream_errors += 1
+            log.warning("LLM returned status %s", response.status_code)
+            return f"HuggingFace returned status {response.status_code}: {response.text}"
+
+        return None
+
+    def _failed(self, error):
+        self.upstream_errors += 1
+        log.warning("LLM request failed: %r", error)
+        return HTTPException(500, str(error) or type(error).__name__)
+
+    async def _call(self, payload: dict, key: str):
+        async with self.slots:
+            self.upstream_calls += 1
+            try:
+                with metrics.span("llm_call"):
+                    response = await self.client.post(self.url, json=payload)
+            except httpx.HTTPError as e:
+                raise self._failed(e)
+
+        fallback = self._status_reply(response)
+        if fallback is not None:
+            return {"response": fallback}
+
+        result = response.json()
+
+        if isinstance(result, dict) and "error" in result:
+            error_msg = result["error"]
+            if "loading" in error_msg.lower():
+                return {"response": "The AI model is loading. Please wait 20 seconds and try again."}
+            self.upstream_errors += 1
+            raise HTTPException(500, f"HuggingFace error: {error_msg}")
+
+        reply = result["choices"][0]["message"]["content"]
+        self._remember(key, reply)
+        return {"response": reply}
+
+    # Yields the reply piece by piece as the model generates it (the upstream is asked for an SSE stream).
+    # Closing the generator early (the browser went away) closes the upstream connection, so the
+    # model stops generating tokens nobody will read
+    async def stream(self, payload: dict, key: str):
+        self.requests += 1
+
+        reply = self._cached(key)
+        if reply is not None:
+            self.cache_hits += 1
+            yield reply
+            return
+
+        pieces = []
+        async with self.slots:
+            self.upstream_calls += 1
+            self.streams += 1
+            started = time.perf_counter()
+            try:
+                async with self.client.stream("POST", self.url, json={**payload, "stream": True}) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        yield self._status_reply(response)
+                        return
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+
+                        chunk = json.loads(data)
+                        if "error" in chunk:
+                            self.upstream_errors += 1
+                            raise HTTPException(500, f"HuggingFace error: {chunk['error']}")
+
+                        choices = chunk.get("choices") or [{}]
+                        piece = (choices[0].get("delta") or {}).get("content")
+                        if piece:
+                            if not pieces:
+                                metrics.observe_stage("llm_first_token", time.perf_counter() - started)
+                            pieces.append(piece)
+                            yield piece
+                metrics.observe_stage("llm_stream", time.perf_counter() - started)
+            except httpx.HTTPError as e:
+                metrics.observe_stage("llm_stream", time.perf_counter() - started, failed=True)
+                raise self._failed(e)
+            except (GeneratorExit, asyncio.CancelledError):
+                self.streams_cancelled += 1
+                raise
+
+        if pieces:
+            self._remember(key, "".join(pieces))
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "cacheHits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "upstreamCalls": self.upstream_calls,
+            "upstreamErrors": self.upstream_errors,
+            "inFlight": len(self.in_flight),
+            "streams": self.streams,
+            "streamsCancelled": self.streams_cancelled,
+            "cachedReplies": len(self.cache),
+            "maxConcurrency": self.max_concurrency,
+        }
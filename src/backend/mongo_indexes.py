@@ -0,0 +1,148 @@
+# Index bootstrap and query-plan checks for the expense_db collections
+#
+# ensure_indexes() runs at startup and creates every index the endpoints rely
+# on (create_index is a no-op when the index already exists). verify_query_plans()
+# runs explain() on the query shape of each endpoint and reports any that would
+# scan a whole collection. It runs at startup when MONGO_VERIFY_INDEXES=1 is set,
+# or from the command line:
+#   python mongo_indexes.py --verify
+import asyncio
+import logging
+import os
+import sys
+
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+
+log = logging.getLogger(__name__)
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "users": [
+        ([("email", 1)], {"unique": True}),
+    ],
+    "dashboards": [
+        # /history (+ month filter), keyset pages and the latest dashboard in /finance-chat
+        ([("userId", 1), ("statement_month", 1), ("_id", 1)], {}),
+    ],
+    "progress_reports": [
+        ([("userId", 1), ("statement_month", 1), ("_id", 1)], {}),
+    ],
+    "budgets": [
+        # /save-budget upserts one budget per user and month
+        ([("userId", 1), ("month", 1)], {"unique": True}),
+        # /budget-history pages and the most recent budget
+        ([("userId", 1), ("month", -1), ("_id", -1)], {}),
+    ],
+    "monthly_aggregates": [
+        ([("userId", 1), ("month", -1)], {"unique": True}),
+    ],
+    "category_rules": [
+        ([("userId", 1), ("priority", 1)], {}),
+    ],
+    "parsed_statements": [
+        ([("version", 1)], {}),
+    ],
+    "import_jobs": [
+        # jobs whose worker stopped heartbeating are failed (status narrows it to the unfinished ones)
+        ([("status", 1)], {}),
+    ],
+}
+
+SAMPLE_USER = "000000000000000000000000"
+
+# (name, collection, filter, sort) for the query each endpoint sends
+QUERY_SHAPES = [
+    ("register/login: user by email", "users", {"email": "someone@example.com"}, None),
+    ("/history", "dashboards", {"userId": SAMPLE_USER}, [("statement_month", 1), ("_id", 1)]),
+    ("/history?month&year", "dashboards", {"userId": SAMPLE_USER, "statement_month": "2025-11"},
+     [("statement_month", 1), ("_id", 1)]),
+    ("/finance-chat: latest dashboard", "dashboards", {"userId": SAMPLE_USER}, [("statement_month", -1)]),
+    ("/progress-history", "progress_reports", {"userId": SAMPLE_USER}, [("statement_month", 1), ("_id", 1)]),
+    ("/finance-chat: latest progress", "progress_reports", {"userId": SAMPLE_USER}, [("statement_month", -1)]),
+    ("/get-budget?month, /upload-progress", "budgets", {"userId": SAMPLE_USER, "month": "2025-11"}, None),
+    ("/get-budget, /finance-chat: latest budget", "budgets", {"userId": SAMPLE_USER}, [("month", -1)]),
+    ("/has-budget", "budgets", {"userId": SAMPLE_USER}, None),
+    ("/budget-history", "budgets", {"userId": SAMPLE_USER}, [("month", -1), ("_id", -1)]),
+    ("/history-summary", "monthly_aggregates", {"userId": SAMPLE_USER}, [("month", -1)]),
+    ("/compare", "dashboards", {"userId": SAMPLE_USER, "_id": {"$in": [ObjectId(SAMPLE_USER)]}}, None),
+    ("/compare/trend", "monthly_aggregates", {"userId": SAMPLE_USER, "dashboardCount": {"$gte": 1}}, [("month", 1)]),
+    ("/import: months already stored", "dashboards",
+     {"userId": SAMPLE_USER, "statement_month": {"$in": ["2025-10", "2025-11"]}}, None),
+    ("import heartbeat: stale imports", "import_jobs",
+     {"status": {"$in": ["queued", "running"]}, "workerId": {"$ne": "0"},
+      "$or": [{"heartbeatAt": {"$lt": "2025-11-01T00:00:00"}}, {"heartbeatAt": {"$exists": False}}]}, None),
+    ("/rules", "category_rules", {"userId": {"$in": [None, SAMPLE_USER]}}, [("userId", 1), ("priority", 1)]),
+]
+
+
+# Creates every index in INDEXES; returns the problems it could not fix
+async def ensure_indexes(db):
+    problems = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate emails already stored block the unique index
+                problems.append(f"{collection} {keys}: {e}")
+    for problem in problems:
+        log.warning("Could not create index %s", problem)
+    return problems
+
+
+# Every stage name in an explain() plan tree
+def plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+# Runs explain() on every query shape; returns {name: stages} for the ones doing a COLLSCAN
+async def verify_query_plans(db):
+    failures = {}
+    for name, collection, filter_query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(filter_query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = plan_stages((await cursor.explain())["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            failures[name] = stages
+    return failures
+
+
+async def run(verify):
+    from dotenv import load_dotenv
+    from pymongo import AsyncMongoClient
+
+    load_dotenv()
+    client = AsyncMongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=2000)
+    db = client["expense_db"]
+
+    try:
+        problems = await ensure_indexes(db)
+        if verify:
+            failures = await verify_query_plans(db)
+            for name, stages in failures.items():
+                print(f"COLLSCAN: {name} -> {' > '.join(stages)}")
+            if failures or problems:
+                return 1
+            print(f"All {len(QUERY_SHAPES)} query shapes use an index")
+        return 0
+    finally:
+        await client.close()
+
+
+def main():
+    sys.exit(asyncio.run(run("--verify" in sys.argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Per-user, per-month totals kept next to the dashboards
+#
+# History and dashboard list pages only need the totals of each month, not
+# every stored transaction. One small document per user and month is updated
+# whenever a dashboard or progress report is written, so those pages can read
+# a few hundred bytes instead of whole dashboards.
+#
+# When a month is uploaded more than once, the newest upload's figures are
+# kept (the same statement uploaded twice must not double the totals) and the
+# counters record how many uploads the month has.
+#
+# Users whose data was uploaded before aggregates existed get theirs rebuilt
+# from the dashboards on their first history read. A marker in the
+# aggregate_users collection records that this was done, so older months are
+# backfilled even if the user uploads a new statement before that first read.
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+
+class MonthlyAggregates:
+    def __init__(self, collection, dashboards, progress_reports, built_users):
+        self.collection = collection
+        self.dashboards = dashboards
+        self.progress_reports = progress_reports
+        self.built_users = built_users  # {_id: userId} once the user's aggregates cover all their data
+        self.known_built = set()  # users this worker already found a marker for
+
+    # (filter, update) of the month a dashboard belongs to
+    def dashboard_update(self, record):
+        return (
+            {"userId": record["userId"], "month": record["statement_month"]},
+            {
+                "$set": {
+                    "total_income": record["total_income"],
+                    "total_outcome": record["total_outcome"],
+                    "net_balance": record["net_balance"],
+                    "categories": record["categories"],
+                    "latestDashboardId": str(record["_id"]),
+                    "updatedAt": datetime.utcnow().isoformat(),
+                },
+                "$inc": {"dashboardCount": 1},
+            },
+        )
+
+    # Called after a dashboard has been inserted
+    async def record_dashboard(self, record):
+        filter_query, update = self.dashboard_update(record)
+        await self.collection.update_one(filter_query, update, upsert=True)
+
+    # Called after a batch of dashboards has been inserted: one unordered bulk write.
+    # Uploads of the same month are merged first, so the last one in the batch still wins
+    async def record_dashboards(self, records):
+        updates = {}
+        for record in records:
+            filter_query, update = self.dashboard_update(record)
+            key = (filter_query["userId"], filter_query["month"])
+            if key in updates:
+                update["$inc"]["dashboardCount"] += updates[key][1]["$inc"]["dashboardCount"]
+            updates[key] = (filter_query, update)
+
+        if updates:
+            await self.collection.bulk_write(
+                [UpdateOne(filter_query, update, upsert=True) for filter_query, update in updates.values()],
+                ordered=False,
+            )
+
+    # Called after a progress report has been inserted
+    async def record_progress(self, record):
+        await self.collection.update_one(
+            {"userId": record["userId"], "month": record["statement_month"]},
+            {
+                "$set": {
+                    "budgetTotal": record["budgetTotal"],
+                    "overallOverUnder": record["overallOverUnder"],
+                    "latestProgressId": str(record["_id"]),
+                    "updatedAt": datetime.utcnow().isoformat(),
+                },
+                "$inc": {"progressCount": 1},
+            },
+            upsert=True,
+        )
+
+    # Rebuilds a user's aggregates from their stored dashboards and progress reports
+    # (used once for users whose data was uploaded before aggregates existed)
+    async def rebuild(self, user_id):
+        await self.collection.delete_many({"userId": user_id})
+
+        dashboard_fields = {
+            "userId": 1, "statement_month": 1, "total_income": 1, "total_outcome": 1,
+            "net_balance": 1, "categories": 1,
+        }
+        records = await self.dashboards.find({"userId": user_id}, dashboard_fields).sort("timestamp", 1).to_list()
+        await self.record_dashboards(records)
+
+        progress_fields = {"userId": 1, "statement_month": 1, "budgetTotal": 1, "overallOverUnder": 1}
+        async for record in self.progress_reports.find({"userId": user_id}, progress_fields).sort("timestamp", 1):
+            await self.record_progress(record)
+
+    # First request of a user: builds their aggregates from the stored data once, then marks them as built
+    # (whether aggregates already exist says nothing, an upload after the change creates some for its month).
+    # Returns True if they were (re)built
+    async def ensure_built(self, user_id):
+        if user_id in self.known_built:
+            return False
+        if await self.built_users.find_one({"_id": user_id}):
+            self.known_built.add(user_id)
+            return False
+
+        rebuilt = False
+        if await self.dashboards.count_documents({"userId": user_id}, limit=1) or \
+                await self.progress_reports.count_documents({"userId": user_id}, limit=1):
+            await self.rebuild(user_id)
+            rebuilt = True
+        await self.built_users.update_one(
+            {"_id": user_id}, {"$set": {"builtAt": datetime.utcnow().isoformat()}}, upsert=True
+        )
+        self.known_built.add(user_id)
+        return rebuilt
+
+    # Monthly totals of a user, newest month first
+    async def summary(self, user_id, month_prefix=None):
+        filter_query = {"userId": user_id}
+        if month_prefix:
+            filter_query["month"] = {"$regex": f"^{month_prefix}"}
+
+        await self.ensure_built(user_id)
+        return await self.collection.find(filter_query, {"_id": 0}).sort("month", -1).to_list()
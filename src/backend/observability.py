@@ -0,0 +1,255 @@
+# Request and pipeline-stage metrics (Prometheus text format at /metrics) and logging setup
+#
+# MetricsMiddleware times every request and counts it by method, route and
+# status. The route is the path template ("/history/{id}"), so ids do not make
+# a new series each. Inside a request, metrics.span("stage") times one stage of
+# the pipeline. The stages are:
+#   pdf_open, text_extraction, transaction_extraction  (measured in the PDF workers, see pdf_engine.py)
+#   categorisation, mongo_read and mongo_write (database.py),
+#   llm_call, llm_stream and llm_first_token (llm_gateway.py)
+# The counters the /x/stats endpoints already return are exported as well,
+# through register_stats(). Metrics are kept per API worker process, which is
+# what Prometheus expects when it scrapes each worker.
+#
+# Logging goes through the logging module instead of print(). LOG_LEVEL picks
+# the level. Messages logged for every request (request_log) are sampled with
+# LOG_SAMPLE_RATE so a busy server does not spend its time writing them.
+# Warnings, errors and slow requests are always logged.
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.1))  # share of per-request messages that are logged
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))  # slower requests are logged as warnings
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = "smartpocket"
+
+
+class SampledFilter(logging.Filter):
+    # Lets through every warning and error, and only a share of the other messages
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+# Messages logged for every request, sampled with LOG_SAMPLE_RATE
+request_log = logging.getLogger("smartpocket.requests")
+request_log.addFilter(SampledFilter(LOG_SAMPLE_RATE))
+
+
+# Sends the app's log messages to stderr (uvicorn keeps its own loggers)
+def configure_logging(level=LOG_LEVEL):
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+    root.setLevel(level)
+    # httpx logs every call to the chat model at INFO
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, root.level))
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def label_text(labels):
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+# Sample values as Prometheus reads them (booleans as 1/0, NaN and +Inf/-Inf spelt its way)
+def format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+# "cacheHits" -> "cache_hits"
+def snake_case(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name)).lower()
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}  # label values -> count
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            values = sorted(self.values.items())
+        for label_values, value in values:
+            yield f"{self.name}{label_text(zip(self.label_names, label_values))} {format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # label values -> [count per bucket (not cumulative), sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        # First bucket the value fits in; values above the last bound only count towards +Inf
+        position = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                position = i
+                break
+
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items())
+        for label_values, (counts, total, count) in series:
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{label_text(labels + [('le', format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{label_text(labels)} {format_value(total)}"
+            yield f"{self.name}_count{label_text(labels)} {count}"
+
+
+# Times the block it wraps as one run of a pipeline stage; an exception also counts as a stage error
+class Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.start, failed=exc_type is not None)
+        return False
+
+
+class Metrics:
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self.requests = Counter(f"{prefix}_http_requests_total", "HTTP requests by route and status",
+                                ("method", "route", "status"))
+        self.request_seconds = Histogram(f"{prefix}_http_request_duration_seconds",
+                                         "Time from receiving a request to the end of its response",
+                                         ("method", "route"))
+        self.stage_seconds = Histogram(f"{prefix}_stage_duration_seconds",
+                                       "Time spent in each stage of the upload and chat pipelines", ("stage",))
+        self.stage_errors = Counter(f"{prefix}_stage_errors_total", "Pipeline stages that raised an error",
+                                    ("stage",))
+        self.stats_sources = {}  # name -> function returning a dict of numbers
+
+    def span(self, stage):
+        return Span(self, stage)
+
+    def observe_stage(self, stage, seconds, failed=False):
+        self.stage_seconds.observe(seconds, stage)
+        if failed:
+            self.stage_errors.inc(stage)
+
+    def observe_request(self, method, route, status, seconds):
+        self.requests.inc(method, route, str(status))
+        self.request_seconds.observe(seconds, method, route)
+
+    # Exports the numbers in stats() (e.g. parse_cache.stats) as smartpocket_<name>_<key>
+    def register_stats(self, name, stats):
+        self.stats_sources[name] = stats
+
+    def render_stats(self):
+        for source, stats in self.stats_sources.items():
+            try:
+                values = stats()
+            except Exception:
+                logging.getLogger(__name__).exception("Could not read %s stats", source)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):  # bools too, exported as 1/0
+                    name = f"{self.prefix}_{snake_case(source)}_{snake_case(key)}"
+                    yield f"# TYPE {name} gauge"
+                    yield f"{name} {format_value(value)}"
+
+    # The Prometheus text exposition of every metric
+    def render(self):
+        lines = []
+        for metric in [self.requests, self.request_seconds, self.stage_seconds, self.stage_errors]:
+            lines.extend(metric.render())
+        lines.extend(self.render_stats())
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry used by the endpoints and the engines
+metrics = Metrics()
+
+
+# Pure ASGI middleware (no extra task per request, and streamed responses are timed to their last byte)
+class MetricsMiddleware:
+    def __init__(self, app, metrics=metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500  # what the client gets if the app fails before starting a response
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            seconds = time.perf_counter() - start
+            # The router stores the matched route in the scope; unknown paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.metrics.observe_request(scope["method"], route, status, seconds)
+
+            if seconds * 1000 >= LOG_SLOW_REQUEST_MS:
+                request_log.warning("Slow request: %s %s %s %.0f ms", scope["method"], route, status, seconds * 1000)
+            else:
+                request_log.info("%s %s %s %.1f ms", scope["method"], route, status, seconds * 1000)
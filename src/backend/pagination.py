@@ -0,0 +1,73 @@
+# Field projection and keyset (cursor) pagination for the history list endpoints
+#
+# A page is read with a range condition on the sort keys of the last document
+# of the previous page instead of skip(), so every page costs the same no
+# matter how far into a user's history it is. The cursor handed to the client
+# is those sort key values, base64-encoded.
+import base64
+import json
+
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 500
+
+
+# Builds a Mongo projection from "fields=a,b,c" or from the endpoint's summary fields
+def list_projection(fields, summary, summary_fields, sort):
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+    elif summary:
+        names = list(summary_fields)
+    else:
+        return None
+
+    # The sort keys are always needed to build the next cursor
+    projection = {name: 1 for name in names}
+    for name, _ in sort:
+        projection[name] = 1
+    return projection
+
+
+def encode_cursor(doc, sort):
+    values = [str(doc[name]) if name == "_id" else doc.get(name) for name, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(sort):
+            raise ValueError
+        return [ObjectId(v) if name == "_id" else v for (name, _), v in zip(sort, values)]
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+# Documents that come after the cursor in the given sort order
+def after_cursor(values, sort):
+    conditions = []
+    for i, (name, direction) in enumerate(sort):
+        condition = {sort[j][0]: values[j] for j in range(i)}
+        condition[name] = {"$gt" if direction == 1 else "$lt": values[i]}
+        conditions.append(condition)
+    return {"$or": conditions}
+
+
+# Returns one page of documents (all of them when no limit is given) and the cursor of the next page
+async def find_page(collection, filter_query, sort, projection=None, limit=None, cursor=None):
+    if cursor:
+        filter_query = {"$and": [filter_query, after_cursor(decode_cursor(cursor, sort), sort)]}
+
+    query = collection.find(filter_query, projection).sort(sort)
+    if limit:
+        query = query.limit(limit)
+    records = await query.to_list()
+
+    next_cursor = None
+    if limit and len(records) == limit:
+        next_cursor = encode_cursor(records[-1], sort)
+
+    for r in records:
+        r["_id"] = str(r["_id"])
+    return records, next_cursor
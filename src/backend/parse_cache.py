@@ -0,0 +1,78 @@
+# Content-addressed cache of parsed statements
+#
+# The same statement is often uploaded to /upload and then to /upload-progress.
+# Entries are keyed by the SHA-256 of the uploaded bytes plus a version stamp
+# of the parsing rules, so a repeat upload skips pdfplumber completely and any
+# change to the rules makes the old entries unreachable.
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", 256))  # statements kept in memory
+
+
+class ParseCache:
+    def __init__(self, collection, get_version, max_entries=PARSE_CACHE_SIZE):
+        self.collection = collection  # persistent tier (Mongo collection)
+        self.get_version = get_version  # returns the current rules version
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # in-memory LRU tier
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def key(self, data: bytes):
+        return f"{self.get_version()}:{hashlib.sha256(data).hexdigest()}"
+
+    def _remember(self, key, transactions):
+        self.entries[key] = transactions
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # Returns a fresh copy of the cached transactions, or None on a miss
+    async def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return [dict(tx) for tx in self.entries[key]]
+
+        doc = await self.collection.find_one({"_id": key}, {"transactions": 1})
+        if doc is not None:
+            self.persistent_hits += 1
+            self._remember(key, doc["transactions"])
+            return [dict(tx) for tx in doc["transactions"]]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key, transactions):
+        # Stores a copy because the endpoints add categories to the dicts they get back
+        transactions = [dict(tx) for tx in transactions]
+        self._remember(key, transactions)
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "version": self.get_version(),
+                "transactions": transactions,
+                "createdAt": datetime.utcnow().isoformat(),
+            }},
+            upsert=True,
+        )
+
+    # Drops persisted entries written under older rules
+    async def purge_stale(self):
+        await self.collection.delete_many({"version": {"$ne": self.get_version()}})
+
+    def stats(self):
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        hits = self.memory_hits + self.persistent_hits
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "memoryHits": self.memory_hits,
+            "persistentHits": self.persistent_hits,
+            "misses": self.misses,
+            "hitRate": hits / lookups if lookups else 0.0,
+        }
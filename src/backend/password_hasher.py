@@ -0,0 +1,144 @@
+# Password hashing for /register and /login
+#
+# bcrypt is deliberately slow and CPU bound. Running it with run_in_threadpool
+# shares the threadpool every other sync endpoint uses, so a burst of logins
+# could hold up unrelated requests. Hashes are computed on a small executor
+# of their own instead (bcrypt releases the GIL, so its threads run in
+# parallel), with a cap on how many may wait for it.
+#
+# The cost factor comes from BCRYPT_ROUNDS. When it changes, a user's stored
+# hash is replaced with one at the new cost the next time they log in
+# (passlib's verify_and_update), so nobody has to reset their password.
+#
+# LoginLimiter counts login attempts per email and per client IP in a bounded
+# in-memory LRU and refuses further attempts for the rest of the window.
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))  # cost factor: each step doubles the work
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", 64))  # hashes allowed to wait for a worker
+
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", 10))  # per email in one window
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", 50))  # per client IP in one window
+LOGIN_ATTEMPT_WINDOW = float(os.getenv("LOGIN_ATTEMPT_WINDOW", 300))  # seconds
+LOGIN_LIMITER_SIZE = int(os.getenv("LOGIN_LIMITER_SIZE", 100000))  # emails + IPs tracked at once
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_HASH_WORKERS, queue_depth=PASSWORD_HASH_QUEUE_DEPTH):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.executor = None
+        self.in_flight = 0  # hashes currently running or waiting
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def _run(self, fn, *args):
+        # Backpressure: reject straight away instead of queueing without limit
+        if self.in_flight >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins at once, please try again shortly",
+                headers={"Retry-After": "2"},
+            )
+
+        self.start()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str):
+        self.hashes += 1
+        return await self._run(self.context.hash, password)
+
+    # Returns (valid, new hash or None). A new hash is returned when the stored one
+    # was made with another cost factor and should replace it
+    async def verify(self, password: str, hashed: str):
+        self.verifies += 1
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "inFlight": self.in_flight,
+            "hashes": self.hashes,
+            "verifies": self.verifies,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+        }
+
+
+class LoginLimiter:
+    def __init__(self, max_attempts=LOGIN_MAX_ATTEMPTS, max_attempts_per_ip=LOGIN_MAX_ATTEMPTS_PER_IP,
+                 window=LOGIN_ATTEMPT_WINDOW, max_entries=LOGIN_LIMITER_SIZE):
+        self.limits = {"email": max_attempts, "ip": max_attempts_per_ip}
+        self.window = window
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (kind, value) -> [window start, attempts]
+        self.blocked = 0
+
+    def _entry(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            entry = self.entries[key] = [now, 0]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    # Counts an attempt for the email and the IP, or raises 429 if either has used up its window
+    def attempt(self, email, ip):
+        now = time.monotonic()
+        keys = [key for key in [("email", (email or "").lower()), ("ip", ip)] if key[1]]
+        entries = [self._entry(key, now) for key in keys]
+
+        for (kind, _), entry in zip(keys, entries):
+            if entry[1] >= self.limits[kind]:
+                self.blocked += 1
+                retry_after = max(1, int(entry[0] + self.window - now))
+                raise HTTPException(429, "Too many login attempts, please try again later",
+                                    headers={"Retry-After": str(retry_after)})
+
+        for entry in entries:
+            entry[1] += 1
+
+    # A successful login clears the email's attempts (the IP keeps counting)
+    def succeeded(self, email):
+        self.entries.pop(("email", (email or "").lower()), None)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "blocked": self.blocked,
+            "window": self.window,
+            "maxAttempts": self.limits["email"],
+            "maxAttemptsPerIp": self.limits["ip"],
+        }
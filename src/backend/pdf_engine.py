@@ -0,0 +1,190 @@
+# PDF parsing engine used by the upload endpoints in backend.py
+#
+# pdfplumber is pure Python and CPU bound, so parsing a statement inside an
+# async endpoint blocks every other request on the worker. This module runs
+# the parsing in a bounded process pool instead and lets the endpoints await
+# the result. Workers stream pages straight into statement_parser and only
+# send the transactions back, never the full statement text.
+# Workers also time their stages (opening the PDF, pdfplumber's text extraction
+# and the transaction parser) and the engine records them once per statement
+# in the /metrics stage histograms.
+# The pool is a multiprocessing.Pool rather than a ProcessPoolExecutor because
+# a statement that times out keeps its worker busy, and only Pool.terminate()
+# can stop it without reaching into the executor's internals.
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from itertools import chain
+
+import pdfplumber
+from fastapi import HTTPException
+
+from observability import metrics
+from statement_parser import iter_lines, iter_transactions
+
+# Engine settings (can be overridden in the .env file)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 2))
+PDF_QUEUE_DEPTH = int(os.getenv("PDF_QUEUE_DEPTH", 8))  # statements allowed to wait for a worker
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", 30))  # seconds per statement
+PDF_PAGES_PER_CHUNK = int(os.getenv("PDF_PAGES_PER_CHUNK", 8))  # pages handed to one worker at a time
+
+
+class PdfParseError(Exception):
+    # Raised when pdfplumber cannot read the uploaded file
+    pass
+
+
+class WorkersRestarted(Exception):
+    # Raised for the statements still running when the pool was restarted by recycle()
+    pass
+
+
+# Yields the text of pages [start, end) one at a time
+# Each page's cached layout objects are dropped as soon as its text has been read,
+# so memory use does not grow with the number of pages
+# The time spent extracting is added to timings["text_extraction"] when timings is given
+def iter_page_texts(pdf, start, end, timings=None):
+    for page in pdf.pages[start:end]:
+        started = time.perf_counter()
+        text = page.extract_text() or ""
+        page.close()
+        if timings is not None:
+            timings["text_extraction"] += time.perf_counter() - started
+        yield text
+
+
+# Runs inside a worker process: streams the transactions on pages [start, end)
+# Also returns the total page count so the caller knows whether more chunks are needed,
+# and the seconds spent in each stage
+def parse_page_range(data: bytes, start: int, end: int):
+    timings = {"pdf_open": 0.0, "text_extraction": 0.0, "transaction_extraction": 0.0}
+    try:
+        started = time.perf_counter()
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            total = len(pdf.pages)
+            end = min(end, total)
+            timings["pdf_open"] = time.perf_counter() - started
+
+            # The page before the chunk is read again so rows crossing into
+            # this chunk are matched; its own rows belong to the previous chunk
+            lead_in = []
+            if start > 0:
+                lead_in = next(iter_page_texts(pdf, start - 1, start, timings)).split("\n")
+
+            # Pages are extracted while the parser reads them, so the parser's share is what remains
+            started = time.perf_counter()
+            extracted = timings["text_extraction"]
+            lines = chain(lead_in, iter_lines(iter_page_texts(pdf, start, end, timings)))
+            transactions = list(iter_transactions(lines, skip_lines=len(lead_in), final=end >= total))
+            timings["transaction_extraction"] = (
+                time.perf_counter() - started - (timings["text_extraction"] - extracted)
+            )
+            return transactions, total, timings
+    except Exception as e:
+        raise PdfParseError(str(e)) from None
+
+
+class PdfEngine:
+    def __init__(self, workers=PDF_WORKERS, queue_depth=PDF_QUEUE_DEPTH,
+                 timeout=PDF_JOB_TIMEOUT, pages_per_chunk=PDF_PAGES_PER_CHUNK):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.pages_per_chunk = pages_per_chunk
+        self.pool = None
+        self.pending = set()  # futures of the chunks sent to the current pool
+        self.in_flight = 0  # statements currently running or waiting
+
+    def start(self):
+        if self.pool is None:
+            # spawn keeps the workers free of the parent's Mongo client threads
+            self.pool = multiprocessing.get_context("spawn").Pool(processes=self.workers)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    # A job that timed out keeps running in its worker (cancelling only stops the wait),
+    # so the workers are killed and a new pool is started. Statements still running
+    # in the old pool fail with WorkersRestarted and are answered with 503.
+    def recycle(self):
+        self.shutdown()
+        pending, self.pending = self.pending, set()
+        for future in pending:
+            if not future.done():
+                future.set_exception(WorkersRestarted())
+        self.start()
+
+    async def _run(self, data: bytes, start: int, end: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # The pool calls back from its result thread
+        def settle(set_outcome, outcome):
+            if not future.done():
+                set_outcome(outcome)
+
+        self.pool.apply_async(
+            parse_page_range, (data, start, end),
+            callback=lambda result: loop.call_soon_threadsafe(settle, future.set_result, result),
+            error_callback=lambda error: loop.call_soon_threadsafe(settle, future.set_exception, error),
+        )
+        pending = self.pending
+        pending.add(future)
+        try:
+            return await future
+        finally:
+            pending.discard(future)
+
+    async def _parse(self, data: bytes):
+        # First chunk also tells us how many pages the statement has
+        transactions, total, timings = await self._run(data, 0, self.pages_per_chunk)
+
+        # Large statements: the remaining pages are parsed in parallel chunks
+        if total > self.pages_per_chunk:
+            ranges = range(self.pages_per_chunk, total, self.pages_per_chunk)
+            chunks = await asyncio.gather(
+                *(self._run(data, start, start + self.pages_per_chunk) for start in ranges)
+            )
+            for chunk_transactions, _, chunk_timings in chunks:
+                transactions.extend(chunk_transactions)
+                for stage, seconds in chunk_timings.items():
+                    timings[stage] += seconds
+
+        # Worker time summed over the chunks of the statement
+        for stage, seconds in timings.items():
+            metrics.observe_stage(stage, seconds)
+        return transactions
+
+    # Returns the transactions found in the PDF, in statement order
+    async def parse_statement(self, data: bytes):
+        # Backpressure: reject straight away instead of queueing without limit
+        if self.in_flight >= self.workers + self.queue_depth:
+            raise HTTPException(
+                status_code=503,
+                detail="Statement parser is busy, please try again shortly",
+                headers={"Retry-After": "5"},
+            )
+
+        self.start()
+        self.in_flight += 1
+        try:
+            return await asyncio.wait_for(self._parse(data), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.recycle()
+            raise HTTPException(504, "Timed out while reading the PDF")
+        except WorkersRestarted:
+            raise HTTPException(
+                status_code=503,
+                detail="Statement parser was restarted, please try again",
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            self.in_flight -= 1
+
+
+# Shared engine used by the endpoints
+pdf_engine = PdfEngine()
@@ -0,0 +1,160 @@
+# HTTP caching of the dashboard, progress report and list reads
+#
+# A dashboard or progress report is never changed once it is stored, so
+# /history/{id} and /progress-history/{id} answer with a strong ETag made from
+# the id and Cache-Control: immutable. The browser keeps the response, and a
+# conditional request (If-None-Match) gets a 304 without any database call.
+# The encoded JSON of the documents read last is kept in a bounded in-process
+# LRU, so opening the same dashboard again from another tab or device skips
+# both Mongo and the JSON encoding.
+#
+# The list endpoints (/history, /progress-history, /budget-history, ...)
+# change whenever the user uploads or saves something. Every user has a
+# version token in the response_versions collection, replaced by each write
+# endpoint, so all API workers see the change. The ETag of a list response is
+# made from that token and the query string, and the encoded page is cached
+# under the same ETag. Each worker keeps the tokens it has read in memory: its
+# own writes replace them at once, and a token is read again from Mongo (one
+# lookup by _id) once it is RESPONSE_VERSION_TTL seconds old, which bounds how
+# long another worker's write can go unnoticed. Users who have never written
+# since caching was added have no document and use the token "0".
+import hashlib
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2000))  # responses kept in memory
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", 64))  # and at most this much JSON
+RESPONSE_VERSION_TTL = float(os.getenv("RESPONSE_VERSION_TTL", 2))  # seconds a user's version token is reused
+
+# Part of every ETag: bump it when the JSON of the cached endpoints changes, so browsers fetch it again
+RESPONSE_REVISION = 1
+
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"  # the browser keeps the response but asks (If-None-Match) before using it
+
+
+# Same bytes FastAPI would send for the value returned by an endpoint
+def json_bytes(content):
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+# If-None-Match can list several ETags (or be "*"); it is compared weakly, so W/ is ignored
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, versions, max_entries=RESPONSE_CACHE_SIZE, max_bytes=int(RESPONSE_CACHE_MB * 1024 * 1024),
+                 version_ttl=RESPONSE_VERSION_TTL):
+        self.versions = versions  # response_versions collection: {_id: userId, token}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_ttl = version_ttl
+        self.entries = OrderedDict()  # ETag -> (JSON bytes, extra headers)
+        self.tokens = OrderedDict()  # userId -> (read at, token)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.version_reads = 0
+
+    def _get(self, etag):
+        entry = self.entries.get(etag)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(etag)
+        self.hits += 1
+        return entry
+
+    def _put(self, etag, body, headers):
+        if len(body) > self.max_bytes:
+            return
+        old = self.entries.pop(etag, None)
+        if old is not None:
+            self.size -= len(old[0])
+        self.entries[etag] = (body, headers)
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def _respond(self, request, etag, cache_control, load):
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        entry = self._get(etag)
+        if entry is None:
+            # load() raises the endpoint's HTTPException (e.g. 404), which is not cached
+            content, extra = await load()
+            entry = (json_bytes(content), extra)
+            self._put(etag, *entry)
+        body, extra = entry
+        return Response(body, media_type="application/json", headers={**extra, **headers})
+
+    # A stored document (kind = "dashboard" or "progress"); load() returns its content
+    async def document(self, request, kind, id, load):
+        etag = f'"{kind}-{id}-{RESPONSE_REVISION}"'
+
+        async def load_document():
+            return await load(), {}
+        return await self._respond(request, etag, IMMUTABLE, load_document)
+
+    # A per-user read that changes with the user's writes; load() returns (content, extra headers)
+    async def listing(self, request, user_id, load):
+        token = await self.user_version(user_id)
+        url = f"{request.url.path}?{request.url.query}"
+        etag = f'"{token}-{hashlib.sha1(url.encode()).hexdigest()[:12]}-{RESPONSE_REVISION}"'
+        return await self._respond(request, etag, REVALIDATE, load)
+
+    def _remember_token(self, user_id, token):
+        self.tokens[user_id] = (time.monotonic(), token)
+        self.tokens.move_to_end(user_id)
+        while len(self.tokens) > self.max_entries:
+            self.tokens.popitem(last=False)
+
+    async def user_version(self, user_id):
+        entry = self.tokens.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self.version_ttl:
+            return entry[1]
+
+        self.version_reads += 1
+        doc = await self.versions.find_one({"_id": user_id})
+        token = doc["token"] if doc else "0"
+        self._remember_token(user_id, token)
+        return token
+
+    # Called by the write endpoints after their write: every cached list response of the user becomes stale
+    async def bump(self, user_id):
+        token = secrets.token_hex(8)
+        await self.versions.update_one({"_id": user_id}, {"$set": {"token": token}}, upsert=True)
+        self._remember_token(user_id, token)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "bytes": self.size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "versionReads": self.version_reads,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,189 @@
+# Turns the text of a bank statement into transactions
+#
+# This module has no database or app setup so it can also be imported by the
+# PDF worker processes in pdf_engine.py. The parsing is a chain of generators:
+# page texts -> lines -> rows -> transactions, so a statement never has to be
+# held in memory as one big string. Rows are found exactly where a regex scan
+# over the joined lines finds them (anywhere on a line, several per line), but
+# the regex runs on one line at a time while that line still holds two amounts,
+# and the lines are only joined when a row may continue on the next ones. The
+# kind of row (pocket, top-up, transfer...) is found with one scan of its
+# description.
+import re
+from datetime import datetime
+from collections import deque
+from itertools import islice
+
+# Regex pattern to extract transactions from bank PDF text for example 12/11 Tesco -45.00
+transaction_pattern = re.compile(
+    r"(\d{1,2}\s+(?:\w{3}|\w+)\s+\d{4})\s+(.+?)\s+€?(\d+\.\d{2}|0\.00)\s+€?(\d+\.\d{2}|0\.00)"
+)
+
+
+# GROUP 1 → date
+# GROUP 2 → description
+# GROUP 3 → amount (positive = income, negative = expense)
+
+# Bump whenever transaction_from_row changes how rows are read, so cached
+# parses made with the old rules are not reused (see parse_cache.py)
+PARSER_REVISION = 3
+
+# A single row can be spread over several lines (date, description and the two
+# amounts), so this many lines after the one being read are kept as context
+CARRY_LINES = 4
+
+# Cheap checks run before the full pattern wherever a date can start: the date and
+# the whitespace after it, and the two amounts that end a row
+date_pattern = re.compile(r"\d{1,2}\s+(?:\w{3}|\w+)\s+\d{4}\s+")
+amounts_pattern = re.compile(r"\s+€?(?:\d+\.\d{2}|0\.00)\s+€?(?:\d+\.\d{2}|0\.00)")
+date_start_pattern = re.compile(r"\d(?=\d?\s)")  # where a date can start: one or two digits, then a space
+
+# The kinds of description that change how the amounts are read, found in one scan of the
+# lowercased description (the lookahead also finds keywords that overlap each other)
+TYPE_PATTERN = re.compile(
+    r"(?=(?P<pocket>pocket)|(?P<top_up>apple pay top[- ]up)|(?P<transfer_in>transfer from)|(?P<transfer_out>transfer to))"
+)
+
+
+# Builds a transaction from the parts of a row (None for rows that are skipped)
+def transaction_from_row(date, desc, money_out, money_in):
+    kinds = {match.lastgroup for match in TYPE_PATTERN.finditer(desc.lower())}
+
+    if "pocket" in kinds:
+        return None
+
+    money_out = float(money_out)
+
+    # Transfers via apple pay are now classed as income
+    # (money_out contains the real top-up amount)
+    if "top_up" in kinds:
+        amount = money_out
+
+    # Transfers from people should be classed as income
+    # (Revolut will print the actual transfer amount in money_out)
+    elif "transfer_in" in kinds:
+        amount = money_out
+
+    # Transfers to people should be classed as outcome
+    elif "transfer_out" in kinds:
+        amount = -money_out
+
+    # Determine actual transaction amount for regular transactions
+    elif money_out > 0:
+        amount = -money_out
+    else:
+        amount = float(money_in)  # true income (rare but possible)
+
+    return {
+        "date": date,
+        "description": desc,
+        "amount": amount
+    }
+
+
+# Splits each page's text into lines (pages are separated the same way as "\n".join would)
+def iter_lines(page_texts):
+    for text in page_texts:
+        yield from text.split("\n")
+
+
+# Rows that end on the line they start on: the regex itself, run on the line alone, and
+# only while the two amounts are still ahead (a line of dates without amounts is never
+# scanned this way). A row found here is the one the scan over the joined lines finds first
+def match_line(line, start):
+    while amounts_pattern.search(line, start):
+        match = transaction_pattern.search(line, start)
+        if not match:
+            return
+        yield match
+        start = match.end()
+
+
+# Rows starting on the first line of the window that continue on the next lines (or any row
+# starting from position start, in the order the regex scan would find them)
+# Yields (match, line_count) where line_count is the number of lines the row ends on after the first
+def match_rows(text, start, line_end):
+    amounts_at = -1  # where the next two amounts start, searched again once passed
+    for candidate in date_start_pattern.finditer(text, start):
+        position = candidate.start()
+        if position >= line_end:
+            break
+        if position < start:
+            continue  # inside the previous row
+
+        date = date_pattern.match(text, position)
+        if not date:
+            continue
+        # A row whose date stays on this line also ends on it: its description cannot cross a line
+        if date.end() <= line_end:
+            if amounts_at <= position:
+                amounts = amounts_pattern.search(text, position + 1)
+                amounts_at = amounts.start() if amounts else len(text)
+            if amounts_at > line_end:
+                continue
+
+        match = transaction_pattern.match(text, position)
+        if match:
+            start = match.end()
+            yield match, text.count("\n", line_end, start)
+
+
+# Streams the rows out of a sequence of lines, one pass over the lines
+# skip_lines: leading lines only read as context (their rows belong to the previous chunk)
+# final: False when more lines follow in another chunk, so the trailing lines are left for it
+# The boundaries are the same as before the line parser: a chunk reports the rows starting
+# in the last CARRY_LINES lines of its lead-in and leaves its own last CARRY_LINES lines
+# to the next chunk (see pdf_engine.py)
+def iter_rows(lines, skip_lines=0, final=True, carry_lines=CARRY_LINES):
+    lines = iter(lines)
+    window = deque(islice(lines, carry_lines + 1))
+    number = 1  # line number of window[0]
+    offset = 0  # where window[0] continues after a row that ended on it
+
+    while window:
+        if not final and len(window) <= carry_lines:
+            break
+
+        line = window[0]
+        start, used, offset = offset, 1, 0
+        for match in match_line(line, start):
+            if number > skip_lines - carry_lines:
+                yield match
+            start = match.end()
+
+        # What is left of the line can still start a row that continues on the next lines
+        # (only where a date can start, or in the digits the line ends with)
+        if len(window) > 1 and (date_start_pattern.search(line, start) or line[start:][-1:].isdigit()):
+            text = "\n".join(window)
+            for match, extra_lines in match_rows(text, start, len(line)):
+                if number > skip_lines - carry_lines:
+                    yield match
+                if extra_lines:
+                    # The scan goes on from the end of the row, on the line it ended on
+                    used = extra_lines
+                    offset = match.end() - (text.rfind("\n", 0, match.end()) + 1)
+                    break
+
+        for _ in range(used):
+            window.popleft()
+            number += 1
+            window.extend(islice(lines, 1))
+
+
+# Streams transactions out of a sequence of lines
+def iter_transactions(lines, skip_lines=0, final=True):
+    for match in iter_rows(lines, skip_lines, final):
+        tx = transaction_from_row(*match.groups())
+        if tx is not None:
+            yield tx
+
+
+# Function that extracts transactions from the full statement text
+def extract_transactions(text: str):
+    return list(iter_transactions(iter_lines([text])))
+
+
+# The month of a statement ("2025-11"), from the date of its first transaction
+def statement_month(transactions):
+    first_date = transactions[0]["date"].replace("Sept", "Sep")
+    return datetime.strptime(first_date, "%d %b %Y").strftime("%Y-%m")